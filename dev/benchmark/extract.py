@@ -0,0 +1,431 @@
+# -*- coding: utf-8 -*-
+import copy
+import datetime
+import json
+import math
+import optparse
+import platform
+import sys
+import timeit
+import tracemalloc
+import warnings
+
+from pyramid.testing import DummyRequest, testConfig
+from shapely.geometry import MultiPolygon, Polygon, box
+
+from pyramid_oereb.core import b64
+from pyramid_oereb.core.config import Config
+from pyramid_oereb.core.processor import Processor
+from pyramid_oereb.core.records.disclaimer import DisclaimerRecord
+from pyramid_oereb.core.records.document_types import DocumentTypeRecord
+from pyramid_oereb.core.records.documents import DocumentRecord
+from pyramid_oereb.core.records.extract import ExtractRecord
+from pyramid_oereb.core.records.general_information import GeneralInformationRecord
+from pyramid_oereb.core.records.geometry import GeometryRecord
+from pyramid_oereb.core.records.glossary import GlossaryRecord
+from pyramid_oereb.core.records.image import ImageRecord
+from pyramid_oereb.core.records.law_status import LawStatusRecord
+from pyramid_oereb.core.records.logo import LogoRecord
+from pyramid_oereb.core.records.office import OfficeRecord
+from pyramid_oereb.core.records.plr import PlrRecord
+from pyramid_oereb.core.records.real_estate import RealEstateRecord
+from pyramid_oereb.core.records.real_estate_type import RealEstateTypeRecord
+from pyramid_oereb.core.records.theme import ThemeRecord
+from pyramid_oereb.core.records.view_service import LegendEntryRecord, ViewServiceRecord
+from pyramid_oereb.core.views.webservice import Parameter
+
+STAGES = [
+    'calculate',
+    'plr_tolerance_check',
+    'get_legend_entries',
+    'render_json',
+    'render_xml',
+    'convert_to_printable_extract'
+]
+
+ORIGIN = (2600000.0, 1200000.0)
+REAL_ESTATE_SIZE = 1000.0
+LOGO = 'iVBORw0KGgoAAAANSUhEUgAAAB4AAAAPCAIAAAB82OjLAAAAL0lEQVQ4jWNMTd3EQBvAwsDAkFPnS3VzpzRtZqK6oXAwavSo0aN' \
+    'GjwCjGWlX8gEAFAQGFyQKGL4AAAAASUVORK5CYII='
+SYMBOL = b64.decode(LOGO)
+WMS = u'https://example.com/wms?SERVICE=WMS&VERSION=1.3.0&REQUEST=GetMap&FORMAT=image/png&LAYERS={}' \
+    u'&CRS=EPSG:2056'
+
+
+class _RenderInfo(object):
+    name = 'benchmark'
+
+
+def _real_estate_geometry():
+    x, y = ORIGIN
+    return MultiPolygon([box(x, y, x + REAL_ESTATE_SIZE, y + REAL_ESTATE_SIZE)])
+
+
+def _polygon(center_x, center_y, radius, vertices):
+    step = 2 * math.pi / max(vertices, 3)
+    return Polygon([
+        (center_x + radius * math.cos(i * step), center_y + radius * math.sin(i * step))
+        for i in range(max(vertices, 3))
+    ])
+
+
+def build_extract(themes=5, plrs=10, geometries=2, vertices=100, documents=3, legend_entries=5):
+    """
+    Builds a synthetic extract without accessing a database. The themes are taken from the configured
+    PLRs, so the hooks of the configuration (e.g. for symbol references) can be used (see
+    :func:`configure_themes`). Every PLR gets polygons around random looking but reproducible centers in
+    and around the real estate.
+
+    Args:
+        themes (int): The number of concerned themes, at most the number of configured PLRs.
+        plrs (int): The number of PLRs per theme.
+        geometries (int): The number of geometries per PLR.
+        vertices (int): The number of vertices per geometry.
+        documents (int): The number of documents per PLR.
+        legend_entries (int): The number of additional legend entries per theme, which are not used by
+            any PLR (the other legend).
+
+    Returns:
+        pyramid_oereb.core.records.extract.ExtractRecord: The unprocessed extract.
+    """
+    configured = Config.get('plrs')
+    if themes > len(configured):
+        raise ValueError('Only {} themes are configured, {} requested'.format(len(configured), themes))
+    today = datetime.date.today()
+    law_status = LawStatusRecord(u'inKraft', {u'de': u'Rechtskräftig', u'fr': u'En vigueur'})
+    document_type = DocumentTypeRecord(u'Rechtsvorschrift', {u'de': u'Rechtsvorschrift'})
+    office = OfficeRecord({u'de': u'Amt für Geoinformation'}, office_at_web={u'de': u'https://example.com'})
+    real_estate = RealEstateRecord(
+        u'Liegenschaft', u'BL', u'Liestal', 2829, REAL_ESTATE_SIZE * REAL_ESTATE_SIZE,
+        _real_estate_geometry(),
+        number=u'1000', identdn=u'BL0200002829', egrid=u'CH113928077734'
+    )
+    view_service = ViewServiceRecord({u'de': WMS.format('real_estate')}, 1, 1.0, u'de', 2056)
+    real_estate.set_view_service(view_service)
+    real_estate.set_main_page_view_service(copy.copy(view_service))
+
+    restrictions = []
+    concerned_themes = []
+    for theme_index, plr_config in enumerate(configured[:themes]):
+        theme = ThemeRecord(plr_config['code'], {u'de': u'Thema {}'.format(theme_index)}, theme_index)
+        concerned_themes.append(theme)
+        legends = [
+            LegendEntryRecord(
+                ImageRecord(SYMBOL), {u'de': u'Legende {}'.format(i)}, u'type-{}'.format(i),
+                u'https://example.com/types', theme, view_service_id=theme_index, identifier=str(i)
+            )
+            for i in range(plrs + legend_entries)
+        ]
+        plr_view_service = ViewServiceRecord(
+            {u'de': WMS.format(plr_config['code'])}, 1, 1.0, u'de', 2056, legends=legends
+        )
+        for plr_index in range(plrs):
+            legend_entry = legends[plr_index]
+            geometry_records = []
+            for geometry_index in range(geometries):
+                # spread the centers over the real estate and its surroundings, reproducibly
+                seed = (theme_index * 7919 + plr_index * 104729 + geometry_index * 1299709) % 10007
+                center_x = ORIGIN[0] - 200 + (seed % 97) / 96.0 * (REAL_ESTATE_SIZE + 400)
+                center_y = ORIGIN[1] - 200 + (seed % 89) / 88.0 * (REAL_ESTATE_SIZE + 400)
+                geometry_records.append(GeometryRecord(
+                    law_status, today, None,
+                    _polygon(center_x, center_y, 50 + seed % 150, vertices)
+                ))
+            document_records = [
+                DocumentRecord(
+                    document_type, i, law_status,
+                    {u'de': u'Dokument {}-{}-{}'.format(theme_index, plr_index, i)}, office, today,
+                    text_at_web={u'de': u'https://example.com/documents/{}/{}/{}'.format(
+                        theme_index, plr_index, i)},
+                    abbreviation={u'de': u'D{}'.format(i)}, official_number={u'de': u'{}.{}'.format(
+                        plr_index, i)}
+                )
+                for i in range(documents)
+            ]
+            restrictions.append(PlrRecord(
+                theme, legend_entry, law_status, today, None, office, ImageRecord(SYMBOL),
+                plr_view_service, geometry_records, type_code=legend_entry.type_code,
+                type_code_list=u'https://example.com/types', documents=document_records,
+                view_service_id=theme_index, min_length=1.0, min_area=1.0
+            ))
+    real_estate.public_law_restrictions = restrictions
+
+    return ExtractRecord(
+        real_estate,
+        LogoRecord('ch.plr', {u'de': LOGO}),
+        LogoRecord('ch', {u'de': LOGO}),
+        LogoRecord('ne', {u'de': LOGO}),
+        LogoRecord('ch.2829', {u'de': LOGO}),
+        office,
+        datetime.datetime.now(),
+        disclaimers=[DisclaimerRecord({u'de': u'Haftungsausschluss'}, {u'de': u'Inhalt'})],
+        glossaries=[GlossaryRecord({u'de': u'Glossar'}, {u'de': u'Inhalt'})],
+        concerned_theme=concerned_themes,
+        not_concerned_theme=[],
+        theme_without_data=[],
+        general_information=[GeneralInformationRecord({u'de': u'Information'}, {u'de': u'Inhalt'})]
+    )
+
+
+def configure_themes(themes):
+    """
+    Adds copies of the first configured PLR with the codes `ch.Benchmark<n>` to the configuration, until
+    it contains at least the passed number of themes.
+
+    Args:
+        themes (int): The number of themes needed.
+    """
+    configured = Config.get('plrs')
+    for i in range(len(configured), themes):
+        plr_config = copy.deepcopy(configured[0])
+        plr_config['code'] = u'ch.Benchmark{}'.format(i)
+        configured.append(plr_config)
+
+
+def _params(extract_format):
+    return Parameter(extract_format, with_geometry=True, images=False, signed=False, egrid=u'CH113928077734',
+                     language=u'de')
+
+
+def _renderer(module):
+    renderer = module.Renderer(_RenderInfo())
+    renderer._language = u'de'
+    renderer._fallback_language = Config.get('default_language')
+    renderer._request = DummyRequest()
+    renderer._params = _params('json')
+    return renderer
+
+
+def _processed(build):
+    extract = Processor(None, [], None).plr_tolerance_check(build())
+    Processor.view_service_handling(extract.real_estate, False, 'json', u'de')
+    return extract
+
+
+def _stage(name, build):
+    """
+    Returns:
+        tuple: A function creating the input of a run and the measured function taking that input.
+    """
+    from pyramid_oereb.core.renderer.extract import json_, xml_
+    if name == 'calculate':
+        geometry_types = Config.get('geometry_types')
+
+        def calculate(extract):
+            real_estate = extract.real_estate
+            for plr in real_estate.public_law_restrictions:
+                plr.calculate(real_estate, geometry_types)
+        return build, calculate
+    if name == 'plr_tolerance_check':
+        return build, Processor(None, [], None).plr_tolerance_check
+    if name == 'get_legend_entries':
+        def get_legend_entries(extract):
+            plrs = extract.real_estate.public_law_restrictions
+            Processor.get_legend_entries(plrs, [])
+        return build, get_legend_entries
+    if name == 'render_json':
+        renderer = _renderer(json_)
+        return lambda: _processed(build), lambda extract: renderer._render(extract, _params('json'))
+    if name == 'render_xml':
+        renderer = _renderer(xml_)
+        return lambda: _processed(build), lambda extract: renderer._render(extract, _params('xml'))
+    if name == 'convert_to_printable_extract':
+        from pyramid_oereb.contrib.print_proxy.mapfish_print.mapfish_print import Renderer
+        printer = Renderer(_RenderInfo())
+        printer._language = u'de'
+        printer._fallback_language = Config.get('default_language')
+        rendered = json.dumps(_renderer(json_)._render(_processed(build), _params('json')))
+        geometry = json.loads(json.dumps(_real_estate_geometry().__geo_interface__))
+        return lambda: json.loads(rendered), lambda extract: printer.convert_to_printable_extract(
+            extract, geometry)
+    raise ValueError('Unknown stage: {}'.format(name))
+
+
+def measure(name, create_input, function, repeat=5):
+    """
+    Measures a function. Every run gets a fresh input, its creation is not measured. The peak memory is
+    measured in an additional run, as tracing slows down the execution.
+
+    Args:
+        name (str): The name of the stage.
+        create_input (callable): Creates the input of a run.
+        function (callable): The measured function, called with the input.
+        repeat (int): The number of timed runs.
+
+    Returns:
+        dict: The minimum, mean and maximum time in seconds and the peak memory in bytes.
+    """
+    times = []
+    for _ in range(repeat):
+        value = create_input()
+        start = timeit.default_timer()
+        function(value)
+        times.append(timeit.default_timer() - start)
+    value = create_input()
+    tracemalloc.start()
+    try:
+        function(value)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'stage': name,
+        'runs': len(times),
+        'min': min(times),
+        'mean': sum(times) / len(times),
+        'max': max(times),
+        'peak_memory': peak
+    }
+
+
+def run(stages=None, repeat=5, **sizes):
+    """
+    Runs the benchmarks of the passed stages on synthetic extracts.
+
+    Args:
+        stages (list of str or None): The stages to measure, all :data:`STAGES` if None.
+        repeat (int): The number of timed runs per stage.
+        **sizes: The size of the extract, see :func:`build_extract`.
+
+    Returns:
+        dict: The environment, the sizes and the results per stage.
+    """
+    def build():
+        return build_extract(**sizes)
+
+    results = []
+    with testConfig(request=DummyRequest()) as pyramid_config:
+        pyramid_config.include('pyramid_oereb.core.routes')
+        for name in stages or STAGES:
+            create_input, function = _stage(name, build)
+            results.append(measure(name, create_input, function, repeat))
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sizes': sizes,
+        'results': results
+    }
+
+
+def compare(current, baseline):
+    """
+    Compares the results with the results of another run, e.g. of another branch.
+
+    Args:
+        current (dict): The results of :func:`run`.
+        baseline (dict): The results to compare with.
+
+    Returns:
+        list of str: A line per stage with the relative change of the minimum time and the peak memory.
+    """
+    baseline_results = dict((result['stage'], result) for result in baseline['results'])
+    lines = []
+    for result in current['results']:
+        before = baseline_results.get(result['stage'])
+        if before is None:
+            lines.append('{:<30} {:>10.4f}s (no baseline)'.format(result['stage'], result['min']))
+            continue
+        lines.append('{:<30} {:>10.4f}s {:>+8.1%} {:>12d}B {:>+8.1%}'.format(
+            result['stage'],
+            result['min'],
+            result['min'] / before['min'] - 1 if before['min'] else 0,
+            result['peak_memory'],
+            result['peak_memory'] / before['peak_memory'] - 1 if before['peak_memory'] else 0
+        ))
+    return lines
+
+
+def _run():
+    parser = optparse.OptionParser(
+        usage='usage: %prog [options]',
+        description='Measures the processing and rendering of synthetic extracts without a database.'
+    )
+    parser.add_option(
+        '-c', '--configuration',
+        dest='configuration',
+        metavar='YAML',
+        type='string',
+        default='tests/resources/test_config.yml',
+        help='The configuration yaml file (default is: tests/resources/test_config.yml).'
+    )
+    parser.add_option(
+        '-s', '--section',
+        dest='section',
+        metavar='SECTION',
+        type='string',
+        default='pyramid_oereb',
+        help='The section which contains configuration (default is: pyramid_oereb).'
+    )
+    parser.add_option(
+        '--stage',
+        dest='stages',
+        action='append',
+        choices=STAGES,
+        help='A stage to measure, can be repeated (default is all: {}).'.format(', '.join(STAGES))
+    )
+    for option, default, description in [
+        ('themes', 5, 'concerned themes'),
+        ('plrs', 10, 'PLRs per theme'),
+        ('geometries', 2, 'geometries per PLR'),
+        ('vertices', 100, 'vertices per geometry'),
+        ('documents', 3, 'documents per PLR'),
+        ('legend-entries', 5, 'unused legend entries per theme')
+    ]:
+        parser.add_option(
+            '--{}'.format(option),
+            dest=option.replace('-', '_'),
+            type='int',
+            default=default,
+            help='Number of {} (default is: {}).'.format(description, default)
+        )
+    parser.add_option(
+        '-r', '--repeat',
+        dest='repeat',
+        type='int',
+        default=5,
+        help='Number of timed runs per stage (default is: 5).'
+    )
+    parser.add_option(
+        '-o', '--output',
+        dest='output',
+        metavar='JSON',
+        type='string',
+        help='Write the results to this file instead of the standard output.'
+    )
+    parser.add_option(
+        '-b', '--baseline',
+        dest='baseline',
+        metavar='JSON',
+        type='string',
+        help='Results of a previous run (e.g. of another branch) to compare with.'
+    )
+    options, _ = parser.parse_args()
+    warnings.simplefilter('ignore')
+    Config.init(options.configuration, options.section)
+    configure_themes(options.themes)
+    if Config.real_estate_types is None:
+        Config.real_estate_types = [RealEstateTypeRecord(u'Liegenschaft', {u'de': u'Liegenschaft'})]
+    result = run(
+        stages=options.stages,
+        repeat=options.repeat,
+        themes=options.themes,
+        plrs=options.plrs,
+        geometries=options.geometries,
+        vertices=options.vertices,
+        documents=options.documents,
+        legend_entries=options.legend_entries
+    )
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(result, f, indent=2)
+    else:
+        json.dump(result, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    if options.baseline:
+        with open(options.baseline) as f:
+            baseline = json.load(f)
+        sys.stderr.write('\n'.join(compare(result, baseline)) + '\n')
+
+
+if __name__ == '__main__':
+    _run()
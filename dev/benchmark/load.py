@@ -0,0 +1,575 @@
+# -*- coding: utf-8 -*-
+import io
+import itertools
+import json
+import optparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import pyaml_env
+import yaml
+from geoalchemy2.shape import to_shape
+from pypdf import PdfWriter
+from pyramid.config import Configurator
+from pyramid.path import DottedNameResolver
+from webob import Request
+
+from dev.benchmark.extract import SYMBOL
+from pyramid_oereb import database_adapter
+from pyramid_oereb.core.config import Config
+
+KINDS = [
+    'getegrid_coordinate',
+    'getegrid_ident',
+    'getegrid_address',
+    'extract_json',
+    'extract_json_geometry',
+    'extract_xml',
+    'extract_xml_images',
+    'extract_pdf',
+    'symbol',
+    'logo',
+    'other'
+]
+
+GEOLINK = 'tests/resources/geolink_v1.2.2.xml'
+
+
+def _blank_pdf():
+    writer = PdfWriter()
+    writer.add_blank_page(595, 842)
+    with io.BytesIO() as pdf:
+        writer.write(pdf)
+        return pdf.getvalue()
+
+
+class StandIn(object):
+    """
+    A local HTTP server standing in for the external services of an extract: the WMS (every GET returns a
+    PNG image), OEREBlex (GET requests below `/api/` return a geoLink document) and the print server (POST
+    requests to `buildreport.pdf` return a blank PDF). It also works as HTTP proxy, so WMS URLs of the data
+    can be redirected to it by the `proxies` configuration. An optional delay simulates the latency of the
+    real services.
+
+    Attributes:
+        url (str): The base URL of the running server.
+        requests (collections.Counter): The number of served requests per service.
+    """
+
+    def __init__(self, geolink=GEOLINK, delay=0.0):
+        """
+        Args:
+            geolink (str): The geoLink XML file returned for OEREBlex requests.
+            delay (float): Seconds to wait before answering a request.
+        """
+        with open(geolink, 'rb') as f:
+            self._geolink = f.read()
+        self._pdf = _blank_pdf()
+        self._delay = delay
+        self._lock = threading.Lock()
+        self.requests = Counter()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self.url = 'http://127.0.0.1:{}'.format(self._server.server_address[1])
+        self._thread = threading.Thread(target=self._server.serve_forever, name='stand-in', daemon=True)
+
+    def _handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, service, content_type, body):
+                if stand_in._delay:
+                    time.sleep(stand_in._delay)
+                with stand_in._lock:
+                    stand_in.requests[service] += 1
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if '/api/' in urlsplit(self.path).path:
+                    self._reply('oereblex', 'application/xml', stand_in._geolink)
+                else:
+                    self._reply('wms', 'image/png', SYMBOL)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if urlsplit(self.path).path.endswith('buildreport.pdf'):
+                    self._reply('print', 'application/pdf', stand_in._pdf)
+                else:
+                    self.send_error(404)
+
+        return Handler
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+
+def prepare_configuration(configuration, section, stand_in_url, output):
+    """
+    Writes a copy of the configuration which sends the requests for the print server, OEREBlex and the WMS
+    (as far as they use HTTP) to the stand-in.
+
+    Args:
+        configuration (str): The configuration yaml file.
+        section (str): The section which contains the configuration.
+        stand_in_url (str): The base URL of the :class:`StandIn`.
+        output (str): The file to write the configuration to.
+    """
+    content = pyaml_env.parse_config(configuration)
+    cfg = content[section]
+    cfg.setdefault('print', {})['base_url'] = stand_in_url
+    cfg['proxies'] = {'http': stand_in_url}
+    if cfg.get('oereblex'):
+        cfg['oereblex']['host'] = stand_in_url
+        cfg['oereblex'].pop('proxy', None)
+    with open(output, 'w') as f:
+        yaml.safe_dump({section: cfg}, f, allow_unicode=True)
+
+
+def build_app(configuration, section, route_prefix='oereb'):
+    """
+    Builds the WSGI application the same way as a deployment including pyramid_oereb does.
+
+    Args:
+        configuration (str): The configuration yaml file.
+        section (str): The section which contains the configuration.
+        route_prefix (str): The prefix of the routes.
+
+    Returns:
+        pyramid.router.Router: The WSGI application.
+    """
+    config = Configurator(settings={
+        'pyramid_oereb.cfg.file': configuration,
+        'pyramid_oereb.cfg.section': section
+    })
+    config.include('pyramid_oereb', route_prefix=route_prefix)
+    return config.make_wsgi_app()
+
+
+def _query(source_config, count):
+    params = source_config['source']['params']
+    model = DottedNameResolver().maybe_resolve(params['model'])
+    session = database_adapter.get_session(params['db_connection'])
+    try:
+        return session.query(model).limit(count).all()
+    finally:
+        session.close()
+
+
+def sample_targets(count):
+    """
+    Reads real estates and addresses from the configured sources, to be used as targets of the generated
+    requests. The application has to be built before (see :func:`build_app`).
+
+    Args:
+        count (int): The maximum number of real estates and addresses.
+
+    Returns:
+        dict: The real estates (egrid, identdn, number and a point within) and the addresses.
+    """
+    real_estates = []
+    for real_estate in _query(Config.get_real_estate_config(), count):
+        point = to_shape(real_estate.limit).representative_point()
+        real_estates.append({
+            'egrid': real_estate.egrid,
+            'identdn': real_estate.identdn,
+            'number': real_estate.number,
+            'en': '{:.1f},{:.1f}'.format(point.x, point.y)
+        })
+    addresses = [{
+        'postalcode': address.zip_code,
+        'localisation': address.street_name,
+        'number': address.street_number
+    } for address in _query(Config.get_address_config(), count)]
+    return {'real_estates': real_estates, 'addresses': addresses}
+
+
+def _image_urls(value, base_url):
+    if isinstance(value, dict):
+        for item in value.values():
+            yield from _image_urls(item, base_url)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _image_urls(item, base_url)
+    elif isinstance(value, str) and value.startswith(base_url) and '/image/' in value:
+        yield value[len(base_url):]
+
+
+def generate_requests(app, targets, route_prefix='oereb', pdf=True):
+    """
+    Generates the request mix for the sampled targets: GetEGRID by coordinate, by IDENTDN and number and by
+    address, JSON extracts with and without geometry, XML extracts with and without images, static
+    extracts and the symbols and logos referenced by the JSON extracts, which are requested once to collect
+    them.
+
+    Args:
+        app (pyramid.router.Router): The WSGI application.
+        targets (dict): The targets as returned by :func:`sample_targets`.
+        route_prefix (str): The prefix of the routes.
+        pdf (bool): Whether to include static extracts.
+
+    Returns:
+        list of str: The paths including the query string.
+    """
+    base = '/{}'.format(route_prefix) if route_prefix else ''
+    paths = []
+    images = set()
+    for real_estate in targets['real_estates']:
+        egrid = {'EGRID': real_estate['egrid']}
+        paths.append('{}/getegrid/json?{}'.format(base, urlencode({'EN': real_estate['en']})))
+        if real_estate['identdn'] and real_estate['number']:
+            paths.append('{}/getegrid/json?{}'.format(base, urlencode({
+                'IDENTDN': real_estate['identdn'],
+                'NUMBER': real_estate['number']
+            })))
+        extract = '{}/extract/json?{}'.format(base, urlencode(egrid))
+        paths.append(extract)
+        paths.append('{}/extract/json?{}'.format(base, urlencode(dict(egrid, GEOMETRY='true'))))
+        paths.append('{}/extract/xml?{}'.format(base, urlencode(egrid)))
+        paths.append('{}/extract/xml?{}'.format(base, urlencode(dict(egrid, WITHIMAGES='true'))))
+        if pdf:
+            paths.append('{}/extract/pdf?{}'.format(base, urlencode(egrid)))
+        response = Request.blank(extract).get_response(app)
+        if response.status_int == 200:
+            images.update(_image_urls(json.loads(response.body), 'http://localhost'))
+    for address in targets['addresses']:
+        paths.append('{}/getegrid/json?{}'.format(base, urlencode({
+            'POSTALCODE': address['postalcode'],
+            'LOCALISATION': address['localisation'],
+            'NUMBER': address['number']
+        })))
+    return paths + sorted(images)
+
+
+def read_requests(path):
+    """
+    Reads the requests to replay. Every line is either a path including the query string, optionally
+    preceded by a weight (the number of times it is replayed per round), or a line of the statistics log
+    (written by the `log_response` decorator), of which the logged request path and parameters are used.
+    Empty lines and lines starting with `#` are ignored.
+
+    Args:
+        path (str): The file to read.
+
+    Returns:
+        list of str: The paths including the query string.
+    """
+    requests = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if '{' in line:
+                try:
+                    record = json.loads(line[line.index('{'):])
+                except ValueError:
+                    continue
+                if isinstance(record.get('msg'), str):
+                    record = json.loads(record['msg'])
+                request = record.get('request')
+                if request and request.get('path'):
+                    query = urlencode(request.get('parameters') or {})
+                    requests.append(request['path'] + ('?' + query if query else ''))
+                continue
+            weight, _, request = line.partition(' ')
+            if weight.isdigit() and request.strip():
+                requests.extend([request.strip()] * int(weight))
+            else:
+                requests.append(line)
+    return requests
+
+
+def classify(path):
+    """
+    Returns the kind of a request, used to group the results.
+
+    Args:
+        path (str): The path including the query string.
+
+    Returns:
+        str: One of :data:`KINDS`.
+    """
+    url = urlsplit(path)
+    params = dict((key.upper(), value.lower()) for key, value in parse_qsl(url.query))
+    if '/getegrid/' in url.path:
+        if 'IDENTDN' in params:
+            return 'getegrid_ident'
+        if 'POSTALCODE' in params:
+            return 'getegrid_address'
+        return 'getegrid_coordinate'
+    if '/extract/' in url.path:
+        extract_format = url.path.rstrip('/').rsplit('/', 1)[-1]
+        if extract_format == 'json':
+            return 'extract_json_geometry' if params.get('GEOMETRY') == 'true' else 'extract_json'
+        if extract_format == 'xml':
+            return 'extract_xml_images' if params.get('WITHIMAGES') == 'true' else 'extract_xml'
+        if extract_format == 'pdf':
+            return 'extract_pdf'
+    if '/image/symbol/' in url.path:
+        return 'symbol'
+    if '/image/logo/' in url.path:
+        return 'logo'
+    return 'other'
+
+
+def _percentile(values, percentile):
+    index = max(int(round(percentile / 100.0 * len(values))) - 1, 0)
+    return values[min(index, len(values) - 1)]
+
+
+def summarize(samples, duration):
+    """
+    Summarizes the replayed requests.
+
+    Args:
+        samples (list of tuple): The kind, the status code (None for an exception) and the latency of every
+            request.
+        duration (float): The wall time of the run in seconds.
+
+    Returns:
+        dict: The throughput, the latency percentiles in seconds and the error rate (status codes of 500
+        and above and exceptions), in total and per kind of request.
+    """
+    groups = defaultdict(list)
+    for sample in samples:
+        groups['total'].append(sample)
+        groups[sample[0]].append(sample)
+    result = {}
+    for kind in ['total'] + [kind for kind in KINDS if kind in groups]:
+        latencies = sorted(sample[2] for sample in groups[kind])
+        statuses = Counter(str(sample[1]) for sample in groups[kind])
+        errors = sum(1 for sample in groups[kind] if sample[1] is None or sample[1] >= 500)
+        result[kind] = {
+            'requests': len(latencies),
+            'throughput': len(latencies) / duration if duration else 0,
+            'mean': sum(latencies) / len(latencies),
+            'p50': _percentile(latencies, 50),
+            'p90': _percentile(latencies, 90),
+            'p99': _percentile(latencies, 99),
+            'max': latencies[-1],
+            'error_rate': errors / len(latencies),
+            'status': dict(statuses)
+        }
+    return result
+
+
+def replay(app, paths, concurrency=4, count=None, duration=None, seed=0):
+    """
+    Replays the requests against the application with a number of concurrent clients. The requests are
+    shuffled once and then replayed round by round.
+
+    Args:
+        app (pyramid.router.Router): The WSGI application.
+        paths (list of str): The requests to replay.
+        concurrency (int): The number of concurrent clients.
+        count (int or None): Stop after this many requests, one round if neither count nor duration is set.
+        duration (float or None): Stop after this many seconds.
+        seed (int): The seed of the shuffling.
+
+    Returns:
+        dict: The summary, see :func:`summarize`.
+    """
+    paths = list(paths)
+    random.Random(seed).shuffle(paths)
+    if count is None and duration is None:
+        count = len(paths)
+    source = itertools.cycle(paths)
+    lock = threading.Lock()
+    samples = []
+    issued = itertools.count()
+    start = time.perf_counter()
+
+    def client():
+        while True:
+            with lock:
+                if count is not None and next(issued) >= count:
+                    return
+                if duration is not None and time.perf_counter() - start >= duration:
+                    return
+                path = next(source)
+            request_start = time.perf_counter()
+            try:
+                status = Request.blank(path).get_response(app).status_int
+            except Exception:
+                status = None
+            latency = time.perf_counter() - request_start
+            with lock:
+                samples.append((classify(path), status, latency))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(client) for _ in range(concurrency)]:
+            future.result()
+    return summarize(samples, time.perf_counter() - start)
+
+
+def _format(summary):
+    lines = ['{:<24} {:>8} {:>9} {:>9} {:>9} {:>9} {:>7}'.format(
+        'kind', 'requests', 'req/s', 'p50', 'p90', 'p99', 'errors')]
+    for kind, result in summary.items():
+        lines.append('{:<24} {:>8d} {:>9.1f} {:>8.3f}s {:>8.3f}s {:>8.3f}s {:>7.1%}'.format(
+            kind, result['requests'], result['throughput'], result['p50'], result['p90'], result['p99'],
+            result['error_rate']))
+    return lines
+
+
+def _run():
+    parser = optparse.OptionParser(
+        usage='usage: %prog [options]',
+        description='Replays extract traffic against the pyramid_oereb WSGI application, with local '
+                    'stand-ins for the WMS, OEREBlex and the print server.'
+    )
+    parser.add_option(
+        '-c', '--configuration',
+        dest='configuration',
+        metavar='YAML',
+        type='string',
+        default='pyramid_oereb.yml',
+        help='The configuration yaml file (default is: pyramid_oereb.yml).'
+    )
+    parser.add_option(
+        '-s', '--section',
+        dest='section',
+        metavar='SECTION',
+        type='string',
+        default='pyramid_oereb',
+        help='The section which contains configuration (default is: pyramid_oereb).'
+    )
+    parser.add_option(
+        '--route-prefix',
+        dest='route_prefix',
+        type='string',
+        default='oereb',
+        help='The prefix of the routes (default is: oereb).'
+    )
+    parser.add_option(
+        '-i', '--input',
+        dest='input',
+        metavar='FILE',
+        type='string',
+        help='The requests to replay, one path per line (optionally preceded by a weight) or the lines of '
+             'the statistics log. Without it, requests are generated for sampled real estates.'
+    )
+    parser.add_option(
+        '--sample',
+        dest='sample',
+        type='int',
+        default=20,
+        help='Number of real estates and addresses to generate requests for (default is: 20).'
+    )
+    parser.add_option(
+        '--no-pdf',
+        dest='pdf',
+        action='store_false',
+        default=True,
+        help='Do not generate requests for static extracts.'
+    )
+    parser.add_option(
+        '-w', '--concurrency',
+        dest='concurrency',
+        type='int',
+        default=4,
+        help='Number of concurrent clients (default is: 4).'
+    )
+    parser.add_option(
+        '-n', '--requests',
+        dest='count',
+        type='int',
+        help='Number of requests to send (default is one round of all requests).'
+    )
+    parser.add_option(
+        '-d', '--duration',
+        dest='duration',
+        type='float',
+        help='Send requests for this many seconds.'
+    )
+    parser.add_option(
+        '--warmup',
+        dest='warmup',
+        type='int',
+        default=0,
+        help='Number of requests sent before measuring (default is: 0).'
+    )
+    parser.add_option(
+        '--delay',
+        dest='delay',
+        type='float',
+        default=0.0,
+        help='Seconds the stand-ins wait before answering (default is: 0).'
+    )
+    parser.add_option(
+        '--geolink',
+        dest='geolink',
+        metavar='XML',
+        type='string',
+        default=GEOLINK,
+        help='The geoLink document returned by the OEREBlex stand-in (default is: {}).'.format(GEOLINK)
+    )
+    parser.add_option(
+        '--seed',
+        dest='seed',
+        type='int',
+        default=0,
+        help='Seed of the request order (default is: 0).'
+    )
+    parser.add_option(
+        '-o', '--output',
+        dest='output',
+        metavar='JSON',
+        type='string',
+        help='Write the results as JSON to this file.'
+    )
+    options, _ = parser.parse_args()
+    stand_in = StandIn(options.geolink, options.delay)
+    stand_in.start()
+    fd, configuration = tempfile.mkstemp(suffix='.yml')
+    os.close(fd)
+    try:
+        prepare_configuration(options.configuration, options.section, stand_in.url, configuration)
+        app = build_app(configuration, options.section, options.route_prefix)
+        if options.input:
+            paths = read_requests(options.input)
+        else:
+            paths = generate_requests(app, sample_targets(options.sample), options.route_prefix, options.pdf)
+        if not paths:
+            parser.error('No requests to replay.')
+        if options.warmup:
+            replay(app, paths, options.concurrency, count=options.warmup, seed=options.seed)
+        summary = replay(app, paths, options.concurrency, options.count, options.duration, options.seed)
+    finally:
+        stand_in.stop()
+        os.remove(configuration)
+    result = {
+        'concurrency': options.concurrency,
+        'summary': summary,
+        'stand_in': dict(stand_in.requests)
+    }
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(result, f, indent=2)
+    sys.stdout.write('\n'.join(_format(summary)) + '\n')
+
+
+if __name__ == '__main__':
+    _run()
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+import json
+import optparse
+import statistics
+import sys
+import timeit
+
+from pyramid.path import DottedNameResolver
+from sqlalchemy import event
+
+from pyramid_oereb import database_adapter
+from pyramid_oereb.contrib.data_sources.standard.sources.plr import DatabaseSource, FETCH_STRATEGIES
+from pyramid_oereb.core.config import Config
+from pyramid_oereb.core.readers.real_estate import RealEstateReader
+from pyramid_oereb.core.records.plr import PlrRecord
+from pyramid_oereb.core.views.webservice import Parameter
+
+
+def real_estates(count):
+    """
+    Args:
+        count (int): The maximum number of real estates.
+
+    Returns:
+        list of pyramid_oereb.core.records.real_estate.RealEstateRecord: The first real estates of the
+        configured real estate source.
+    """
+    source = Config.get_real_estate_config()['source']
+    model = DottedNameResolver().maybe_resolve(source['params']['model'])
+    session = database_adapter.get_session(source['params']['db_connection'])
+    try:
+        egrids = [row.egrid for row in session.query(model.egrid).limit(count).all()]
+    finally:
+        session.close()
+    reader = RealEstateReader(source['class'], **source['params'])
+    params = Parameter('json')
+    return [reader.read(params, egrid=egrid)[0] for egrid in egrids]
+
+
+def measure(source, real_estate, strategy, repeat):
+    """
+    Measures reading the public law restrictions of a theme for a real estate.
+
+    Args:
+        source (pyramid_oereb.contrib.data_sources.standard.sources.plr.DatabaseSource): The PLR source.
+        real_estate (pyramid_oereb.core.records.real_estate.RealEstateRecord): The real estate.
+        strategy (str): One of
+            :data:`pyramid_oereb.contrib.data_sources.standard.sources.plr.FETCH_STRATEGIES`.
+        repeat (int): The number of runs.
+
+    Returns:
+        dict: The number of records and statements per read and the median time of a read in milliseconds.
+    """
+    Config._config['plr_fetch_strategy'] = strategy
+    params = Parameter('json')
+    bbox = Config.get_bbox(real_estate.limit)
+    session = source.get_session()
+    try:
+        engine = session.get_bind()
+    finally:
+        session.close()
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        durations = []
+        for _ in range(repeat):
+            source.prefetched_ids = None
+            del statements[:]
+            start = timeit.default_timer()
+            source.read(params, real_estate, bbox)
+            durations.append((timeit.default_timer() - start) * 1000)
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+    return {
+        'records': len([record for record in source.records if isinstance(record, PlrRecord)]),
+        'statements': len(statements),
+        'total_ms': statistics.median(durations)
+    }
+
+
+def run(count=10, repeat=5, themes=None):
+    """
+    Compares the fetch strategies of the standard PLR sources for the first real estates of the database.
+
+    Args:
+        count (int): The maximum number of real estates.
+        repeat (int): The number of runs per read.
+        themes (list of str or None): The codes of the themes to measure, all standard themes if None.
+
+    Returns:
+        list of dict: The results per theme and strategy, summed up over the real estates.
+    """
+    configured = Config.get('plr_fetch_strategy')
+    estates = real_estates(count)
+    results = []
+    try:
+        for plr in Config.get('plrs'):
+            source_class = DottedNameResolver().maybe_resolve(plr['source']['class'])
+            if not issubclass(source_class, DatabaseSource) or (themes and plr['code'] not in themes):
+                continue
+            source = source_class(**plr)
+            for strategy in FETCH_STRATEGIES:
+                result = {'theme': plr['code'], 'strategy': strategy, 'records': 0, 'statements': 0,
+                          'total_ms': 0.0}
+                for real_estate in estates:
+                    measured = measure(source, real_estate, strategy, repeat)
+                    for key in ('records', 'statements', 'total_ms'):
+                        result[key] += measured[key]
+                results.append(result)
+    finally:
+        if configured is None:
+            Config._config.pop('plr_fetch_strategy', None)
+        else:
+            Config._config['plr_fetch_strategy'] = configured
+    return results
+
+
+def _format(results):
+    lines = ['{:<45} {:>8} {:>8} {:>10} {:>12}'.format(
+        'theme', 'strategy', 'records', 'statements', 'total ms')]
+    for result in results:
+        lines.append('{theme:<45} {strategy:>8} {records:>8} {statements:>10} '
+                     '{total_ms:>12.3f}'.format(**result))
+    return lines
+
+
+def _run():
+    parser = optparse.OptionParser(
+        usage='usage: %prog [options]',
+        description='Compares reading the public law restrictions of the standard sources through the ORM '
+                    'and as nested JSON rows aggregated by the database.'
+    )
+    parser.add_option(
+        '-c', '--configuration',
+        dest='configuration',
+        metavar='YAML',
+        type='string',
+        default='pyramid_oereb.yml',
+        help='The configuration yaml file (default is: pyramid_oereb.yml).'
+    )
+    parser.add_option(
+        '-s', '--section',
+        dest='section',
+        metavar='SECTION',
+        type='string',
+        default='pyramid_oereb',
+        help='The section which contains configuration (default is: pyramid_oereb).'
+    )
+    parser.add_option(
+        '-n', '--real-estates',
+        dest='count',
+        type='int',
+        default=10,
+        help='Number of real estates read from the database (default is: 10).'
+    )
+    parser.add_option(
+        '-r', '--repeat',
+        dest='repeat',
+        type='int',
+        default=5,
+        help='Number of runs per read (default is: 5).'
+    )
+    parser.add_option(
+        '-t', '--theme',
+        dest='themes',
+        action='append',
+        help='Code of a theme to measure, can be repeated (default is all standard themes).'
+    )
+    parser.add_option(
+        '-o', '--output',
+        dest='output',
+        metavar='JSON',
+        type='string',
+        help='Write the results as JSON to this file.'
+    )
+    options, _ = parser.parse_args()
+    Config.init(options.configuration, options.section)
+    results = run(options.count, options.repeat, options.themes)
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    sys.stdout.write('\n'.join(_format(results)) + '\n')
+
+
+if __name__ == '__main__':
+    _run()
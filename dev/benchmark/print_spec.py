@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+import copy
+import json
+import optparse
+import timeit
+import tracemalloc
+
+from pyramid_oereb.core.config import Config
+from pyramid_oereb.contrib.print_proxy.mapfish_print.mapfish_print import Renderer
+
+DEFAULT_EXTRACT = 'tests/contrib.print_proxy.mapfish_print/resources/test_extract.json'
+DEFAULT_GEOMETRY = {
+    'type': 'MultiPolygon',
+    'coordinates': [[[
+        [2615122.772, 1266688.951], [2615119.443, 1266687.783], [2615095.13, 1266680.663],
+        [2615122.772, 1266688.951]
+    ]]]
+}
+
+
+class _RenderInfo(object):
+    name = 'benchmark'
+
+
+def _suffix_texts(multilingual, suffix):
+    for entry in multilingual:
+        entry['Text'] = '{} {}'.format(entry['Text'], suffix)
+
+
+def scale_extract(extract, factor):
+    """
+    Blows up a rendered JSON extract by repeating every restriction `factor` times. The copies keep their
+    theme, so they get grouped together by the print transformation, but use distinct legend entries and
+    documents.
+
+    Args:
+        extract (dict): The rendered JSON extract (content of GetExtractByIdResponse.extract).
+        factor (int): How many times each restriction is contained in the result.
+
+    Returns:
+        dict: The scaled extract. The passed extract is not modified.
+    """
+    scaled = copy.deepcopy(extract)
+    restrictions = scaled['RealEstate']['RestrictionOnLandownership']
+    copies = []
+    for i in range(1, factor):
+        for restriction in restrictions:
+            duplicate = copy.deepcopy(restriction)
+            _suffix_texts(duplicate['LegendText'], i)
+            duplicate['SymbolRef'] = '{}?copy={}'.format(duplicate['SymbolRef'], i)
+            duplicate['TypeCode'] = '{}-{}'.format(duplicate['TypeCode'], i)
+            for document in duplicate.get('LegalProvisions', []):
+                _suffix_texts(document['Title'], i)
+                _suffix_texts(document.get('TextAtWeb') or [], i)
+            copies.append(duplicate)
+    restrictions.extend(copies)
+    return scaled
+
+
+def run(extract, factor=10, repeat=5, language=None):
+    """
+    Measures the transformation of a rendered JSON extract into a print specification.
+
+    Args:
+        extract (dict): The rendered JSON extract (content of GetExtractByIdResponse.extract).
+        factor (int): The scale factor passed to :func:`scale_extract`.
+        repeat (int): Number of timed runs, the memory is measured in an additional run.
+        language (str or None): The language used for the transformation.
+
+    Returns:
+        dict: The measured times in seconds and the peak memory in bytes.
+    """
+    renderer = Renderer(_RenderInfo())
+    renderer._language = language or Config.get('default_language')
+    renderer._fallback_language = Config.get('default_language')
+    scaled = scale_extract(extract, factor)
+    inputs = [copy.deepcopy(scaled) for _ in range(repeat + 1)]
+
+    times = []
+    for extract_dict in inputs[1:]:
+        start = timeit.default_timer()
+        renderer.convert_to_printable_extract(extract_dict, DEFAULT_GEOMETRY)
+        times.append(timeit.default_timer() - start)
+
+    tracemalloc.start()
+    renderer.convert_to_printable_extract(inputs[0], DEFAULT_GEOMETRY)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'stage': 'convert_to_printable_extract',
+        'restrictions': len(scaled['RealEstate']['RestrictionOnLandownership']),
+        'runs': len(times),
+        'min': min(times),
+        'mean': sum(times) / len(times),
+        'peak_memory': peak
+    }
+
+
+def _run():
+    parser = optparse.OptionParser(
+        usage='usage: %prog [options]',
+        description='Measures the conversion of a JSON extract into a mapfish print specification.'
+    )
+    parser.add_option(
+        '-c', '--configuration',
+        dest='configuration',
+        metavar='YAML',
+        type='string',
+        default='tests/resources/test_config.yml',
+        help='The configuration yaml file (default is: tests/resources/test_config.yml).'
+    )
+    parser.add_option(
+        '-s', '--section',
+        dest='section',
+        metavar='SECTION',
+        type='string',
+        default='pyramid_oereb',
+        help='The section which contains configuration (default is: pyramid_oereb).'
+    )
+    parser.add_option(
+        '-e', '--extract',
+        dest='extract',
+        metavar='JSON',
+        type='string',
+        default=DEFAULT_EXTRACT,
+        help='A rendered JSON extract (default is: {}).'.format(DEFAULT_EXTRACT)
+    )
+    parser.add_option(
+        '-f', '--factor',
+        dest='factor',
+        type='int',
+        default=10,
+        help='How many times each restriction is repeated (default is: 10).'
+    )
+    parser.add_option(
+        '-r', '--repeat',
+        dest='repeat',
+        type='int',
+        default=5,
+        help='Number of timed runs (default is: 5).'
+    )
+    options, _ = parser.parse_args()
+    if options.repeat < 1:
+        parser.error('At least one run is needed.')
+    Config.init(options.configuration, options.section)
+    with open(options.extract) as f:
+        extract = json.load(f)
+    extract = extract.get('GetExtractByIdResponse', {}).get('extract', extract)
+    print(json.dumps(run(extract, factor=options.factor, repeat=options.repeat)))
+
+
+if __name__ == '__main__':
+    _run()
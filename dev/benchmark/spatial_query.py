@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+import json
+import math
+import optparse
+import statistics
+import sys
+import timeit
+
+from geoalchemy2.shape import to_shape
+from pyramid.path import DottedNameResolver
+from shapely.geometry import Polygon
+from sqlalchemy import select, text
+
+from pyramid_oereb import database_adapter
+from pyramid_oereb.contrib.data_sources.standard.sources.plr import DatabaseSource
+from pyramid_oereb.core.config import Config
+
+MODES = ['literal', 'bound']
+"""list of str: The spatial queries compared: the real estate interpolated as WKT into the statement text
+(``literal``, as done before) and bound as WKB parameter (``bound``)."""
+
+
+def real_estate_geometry(center, radius, vertices):
+    """
+    Args:
+        center (shapely.geometry.Point): The center of the geometry.
+        radius (float): The radius of the geometry.
+        vertices (int): The number of vertices.
+
+    Returns:
+        shapely.geometry.Polygon: A regular polygon standing in for a real estate with many vertices.
+    """
+    step = 2 * math.pi / vertices
+    return Polygon([
+        (center.x + radius * math.cos(i * step), center.y + radius * math.sin(i * step))
+        for i in range(vertices)
+    ])
+
+
+def _center():
+    params = Config.get_real_estate_config()['source']['params']
+    model = DottedNameResolver().maybe_resolve(params['model'])
+    session = database_adapter.get_session(params['db_connection'])
+    try:
+        return to_shape(session.query(model).first().limit).representative_point()
+    finally:
+        session.close()
+
+
+def statement(source, geometry, mode):
+    """
+    Args:
+        source (pyramid_oereb.contrib.data_sources.standard.sources.plr.DatabaseSource): The PLR source.
+        geometry (shapely.geometry.base.BaseGeometry): The real estate geometry.
+        mode (str): One of :data:`MODES`.
+
+    Returns:
+        sqlalchemy.sql.expression.Select: The query of the related public law restrictions.
+    """
+    if mode == 'literal':
+        table = source._model_.__table__
+        clause = text("ST_Intersects({}.{}.geom, ST_GeomFromText('{}', {}))".format(
+            table.schema, table.name, geometry.wkt, Config.get('srid')))
+    else:
+        clause = source.geometry_filter(geometry)
+    return select(source._model_.public_law_restriction_id).where(clause).distinct()
+
+
+def measure(source, geometry, mode, repeat):
+    """
+    Measures the planning time reported by ``EXPLAIN`` and the wall time of a spatial query.
+
+    Args:
+        source (pyramid_oereb.contrib.data_sources.standard.sources.plr.DatabaseSource): The PLR source.
+        geometry (shapely.geometry.base.BaseGeometry): The real estate geometry.
+        mode (str): One of :data:`MODES`.
+        repeat (int): The number of runs.
+
+    Returns:
+        dict: The size of the statement text in bytes and the median planning and total time in
+        milliseconds.
+    """
+    session = source.get_session()
+    try:
+        connection = session.connection()
+        compiled = statement(source, geometry, mode).compile(dialect=connection.dialect)
+        sql = str(compiled)
+        planning = []
+        total = []
+        for _ in range(repeat):
+            plan = connection.exec_driver_sql(
+                'EXPLAIN (SUMMARY, FORMAT JSON) ' + sql, compiled.params
+            ).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            planning.append(plan[0]['Planning Time'])
+            start = timeit.default_timer()
+            connection.exec_driver_sql(sql, compiled.params).all()
+            total.append((timeit.default_timer() - start) * 1000)
+    finally:
+        session.close()
+    return {
+        'statement_bytes': len(sql.encode('utf-8')),
+        'planning_ms': statistics.median(planning),
+        'total_ms': statistics.median(total)
+    }
+
+
+def run(vertices, radius=50.0, repeat=20, themes=None):
+    """
+    Compares the spatial queries of the standard PLR sources for real estates of growing complexity.
+
+    Args:
+        vertices (list of int): The numbers of vertices of the real estate.
+        radius (float): The radius of the real estate.
+        repeat (int): The number of runs per query.
+        themes (list of str or None): The codes of the themes to measure, all standard themes if None.
+
+    Returns:
+        list of dict: The results per theme, number of vertices and mode.
+    """
+    center = _center()
+    results = []
+    for plr in Config.get('plrs'):
+        source_class = DottedNameResolver().maybe_resolve(plr['source']['class'])
+        if not issubclass(source_class, DatabaseSource) or (themes and plr['code'] not in themes):
+            continue
+        source = source_class(**plr)
+        for count in vertices:
+            geometry = real_estate_geometry(center, radius, count)
+            for mode in MODES:
+                result = {'theme': plr['code'], 'vertices': count, 'mode': mode}
+                result.update(measure(source, geometry, mode, repeat))
+                results.append(result)
+    return results
+
+
+def _format(results):
+    lines = ['{:<45} {:>8} {:>8} {:>12} {:>12} {:>12}'.format(
+        'theme', 'vertices', 'mode', 'bytes', 'planning ms', 'total ms')]
+    for result in results:
+        lines.append('{theme:<45} {vertices:>8} {mode:>8} {statement_bytes:>12} {planning_ms:>12.3f} '
+                     '{total_ms:>12.3f}'.format(**result))
+    return lines
+
+
+def _run():
+    parser = optparse.OptionParser(
+        usage='usage: %prog [options]',
+        description='Compares the parse and plan time of the spatial PLR queries with the real estate '
+                    'interpolated as WKT and bound as WKB parameter.'
+    )
+    parser.add_option(
+        '-c', '--configuration',
+        dest='configuration',
+        metavar='YAML',
+        type='string',
+        default='pyramid_oereb.yml',
+        help='The configuration yaml file (default is: pyramid_oereb.yml).'
+    )
+    parser.add_option(
+        '-s', '--section',
+        dest='section',
+        metavar='SECTION',
+        type='string',
+        default='pyramid_oereb',
+        help='The section which contains configuration (default is: pyramid_oereb).'
+    )
+    parser.add_option(
+        '--vertices',
+        dest='vertices',
+        type='string',
+        default='100,1000,5000',
+        help='Comma separated numbers of vertices of the real estate (default is: 100,1000,5000).'
+    )
+    parser.add_option(
+        '--radius',
+        dest='radius',
+        type='float',
+        default=50.0,
+        help='Radius of the real estate around the first real estate of the database (default is: 50).'
+    )
+    parser.add_option(
+        '-r', '--repeat',
+        dest='repeat',
+        type='int',
+        default=20,
+        help='Number of runs per query (default is: 20).'
+    )
+    parser.add_option(
+        '-t', '--theme',
+        dest='themes',
+        action='append',
+        help='Code of a theme to measure, can be repeated (default is all standard themes).'
+    )
+    parser.add_option(
+        '-o', '--output',
+        dest='output',
+        metavar='JSON',
+        type='string',
+        help='Write the results as JSON to this file.'
+    )
+    options, _ = parser.parse_args()
+    Config.init(options.configuration, options.section)
+    vertices = [int(count) for count in options.vertices.split(',')]
+    results = run(vertices, options.radius, options.repeat, options.themes)
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    sys.stdout.write('\n'.join(_format(results)) + '\n')
+
+
+if __name__ == '__main__':
+    _run()
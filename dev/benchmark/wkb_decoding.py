@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+import json
+import math
+import optparse
+import statistics
+import sys
+import timeit
+
+import shapely
+from geoalchemy2.elements import WKBElement
+from geoalchemy2.shape import to_shape
+from shapely.geometry import Polygon
+
+from pyramid_oereb.contrib import to_shapes
+
+MODES = ['to_shape', 'from_wkb']
+"""list of str: The decodings compared: :func:`geoalchemy2.shape.to_shape` for every element (``to_shape``,
+as done before) and :func:`pyramid_oereb.contrib.to_shapes` decoding all elements at once (``from_wkb``)."""
+
+
+def elements(count, vertices, srid=2056):
+    """
+    Args:
+        count (int): The number of geometries.
+        vertices (int): The number of vertices of every geometry.
+        srid (int): The spatial reference system of the geometries.
+
+    Returns:
+        list of geoalchemy2.elements.WKBElement: Polygons as read from the database (extended WKB as
+        returned by ``ST_AsEWKB``).
+    """
+    step = 2 * math.pi / vertices
+    result = []
+    for index in range(count):
+        x = 2600000.0 + (index % 100) * 100
+        y = 1200000.0 + (index // 100) * 100
+        polygon = shapely.set_srid(Polygon([
+            (x + 40 * math.cos(i * step), y + 40 * math.sin(i * step)) for i in range(vertices)
+        ]), srid)
+        result.append(WKBElement(memoryview(shapely.to_wkb(polygon, include_srid=True)), srid=srid,
+                                 extended=True))
+    return result
+
+
+def decode(geometries, mode):
+    """
+    Args:
+        geometries (list of geoalchemy2.elements.WKBElement): The geometries to decode.
+        mode (str): One of :data:`MODES`.
+
+    Returns:
+        list of shapely.geometry.base.BaseGeometry: The decoded geometries.
+    """
+    if mode == 'to_shape':
+        return [to_shape(geometry) for geometry in geometries]
+    return to_shapes(geometries)
+
+
+def measure(geometries, mode, repeat):
+    """
+    Args:
+        geometries (list of geoalchemy2.elements.WKBElement): The geometries to decode.
+        mode (str): One of :data:`MODES`.
+        repeat (int): The number of runs.
+
+    Returns:
+        dict: The median time of decoding all geometries and the time per geometry in microseconds.
+    """
+    durations = timeit.repeat(lambda: decode(geometries, mode), number=1, repeat=repeat)
+    median = statistics.median(durations)
+    return {
+        'total_ms': median * 1000,
+        'per_geometry_us': median * 1000000 / len(geometries)
+    }
+
+
+def run(counts, vertices=20, repeat=20):
+    """
+    Compares the decoding of the geometries of extracts of growing size.
+
+    Args:
+        counts (list of int): The numbers of geometries.
+        vertices (int): The number of vertices of every geometry.
+        repeat (int): The number of runs per decoding.
+
+    Returns:
+        list of dict: The results per number of geometries and mode.
+    """
+    results = []
+    for count in counts:
+        geometries = elements(count, vertices)
+        for mode in MODES:
+            result = {'geometries': count, 'vertices': vertices, 'mode': mode}
+            result.update(measure(geometries, mode, repeat))
+            results.append(result)
+    return results
+
+
+def _format(results):
+    lines = ['{:>10} {:>8} {:>10} {:>12} {:>16}'.format(
+        'geometries', 'vertices', 'mode', 'total ms', 'per geometry us')]
+    for result in results:
+        lines.append('{geometries:>10} {vertices:>8} {mode:>10} {total_ms:>12.3f} '
+                     '{per_geometry_us:>16.3f}'.format(**result))
+    return lines
+
+
+def _run():
+    parser = optparse.OptionParser(
+        usage='usage: %prog [options]',
+        description='Compares decoding the geometries read from the database one by one with to_shape and '
+                    'at once with shapely.from_wkb.'
+    )
+    parser.add_option(
+        '-n', '--geometries',
+        dest='counts',
+        type='string',
+        default='100,1000,10000',
+        help='Comma separated numbers of geometries (default is: 100,1000,10000).'
+    )
+    parser.add_option(
+        '--vertices',
+        dest='vertices',
+        type='int',
+        default=20,
+        help='Number of vertices of every geometry (default is: 20).'
+    )
+    parser.add_option(
+        '-r', '--repeat',
+        dest='repeat',
+        type='int',
+        default=20,
+        help='Number of runs per decoding (default is: 20).'
+    )
+    parser.add_option(
+        '-o', '--output',
+        dest='output',
+        metavar='JSON',
+        type='string',
+        help='Write the results as JSON to this file.'
+    )
+    options, _ = parser.parse_args()
+    counts = [int(count) for count in options.counts.split(',')]
+    results = run(counts, options.vertices, options.repeat)
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    sys.stdout.write('\n'.join(_format(results)) + '\n')
+
+
+if __name__ == '__main__':
+    _run()
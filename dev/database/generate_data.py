@@ -0,0 +1,590 @@
+# -*- coding: utf-8 -*-
+import binascii
+import codecs
+import csv
+import datetime
+import io
+import json
+import math
+import optparse
+import random
+
+import shapely
+from geoalchemy2 import Geometry as GeoAlchemyGeometry
+from shapely.geometry import GeometryCollection, LineString, MultiLineString, MultiPoint, MultiPolygon, \
+    Point, Polygon, box
+from sqlalchemy import Boolean, Date, DateTime, LargeBinary, create_engine
+from sqlalchemy_utils import JSONType
+
+from pyramid_oereb.core import b64
+from pyramid_oereb.core.config import Config
+from pyramid_oereb.contrib.data_sources.standard.sources.plr import StandardThemeConfigParser
+
+SYMBOL = 'iVBORw0KGgoAAAANSUhEUgAAAB4AAAAPCAIAAAB82OjLAAAAL0lEQVQ4jWNMTd3EQBvAwsDAkFPnS3VzpzRtZqK6oXAwav' \
+    'So0aNGjwCjGWlX8gEAFAQGFyQKGL4AAAAASUVORK5CYII='
+WMS = 'http://wms.example.com/?SERVICE=WMS&REQUEST=GetMap&VERSION=1.3.0&STYLES=default&CRS=EPSG:2056' \
+    '&BBOX=2475000,1065000,2850000,1300000&WIDTH=740&HEIGHT=500&FORMAT=image/png&LAYERS={}'
+PUBLISHED_FROM = datetime.date(2020, 1, 1)
+
+
+class DatabaseWriter(object):
+    """
+    Loads the rows with `COPY ... FROM STDIN` into the database, one transaction per database connection.
+    """
+
+    def __init__(self):
+        self._connections = {}
+
+    def copy(self, db_connection, statement, data):
+        """
+        Args:
+            db_connection (str): The SQLAlchemy connection string of the database.
+            statement (str): The `COPY` statement.
+            data (io.StringIO): The rows in CSV format.
+        """
+        connection = self._connections.get(db_connection)
+        if connection is None:
+            connection = self._connections[db_connection] = create_engine(db_connection).raw_connection()
+        with connection.cursor() as cursor:
+            cursor.copy_expert(statement, data)
+
+    def close(self):
+        """
+        Commits the loaded rows.
+        """
+        for connection in self._connections.values():
+            connection.commit()
+            connection.close()
+
+
+class SqlFileWriter(object):
+    """
+    Writes the `COPY` statements and their data into a file which can be loaded with psql.
+    """
+
+    def __init__(self, sql_file):
+        """
+        Args:
+            sql_file (file): The SQL file to write.
+        """
+        self._sql_file = sql_file
+
+    def copy(self, db_connection, statement, data):
+        self._sql_file.write(u'{};\n'.format(statement.replace('FROM STDIN', 'FROM stdin')))
+        self._sql_file.write(data.getvalue())
+        self._sql_file.write(u'\\.\n')
+
+    def close(self):
+        pass
+
+
+class DataGenerator(object):
+    """
+    Generates a large synthetic data set for capacity and load tests: municipalities composed of a grid of
+    parcels, and for every configured theme PLRs with geometries, documents and legend entries spread
+    over the municipalities. Themes using the standard models and themes using the interlis_2_3 models are
+    supported. The rows are loaded in bulk with `COPY`.
+
+    The main schema (themes, law status, document types, ...) has to be filled already, e.g. with the sample
+    data. Identifiers start at `id_offset` and the municipality numbers at `fosnr_offset`, so the generated
+    data does not collide with the sample data.
+    """
+
+    def __init__(self, configuration, section='pyramid_oereb', c2ctemplate_style=False, municipalities=10,
+                 parcels=1000, plr_density=0.05, geometries=2, vertices=100, parcel_vertices=12, documents=2,
+                 theme_documents=20, legend_entries=10, themes=None, seed=1, id_offset=1000000,
+                 fosnr_offset=9000, parcel_size=30.0, batch_size=10000):
+        """
+        Args:
+            configuration (str): Path to the configuration yaml file.
+            section (str): The used section within the yaml file. Default is `pyramid_oereb`.
+            c2ctemplate_style (bool): True if the yaml use a c2c template style (vars.[section]).
+            municipalities (int): The number of municipalities.
+            parcels (int): The number of parcels per municipality.
+            plr_density (float): The number of PLRs per parcel and theme.
+            geometries (int): The number of geometries per PLR.
+            vertices (int): The number of vertices per PLR geometry.
+            parcel_vertices (int): The number of vertices per parcel.
+            documents (int): The number of documents linked to each PLR.
+            theme_documents (int): The number of documents per theme the PLRs are linked to.
+            legend_entries (int): The number of legend entries per theme.
+            themes (list of str or None): The codes of the themes to generate, all configured if None.
+            seed (int): The seed of the random generator, the same seed generates the same data.
+            id_offset (int): The first generated identifier.
+            fosnr_offset (int): The number of the first municipality.
+            parcel_size (float): The side length of a parcel in meters.
+            batch_size (int): The number of rows loaded per `COPY`.
+        """
+        Config.init(configuration, section, c2ctemplate_style)
+        self.municipalities = municipalities
+        self.parcels = parcels
+        self.plr_density = plr_density
+        self.geometries = geometries
+        self.vertices = max(vertices, 4)
+        self.parcel_vertices = max(parcel_vertices, 4)
+        self.documents = min(documents, theme_documents)
+        self.theme_documents = theme_documents
+        self.legend_entries = max(legend_entries, 1)
+        self.themes = themes
+        self.fosnr_offset = fosnr_offset
+        self.parcel_size = parcel_size
+        self.batch_size = batch_size
+        self.srid = Config.get_srid()
+        self.columns = int(math.ceil(math.sqrt(parcels)))
+        self.random = random.Random(seed)
+        self._next_id = id_offset
+
+    def _id(self):
+        self._next_id += 1
+        return self._next_id
+
+    def _tile(self, index):
+        """
+        Returns:
+            tuple: The lower left corner of a municipality.
+        """
+        side = self.columns * self.parcel_size
+        per_row = int(math.ceil(math.sqrt(self.municipalities)))
+        return 2700000.0 + (index % per_row) * side, 1100000.0 + (index // per_row) * side
+
+    def _densify(self, x, y, width, height, vertices):
+        """
+        Returns:
+            Polygon: A rectangle with additional vertices on its edges.
+        """
+        per_side = max(vertices // 4, 1)
+        ring = []
+        for (x0, y0), (x1, y1) in [
+            ((x, y), (x + width, y)),
+            ((x + width, y), (x + width, y + height)),
+            ((x + width, y + height), (x, y + height)),
+            ((x, y + height), (x, y))
+        ]:
+            for i in range(per_side):
+                ring.append((x0 + (x1 - x0) * i / per_side, y0 + (y1 - y0) * i / per_side))
+        return Polygon(ring)
+
+    def _plr_geometry(self, geometry_type, x, y, side):
+        """
+        Returns:
+            shapely.geometry.base.BaseGeometry: A random geometry within the municipality, matching the
+            configured geometry type.
+        """
+        center_x = x + self.random.uniform(0, side)
+        center_y = y + self.random.uniform(0, side)
+        radius = self.random.uniform(0.5, 3.0) * self.parcel_size
+        geometry_type = (geometry_type or 'POLYGON').upper()
+        if 'POINT' in geometry_type:
+            geometry = Point(center_x, center_y)
+            return MultiPoint([geometry]) if geometry_type == 'MULTIPOINT' else geometry
+        if 'LINE' in geometry_type:
+            angle = self.random.uniform(0, math.pi)
+            geometry = LineString([
+                (center_x + (i / (self.vertices - 1.0) - 0.5) * 4 * radius * math.cos(angle),
+                 center_y + (i / (self.vertices - 1.0) - 0.5) * 4 * radius * math.sin(angle)
+                 + math.sin(i) * self.parcel_size * 0.1)
+                for i in range(self.vertices)
+            ])
+            return MultiLineString([geometry]) if geometry_type == 'MULTILINESTRING' else geometry
+        step = 2 * math.pi / self.vertices
+        geometry = Polygon([
+            (center_x + radius * (1 + 0.2 * math.sin(3 * i * step)) * math.cos(i * step),
+             center_y + radius * (1 + 0.2 * math.sin(3 * i * step)) * math.sin(i * step))
+            for i in range(self.vertices)
+        ])
+        if geometry_type == 'MULTIPOLYGON':
+            return MultiPolygon([geometry])
+        if geometry_type == 'GEOMETRYCOLLECTION':
+            return GeometryCollection([geometry])
+        return geometry
+
+    def _format(self, column, value):
+        if value is None:
+            return None
+        if isinstance(column.type, GeoAlchemyGeometry):
+            return shapely.to_wkb(shapely.set_srid(value, self.srid), hex=True, include_srid=True)
+        if isinstance(column.type, JSONType):
+            return json.dumps(value, ensure_ascii=False)
+        if isinstance(column.type, LargeBinary):
+            return '\\x' + binascii.hexlify(value).decode('ascii')
+        if isinstance(column.type, Boolean):
+            return 't' if value else 'f'
+        if isinstance(column.type, (Date, DateTime)):
+            return value.isoformat()
+        return value
+
+    def _copy(self, db_connection, class_, rows):
+        """
+        Loads the rows of a model in batches.
+
+        Args:
+            db_connection (str): The connection string of the database.
+            class_ (sqlalchemy.orm.DeclarativeMeta): The model, the keys of the rows are its attribute names.
+            rows (iterable of dict): The rows to load.
+        """
+        table = class_.__table__
+        columns = class_.__mapper__.columns
+        batch = []
+        keys = None
+        for row in rows:
+            if keys is None:
+                keys = list(row.keys())
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                self._copy_batch(db_connection, table, [columns[key] for key in keys], keys, batch)
+                batch = []
+        if batch:
+            self._copy_batch(db_connection, table, [columns[key] for key in keys], keys, batch)
+
+    def _copy_batch(self, db_connection, table, columns, keys, batch):
+        data = io.StringIO()
+        writer = csv.writer(data, lineterminator='\n')
+        for row in batch:
+            writer.writerow([self._format(column, row[key]) for column, key in zip(columns, keys)])
+        data.seek(0)
+        statement = 'COPY {}.{} ({}) FROM STDIN WITH (FORMAT csv)'.format(
+            table.schema, table.name, ', '.join('"{}"'.format(column.name) for column in columns)
+        )
+        self.writer.copy(db_connection, statement, data)
+
+    def _main(self, db_connection, theme_codes):
+        from pyramid_oereb.contrib.data_sources.standard.models.main import Availability, Municipality, \
+            RealEstate
+
+        municipalities = []
+        real_estates = []
+        for index in range(self.municipalities):
+            fosnr = self.fosnr_offset + index
+            x, y = self._tile(index)
+            side = self.columns * self.parcel_size
+            municipalities.append({
+                'fosnr': fosnr,
+                'name': u'Gemeinde {}'.format(fosnr),
+                'published': True,
+                'geom': MultiPolygon([box(x, y, x + side, y + side)])
+            })
+            for parcel in range(self.parcels):
+                parcel_x = x + (parcel % self.columns) * self.parcel_size
+                parcel_y = y + (parcel // self.columns) * self.parcel_size
+                real_estates.append({
+                    'id': self._id(),
+                    'identdn': u'GE{:04d}{:06d}'.format(fosnr % 10000, parcel),
+                    'number': str(parcel + 1),
+                    'egrid': u'CH9{:04d}{:07d}'.format(fosnr % 10000, parcel),
+                    'type': u'Liegenschaft',
+                    'canton': u'GE',
+                    'municipality': u'Gemeinde {}'.format(fosnr),
+                    'fosnr': fosnr,
+                    'land_registry_area': int(self.parcel_size * self.parcel_size),
+                    'limit': MultiPolygon([self._densify(
+                        parcel_x, parcel_y, self.parcel_size, self.parcel_size, self.parcel_vertices
+                    )])
+                })
+        self._copy(db_connection, Municipality, municipalities)
+        self._copy(db_connection, RealEstate, real_estates)
+        self._copy(db_connection, Availability, (
+            {
+                'id': str(self._id()),
+                'municipality_fosnr': municipality['fosnr'],
+                'theme_code': code,
+                'available': True
+            }
+            for municipality in municipalities for code in theme_codes
+        ))
+
+    def _plrs(self, geometry_type):
+        """
+        Yields:
+            tuple: The index of the municipality, the index of the PLR in it and its geometries.
+        """
+        side = self.columns * self.parcel_size
+        per_municipality = int(round(self.parcels * self.plr_density))
+        for index in range(self.municipalities):
+            x, y = self._tile(index)
+            for plr in range(per_municipality):
+                yield index, plr, [
+                    self._plr_geometry(geometry_type, x, y, side) for _ in range(self.geometries)
+                ]
+
+    def _standard_theme(self, plr_config, models):
+        db_connection = plr_config['source']['params']['db_connection']
+        code = plr_config['code']
+        office_id = self._id()
+        view_service_id = self._id()
+        legend_ids = [self._id() for _ in range(self.legend_entries)]
+        document_ids = [self._id() for _ in range(self.theme_documents)]
+        self._copy(db_connection, models.Office, [{
+            'id': office_id,
+            'name': {u'de': u'Amt für {}'.format(code)},
+            'office_at_web': {u'de': u'https://example.com/{}'.format(code)}
+        }])
+        self._copy(db_connection, models.ViewService, [{
+            'id': view_service_id,
+            'reference_wms': {u'de': WMS.format(code)},
+            'layer_index': 1,
+            'layer_opacity': 0.75
+        }])
+        self._copy(db_connection, models.LegendEntry, ({
+            'id': legend_id,
+            'symbol': SYMBOL,
+            'legend_text': {u'de': u'Legende {}'.format(i)},
+            'type_code': u'Typ{}'.format(i),
+            'type_code_list': u'https://example.com/{}/types'.format(code),
+            'theme': code,
+            'view_service_id': view_service_id
+        } for i, legend_id in enumerate(legend_ids)))
+        self._copy(db_connection, models.Document, ({
+            'id': document_id,
+            'document_type': u'Rechtsvorschrift',
+            'index': i,
+            'law_status': u'inKraft',
+            'title': {u'de': u'Dokument {} {}'.format(code, i)},
+            'office_id': office_id,
+            'published_from': PUBLISHED_FROM,
+            'text_at_web': {u'de': u'https://example.com/{}/documents/{}.pdf'.format(code, i)},
+            'abbreviation': {u'de': u'D{}'.format(i)},
+            'official_number': {u'de': u'{}.{}'.format(code, i)}
+        } for i, document_id in enumerate(document_ids)))
+
+        plrs = []
+        geometries = []
+        links = []
+        for _, _, plr_geometries in self._plrs(plr_config.get('geometry_type')):
+            plr_id = self._id()
+            plrs.append({
+                'id': plr_id,
+                'law_status': u'inKraft',
+                'published_from': PUBLISHED_FROM,
+                'view_service_id': view_service_id,
+                'office_id': office_id,
+                'legend_entry_id': self.random.choice(legend_ids)
+            })
+            for geometry in plr_geometries:
+                geometries.append({
+                    'id': self._id(),
+                    'law_status': u'inKraft',
+                    'published_from': PUBLISHED_FROM,
+                    'geom': geometry,
+                    'public_law_restriction_id': plr_id
+                })
+            for document_id in self.random.sample(document_ids, self.documents):
+                links.append({
+                    'id': self._id(),
+                    'public_law_restriction_id': plr_id,
+                    'document_id': document_id
+                })
+        self._copy(db_connection, models.PublicLawRestriction, plrs)
+        self._copy(db_connection, models.Geometry, geometries)
+        self._copy(db_connection, models.PublicLawRestrictionDocument, links)
+        return len(plrs), len(geometries)
+
+    def _interlis_theme(self, plr_config, models):
+        db_connection = plr_config['source']['params']['db_connection']
+        code = plr_config['code']
+        office_id = self._id()
+        view_service_id = self._id()
+        legend_ids = [self._id() for _ in range(self.legend_entries)]
+        document_ids = [self._id() for _ in range(self.theme_documents)]
+        symbol = b64.decode(SYMBOL)
+        self._copy(db_connection, models.Office, [{
+            't_id': office_id,
+            'name_de': u'Amt für {}'.format(code)
+        }])
+        self._copy(db_connection, models.ViewService, [{'t_id': view_service_id}])
+        self._copy(db_connection, models.LegendEntry, ({
+            't_id': legend_id,
+            'symbol': symbol,
+            'legend_text_de': u'Legende {}'.format(i),
+            'type_code': u'Typ{}'.format(i),
+            'type_code_list': u'https://example.com/{}/types'.format(code),
+            'theme': code,
+            'view_service_id': view_service_id
+        } for i, legend_id in enumerate(legend_ids)))
+        self._copy(db_connection, models.Document, ({
+            't_id': document_id,
+            'document_type': u'Rechtsvorschrift',
+            'title_de': u'Dokument {} {}'.format(code, i),
+            'abbreviation_de': u'D{}'.format(i),
+            'official_number_de': u'{}.{}'.format(code, i),
+            'index': i,
+            'law_status': u'inKraft',
+            'published_from': PUBLISHED_FROM,
+            'office_id': office_id
+        } for i, document_id in enumerate(document_ids)))
+        uris = [(self._id(), None, view_service_id, WMS.format(code))] + [
+            (self._id(), document_id, None, u'https://example.com/{}/documents/{}.pdf'.format(code, i))
+            for i, document_id in enumerate(document_ids)
+        ]
+        self._copy(db_connection, models.MultilingualUri, ({
+            't_id': uri_id,
+            't_seq': 0,
+            'document_id': document_id,
+            'view_service_id': uri_view_service_id
+        } for uri_id, document_id, uri_view_service_id, _ in uris))
+        self._copy(db_connection, models.LocalisedUri, ({
+            't_id': self._id(),
+            't_seq': 0,
+            'language': u'de',
+            'text': text,
+            'multilingualuri_id': uri_id
+        } for uri_id, _, _, text in uris))
+
+        geometry_type = (plr_config.get('geometry_type') or 'POLYGON').upper()
+        if 'POINT' in geometry_type:
+            geometry_type, geometry_key = 'POINT', 'point'
+        elif 'LINE' in geometry_type:
+            geometry_type, geometry_key = 'LINESTRING', 'line'
+        else:
+            geometry_type, geometry_key = 'POLYGON', 'surface'
+        plrs = []
+        geometries = []
+        links = []
+        for _, _, plr_geometries in self._plrs(geometry_type):
+            plr_id = self._id()
+            plrs.append({
+                't_id': plr_id,
+                'law_status': u'inKraft',
+                'published_from': PUBLISHED_FROM,
+                'view_service_id': view_service_id,
+                'legend_entry_id': self.random.choice(legend_ids),
+                'office_id': office_id
+            })
+            for geometry in plr_geometries:
+                geometries.append({
+                    't_id': self._id(),
+                    geometry_key: geometry,
+                    'law_status': u'inKraft',
+                    'published_from': PUBLISHED_FROM,
+                    'public_law_restriction_id': plr_id
+                })
+            for document_id in self.random.sample(document_ids, self.documents):
+                links.append({
+                    't_id': self._id(),
+                    'public_law_restriction_id': plr_id,
+                    'document_id': document_id
+                })
+        self._copy(db_connection, models.PublicLawRestriction, plrs)
+        self._copy(db_connection, models.Geometry, geometries)
+        self._copy(db_connection, models.PublicLawRestrictionDocument, links)
+        return len(plrs), len(geometries)
+
+    def generate(self, writer):
+        """
+        Generates the data set.
+
+        Args:
+            writer (DatabaseWriter or SqlFileWriter): Receives the `COPY` statements.
+        """
+        self.writer = writer
+        plr_configs = [
+            plr_config for plr_config in Config.get('plrs')
+            if self.themes is None or plr_config['code'] in self.themes
+        ]
+        print('Generate {} municipalities with {} parcels each.'.format(self.municipalities, self.parcels))
+        self._main(Config.get('app_schema').get('db_connection'), [plr['code'] for plr in plr_configs])
+        for plr_config in plr_configs:
+            models = StandardThemeConfigParser(**plr_config).get_models()
+            if hasattr(models, 'MultilingualUri'):
+                nb_plrs, nb_geometries = self._interlis_theme(plr_config, models)
+            else:
+                nb_plrs, nb_geometries = self._standard_theme(plr_config, models)
+            print('Generate theme {}: {} PLRs, {} geometries.'.format(plr_config['code'], nb_plrs,
+                                                                      nb_geometries))
+        writer.close()
+
+
+def _run():
+    """
+    Generates a large synthetic data set for load tests. Check 'generate_data --help' for available options.
+    """
+    parser = optparse.OptionParser(
+        usage='usage: %prog [options]',
+        description='Generates a large synthetic data set and loads it with COPY into the configured '
+                    'database. The main schema has to contain the sample data already.'
+    )
+    parser.add_option(
+        '-c', '--configuration',
+        dest='configuration',
+        metavar='YAML',
+        type='string',
+        help='The absolute path to the configuration yaml file.'
+    )
+    parser.add_option(
+        '-s', '--section',
+        dest='section',
+        metavar='SECTION',
+        type='string',
+        default='pyramid_oereb',
+        help='The section which contains configuration (default is: pyramid_oereb).'
+    )
+    parser.add_option(
+        '--c2ctemplate-style',
+        dest='c2ctemplate_style',
+        action='store_true',
+        default=False,
+        help='Is the yaml file using a c2ctemplate style (starting with vars)'
+    )
+    parser.add_option(
+        '-t', '--theme',
+        dest='themes',
+        action='append',
+        help='The code of a theme to generate, can be repeated (default is all configured themes).'
+    )
+    for option, option_type, default, description in [
+        ('municipalities', 'int', 10, 'Number of municipalities'),
+        ('parcels', 'int', 1000, 'Number of parcels per municipality'),
+        ('plr-density', 'float', 0.05, 'Number of PLRs per parcel and theme'),
+        ('geometries', 'int', 2, 'Number of geometries per PLR'),
+        ('vertices', 'int', 100, 'Number of vertices per PLR geometry'),
+        ('parcel-vertices', 'int', 12, 'Number of vertices per parcel'),
+        ('documents', 'int', 2, 'Number of documents linked to each PLR'),
+        ('theme-documents', 'int', 20, 'Number of documents per theme'),
+        ('legend-entries', 'int', 10, 'Number of legend entries per theme'),
+        ('seed', 'int', 1, 'Seed of the random generator'),
+        ('id-offset', 'int', 1000000, 'First generated identifier'),
+        ('fosnr-offset', 'int', 9000, 'Number of the first municipality'),
+        ('batch-size', 'int', 10000, 'Number of rows per COPY')
+    ]:
+        parser.add_option(
+            '--{}'.format(option),
+            dest=option.replace('-', '_'),
+            type=option_type,
+            default=default,
+            help='{} (default is: {}).'.format(description, default)
+        )
+    parser.add_option(
+        '--sql-file',
+        type='string',
+        help='Generate an SQL file to be loaded with psql instead of loading the data directly.'
+    )
+    options, args = parser.parse_args()
+    if not options.configuration:
+        parser.error('No configuration file set.')
+    generator = DataGenerator(
+        options.configuration,
+        section=options.section,
+        c2ctemplate_style=options.c2ctemplate_style,
+        municipalities=options.municipalities,
+        parcels=options.parcels,
+        plr_density=options.plr_density,
+        geometries=options.geometries,
+        vertices=options.vertices,
+        parcel_vertices=options.parcel_vertices,
+        documents=options.documents,
+        theme_documents=options.theme_documents,
+        legend_entries=options.legend_entries,
+        themes=options.themes,
+        seed=options.seed,
+        id_offset=options.id_offset,
+        fosnr_offset=options.fosnr_offset,
+        batch_size=options.batch_size
+    )
+    if options.sql_file is None:
+        generator.generate(DatabaseWriter())
+    else:
+        with codecs.open(options.sql_file, mode='w', encoding='utf-8') as sql_file:
+            generator.generate(SqlFileWriter(sql_file))
+
+
+if __name__ == '__main__':
+    _run()
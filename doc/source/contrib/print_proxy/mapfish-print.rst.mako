@@ -18,6 +18,50 @@ configuration.
     print:
         split_sub_themes: true
 
+Concurrency limit
+.................
+
+To protect the print server and the rest of the application from bursts of PDF requests, the number of
+print jobs running at the same time can be limited. Requests exceeding the limit wait in a bounded queue;
+when the queue is full or the wait times out, the request is answered with ``503 Service Unavailable`` and a
+``Retry-After`` header. The print server is called through a pooled HTTP session using the configured timeouts.
+
+.. code-block:: yaml
+
+    print:
+        max_concurrent_prints: 4
+        max_queued_prints: 8
+        print_queue_timeout: 30
+        retry_after: 10
+        connect_timeout: 10
+        read_timeout: 120
+
+Archive
+.......
+
+Generated PDF extracts can be kept in an archive directory. Files are written by a background thread and
+stored by the SHA-256 of their content, so identical files exist only once. An SQLite index
+(``index.sqlite``) records each archived extract with the EGRID, IdentDN and number of the real estate, the
+requested topics, the language and the data version. The data version is a hash of the print
+specification without the creation date and the extract identifier.
+
+With ``reuse`` enabled, a request whose data version matches an archived extract gets the archived PDF
+instead of a new print. Note that the reused PDF keeps the creation date and the extract identifier of
+the original extract, it is not a new extract with its own identifier. ``reuse_max_age`` limits the reuse
+to extracts archived at most that many seconds ago (default is one day, 86400).
+
+.. code-block:: yaml
+
+    print:
+        archive:
+            path: /var/lib/pyramid_oereb/archive
+            queue_size: 100
+            reuse: false
+            reuse_max_age: 86400
+
+The older setting ``pdf_archive_path`` of the ``print`` section, which writes every PDF into a directory in
+the request thread, is deprecated in favour of the archive.
+
 Sorting
 .......
 
@@ -1,9 +1,135 @@
 # -*- coding: utf-8 -*-
 
 import logging
+import threading
+from collections import OrderedDict
+from datetime import date
+
+import shapely
+from geoalchemy2.elements import WKBElement
+from geoalchemy2.functions import ST_GeomFromWKB
+from geoalchemy2.shape import to_shape
+from sqlalchemy import LargeBinary, and_, bindparam, literal, or_
 
 log = logging.getLogger(__name__)
 
+_geometry_parameters = OrderedDict()
+_geometry_parameters_lock = threading.Lock()
+_geometry_parameters_size = 16
+
+
+def geometry_parameter(geometry, srid):
+    """
+    Returns the geometry as expression of a bound WKB parameter, to be used in spatial queries. The
+    statement text therefore does not depend on the geometry and the WKB is sent once, even if the
+    expression is used several times in a statement. The expressions of the recently used geometry objects
+    are kept, so the WKB of the real estate is only created once per extract and not for every theme.
+
+    Args:
+        geometry (shapely.geometry.base.BaseGeometry): The geometry.
+        srid (int): The spatial reference system of the geometry.
+
+    Returns:
+        geoalchemy2.functions.ST_GeomFromWKB: The geometry expression.
+    """
+    key = (id(geometry), srid)
+    with _geometry_parameters_lock:
+        cached = _geometry_parameters.get(key)
+        if cached is not None and cached[0] is geometry:
+            _geometry_parameters.move_to_end(key)
+            return cached[1]
+    expression = ST_GeomFromWKB(
+        bindparam('geometry', geometry.wkb, type_=LargeBinary, unique=True),
+        literal(srid)
+    )
+    with _geometry_parameters_lock:
+        _geometry_parameters[key] = (geometry, expression)
+        while len(_geometry_parameters) > _geometry_parameters_size:
+            _geometry_parameters.popitem(last=False)
+    return expression
+
+
+def to_shapes(elements):
+    """
+    Converts geometries read from the database to shapely geometries. The WKB of all elements is decoded
+    at once by the vectorized :func:`shapely.from_wkb` instead of calling
+    :func:`geoalchemy2.shape.to_shape` for every element.
+
+    Args:
+        elements (iterable of geoalchemy2.elements.WKBElement or geoalchemy2.elements.WKTElement or None):
+            The geometries as read from the database.
+
+    Returns:
+        list of shapely.geometry.base.BaseGeometry or None: The geometries in the order of the elements,
+        None for the missing ones.
+    """
+    shapes = []
+    wkb_indexes = []
+    wkb = []
+    for index, element in enumerate(elements):
+        if isinstance(element, WKBElement):
+            wkb_indexes.append(index)
+            wkb.append(element.data if isinstance(element.data, str) else bytes(element.data))
+            shapes.append(None)
+        else:
+            shapes.append(None if element is None else to_shape(element))
+    if wkb:
+        for index, shape in zip(wkb_indexes, shapely.from_wkb(wkb).tolist()):
+            shapes[index] = shape
+    return shapes
+
+
+def get_reference_date(params):
+    """
+    Args:
+        params (pyramid_oereb.core.views.webservice.Parameter or None): The parameters of the extract request.
+
+    Returns:
+        datetime.date: The date the publication is checked against, the reference date of the extract if
+        available, otherwise the current date.
+    """
+    return getattr(params, 'reference_date', None) or date.today()
+
+
+def published_filter(model, reference_date):
+    """
+    Creates the filter of the rows published at the reference date, the database counterpart of the
+    `published` property of the records.
+
+    Args:
+        model (sqlalchemy.orm.decl_api.DeclarativeMeta): The model with the columns `published_from` and
+            `published_until`.
+        reference_date (datetime.date): The date the publication is checked against.
+
+    Returns:
+        sqlalchemy.sql.elements.BooleanClauseList: The filter clause.
+    """
+    return and_(
+        model.published_from <= reference_date,
+        or_(model.published_until.is_(None), model.published_until >= reference_date)
+    )
+
+
+def document_filter(document_model, reference_date, fosnr):
+    """
+    Creates the filter of the documents published at the reference date and relevant for the
+    municipality, the database counterpart of
+    :meth:`pyramid_oereb.core.processor.Processor.filter_published_documents` and
+    :meth:`pyramid_oereb.core.processor.Processor.filter_documents_by_fosnr`.
+
+    Args:
+        document_model (sqlalchemy.orm.decl_api.DeclarativeMeta): The document model.
+        reference_date (datetime.date): The date the publication is checked against.
+        fosnr (int): The fosnr (= id bfs) of the municipality of the real estate.
+
+    Returns:
+        sqlalchemy.sql.elements.BooleanClauseList: The filter clause.
+    """
+    return and_(
+        published_filter(document_model, reference_date),
+        or_(document_model.only_in_municipality.is_(None), document_model.only_in_municipality == fosnr)
+    )
+
 
 def eliminate_duplicated_document_records(main_document_records, plr_document_records):
     """ Filtering of document records that are associated to a plr.
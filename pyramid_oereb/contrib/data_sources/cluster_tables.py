@@ -0,0 +1,349 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+import optparse
+import sys
+
+from geoalchemy2.functions import ST_Intersects
+from geoalchemy2.types import Geometry
+from pyramid.path import DottedNameResolver
+from sqlalchemy import func, or_, select, text
+from sqlalchemy.dialects import postgresql
+
+from pyramid_oereb import database_adapter
+from pyramid_oereb.contrib import geometry_parameter
+from pyramid_oereb.contrib.data_sources.index_advisor import sample_real_estates
+from pyramid_oereb.contrib.data_sources.standard import recommended_indexes, create_index_sql
+from pyramid_oereb.core.config import Config
+from pyramid_oereb.core.sources import BaseDatabaseSource
+
+logging.basicConfig()
+log = logging.getLogger(__name__)
+
+METHODS = ['geohash', 'gist']
+"""list of str: The orders the rows are rewritten in: along the Z-order curve of the geohash of the geometry
+centroids (``geohash``) or along the GiST index of the geometry (``gist``)."""
+
+
+def geometry_columns(table):
+    """
+    Args:
+        table (sqlalchemy.schema.Table): The table object from sqlalchemy.
+
+    Returns:
+        list of sqlalchemy.schema.Column: The geometry columns of the table.
+    """
+    return [column for column in table.columns if isinstance(column.type, Geometry)]
+
+
+def spatial_tables(themes=None, real_estate=True):
+    """
+    Collects the tables with geometries of the themes read from a database with the standard, OEREBlex or
+    INTERLIS models and the real estate table.
+
+    Args:
+        themes (list of str or None): The codes of the themes, all database themes if None.
+        real_estate (bool): True to include the real estate table.
+
+    Returns:
+        list of tuple: The database connection string and the table object of every table.
+    """
+    result = []
+    names = set()
+    if real_estate:
+        params = Config.get_real_estate_config()['source']['params']
+        model = DottedNameResolver().maybe_resolve(params['model'])
+        result.append((params['db_connection'], model.__table__))
+        names.add(model.__table__.fullname)
+    for plr in Config.get('plrs'):
+        source_class = DottedNameResolver().maybe_resolve(plr['source']['class'])
+        if not issubclass(source_class, BaseDatabaseSource) or (themes and plr['code'] not in themes):
+            continue
+        models = getattr(source_class(**plr), 'models', None)
+        if models is None:
+            log.info('Skipping theme {0}, its source has no models.'.format(plr['code']))
+            continue
+        for table in models.Base.metadata.sorted_tables:
+            if geometry_columns(table) and table.fullname not in names:
+                result.append((plr['source']['params']['db_connection'], table))
+                names.add(table.fullname)
+    return result
+
+
+def geometry_column(connection, table):
+    """
+    Args:
+        connection (sqlalchemy.engine.Connection): The connection to the database.
+        table (sqlalchemy.schema.Table): The table object from sqlalchemy.
+
+    Returns:
+        sqlalchemy.schema.Column: The geometry column of the table with the most rows not being null, e.g.
+        the surfaces instead of the mostly empty points of the INTERLIS geometry tables.
+    """
+    columns = geometry_columns(table)
+    if len(columns) == 1:
+        return columns[0]
+    counts = connection.execute(select(*[func.count(column) for column in columns])).one()
+    return max(zip(columns, counts), key=lambda item: item[1])[0]
+
+
+def gist_index(connection, table, column):
+    """
+    Args:
+        connection (sqlalchemy.engine.Connection): The connection to the database.
+        table (sqlalchemy.schema.Table): The table object from sqlalchemy.
+        column (sqlalchemy.schema.Column): The geometry column of the table.
+
+    Returns:
+        str or None: The name of the GiST index on the geometry column of the table, None if the column
+        has none.
+    """
+    return connection.execute(text(
+        'SELECT c.relname FROM pg_index i '
+        'JOIN pg_class c ON c.oid = i.indexrelid '
+        'JOIN pg_am am ON am.oid = c.relam '
+        'JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0] '
+        'WHERE i.indrelid = to_regclass(:table) AND am.amname = \'gist\' AND a.attname = :column'
+    ), {
+        'table': connection.dialect.identifier_preparer.format_table(table),
+        'column': column.name
+    }).scalar()
+
+
+def cluster_statements(table, method='geohash', index_name=None, column=None):
+    """
+    Creates the statements rewriting the table in spatial order and refreshing its statistics.
+
+    The ``geohash`` method clusters the table on a temporary index of the geohash of the centroid of the
+    geometry (the first one not being null for tables with several geometry columns), which orders the
+    rows along a Z-order curve. The ``gist`` method clusters the table on the GiST index of a geometry
+    column, which is created if missing.
+
+    Args:
+        table (sqlalchemy.schema.Table): The table object from sqlalchemy.
+        method (str): One of :data:`METHODS`.
+        index_name (str or None): The name of the existing GiST index, used by the ``gist`` method.
+        column (sqlalchemy.schema.Column or None): The geometry column used by the ``gist`` method (see
+            :func:`geometry_column`), the first geometry column of the table if None.
+
+    Returns:
+        list of str: The statements to execute.
+    """
+    preparer = postgresql.dialect().identifier_preparer
+    table_name = preparer.format_table(table)
+    columns = [preparer.quote(geometry.name) for geometry in geometry_columns(table)]
+    statements = []
+    if method == 'geohash':
+        index_name = 'idx_{0}_cluster'.format(table.name)
+        geometry = columns[0] if len(columns) == 1 else 'COALESCE({0})'.format(', '.join(columns))
+        statements.append('CREATE INDEX {0} ON {1} ({2});'.format(
+            preparer.quote(index_name),
+            table_name,
+            'ST_GeoHash(ST_Transform(ST_Centroid({0}), 4326))'.format(geometry)
+        ))
+        statements.append('CLUSTER {0} USING {1};'.format(table_name, preparer.quote(index_name)))
+        if table.schema:
+            statements.append('DROP INDEX {0}.{1};'.format(
+                preparer.quote_schema(table.schema), preparer.quote(index_name)
+            ))
+        else:
+            statements.append('DROP INDEX {0};'.format(preparer.quote(index_name)))
+    elif method == 'gist':
+        if index_name is None:
+            name = geometry_columns(table)[0].name if column is None else column.name
+            index = [
+                index for index in recommended_indexes(table)
+                if index['using'] == 'gist' and index['column'] == name
+            ][0]
+            index_name = index['name']
+            statements.append(create_index_sql(index, if_not_exists=True))
+        statements.append('CLUSTER {0} USING {1};'.format(table_name, preparer.quote(index_name)))
+    else:
+        raise ValueError('Unknown cluster method {0}, use one of {1}.'.format(method, ', '.join(METHODS)))
+    statements.append('ANALYZE {0};'.format(table_name))
+    return statements
+
+
+def measure(connection, table, geometries, srid):
+    """
+    Measures the spatial lookup of the rows of the table related to the geometries.
+
+    Args:
+        connection (sqlalchemy.engine.Connection): The connection to the database.
+        table (sqlalchemy.schema.Table): The table object from sqlalchemy.
+        geometries (list of shapely.geometry.base.BaseGeometry): The geometries to look up, e.g. the
+            limits of sample real estates.
+        srid (int): The spatial reference system of the geometries.
+
+    Returns:
+        dict: The number of pages (shared blocks hit or read) and the execution time in milliseconds of the
+        lookups, summed up over the geometries.
+    """
+    result = {'blocks': 0, 'execution_ms': 0.0}
+    for geometry in geometries:
+        parameter = geometry_parameter(geometry, srid)
+        statement = select(table).where(
+            or_(*[ST_Intersects(column, parameter) for column in geometry_columns(table)])
+        )
+        compiled = statement.compile(dialect=connection.dialect)
+        plan = connection.exec_driver_sql(
+            'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + str(compiled), compiled.params
+        ).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        result['blocks'] += plan[0]['Plan']['Shared Hit Blocks'] + plan[0]['Plan']['Shared Read Blocks']
+        result['execution_ms'] += plan[0]['Execution Time']
+    return result
+
+
+def cluster_table(db_connection, table, method='geohash', geometries=None):
+    """
+    Rewrites the table in spatial order and refreshes its statistics. The table is locked exclusively
+    while it is rewritten.
+
+    Args:
+        db_connection (str): The database connection string.
+        table (sqlalchemy.schema.Table): The table object from sqlalchemy.
+        method (str): One of :data:`METHODS`.
+        geometries (list of shapely.geometry.base.BaseGeometry or None): The geometries to measure the
+            spatial lookup with before and after clustering, no measurement if None.
+
+    Returns:
+        dict: The table name and the measurements before and after clustering (see :func:`measure`).
+    """
+    result = {'table': table.fullname}
+    session = database_adapter.get_session(db_connection)
+    try:
+        connection = session.connection()
+        if geometries:
+            result['before'] = measure(connection, table, geometries, Config.get('srid'))
+        column = index_name = None
+        if method == 'gist':
+            column = geometry_column(connection, table)
+            index_name = gist_index(connection, table, column)
+        for statement in cluster_statements(table, method, index_name, column):
+            log.info(statement)
+            connection.exec_driver_sql(statement)
+        session.commit()
+        if geometries:
+            result['after'] = measure(session.connection(), table, geometries, Config.get('srid'))
+            session.rollback()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    return result
+
+
+def cluster_tables_(themes=None, real_estate=True, method='geohash', count=0):
+    """
+    Rewrites the geometry tables of the themes and the real estate table in spatial order, e.g. after the
+    data integration, so the spatial lookups of an extract read fewer pages.
+
+    Args:
+        themes (list of str or None): The codes of the themes, all database themes if None.
+        real_estate (bool): True to include the real estate table.
+        method (str): One of :data:`METHODS`.
+        count (int): The number of sample real estates to measure the spatial lookups with before and after
+            clustering, no measurement if 0.
+
+    Returns:
+        list of dict: The result of every table (see :func:`cluster_table`).
+    """
+    if method not in METHODS:
+        raise ValueError('Unknown cluster method {0}, use one of {1}.'.format(method, ', '.join(METHODS)))
+    geometries = [real_estate_record.limit for real_estate_record in sample_real_estates(count)] \
+        if count else None
+    return [
+        cluster_table(db_connection, table, method, geometries)
+        for db_connection, table in spatial_tables(themes, real_estate)
+    ]
+
+
+def _format(results):
+    lines = []
+    for result in results:
+        if 'before' in result:
+            lines.append('{0}: {1} -> {2} pages, {3:.3f} -> {4:.3f} ms'.format(
+                result['table'],
+                result['before']['blocks'],
+                result['after']['blocks'],
+                result['before']['execution_ms'],
+                result['after']['execution_ms']
+            ))
+        else:
+            lines.append('{0}: clustered'.format(result['table']))
+    return lines
+
+
+def cluster_tables():
+    parser = optparse.OptionParser(
+        usage='usage: %prog [options]',
+        description='Rewrites the geometry tables of the themes and the real estate table in spatial order '
+                    'and refreshes their statistics.'
+    )
+    parser.add_option(
+        '-c', '--configuration',
+        dest='configuration',
+        metavar='YAML',
+        type='string',
+        help='The absolute path to the configuration yaml file.'
+    )
+    parser.add_option(
+        '-s', '--section',
+        dest='section',
+        metavar='SECTION',
+        type='string',
+        default='pyramid_oereb',
+        help='The section which contains configuration (default is: pyramid_oereb).'
+    )
+    parser.add_option(
+        '--c2ctemplate-style',
+        dest='c2ctemplate_style',
+        action='store_true',
+        default=False,
+        help='Is the yaml file using a c2ctemplate style (starting with vars)'
+    )
+    parser.add_option(
+        '-t', '--theme',
+        dest='themes',
+        action='append',
+        help='Code of a theme to cluster, can be repeated (default is all database themes).'
+    )
+    parser.add_option(
+        '--no-real-estate',
+        dest='real_estate',
+        action='store_false',
+        default=True,
+        help='Use this flag to skip the real estate table.'
+    )
+    parser.add_option(
+        '--method',
+        dest='method',
+        type='choice',
+        choices=METHODS,
+        default='geohash',
+        help='The spatial order: geohash (Z-order curve) or gist (GiST index) (default is: geohash).'
+    )
+    parser.add_option(
+        '-m', '--measure',
+        dest='count',
+        type='int',
+        default=0,
+        help='Number of sample real estates to measure the spatial lookups with before and after '
+             'clustering (default is: 0, no measurement).'
+    )
+    options, args = parser.parse_args()
+    if not options.configuration:
+        parser.error('No configuration file set.')
+
+    if Config.get_config() is None:
+        Config.init(
+            options.configuration,
+            options.section,
+            options.c2ctemplate_style
+        )
+
+    results = cluster_tables_(options.themes, options.real_estate, options.method, options.count)
+    sys.stdout.write('\n'.join(_format(results)) + '\n')
@@ -6,13 +6,15 @@ from pyramid.path import DottedNameResolver
 
 from pyramid_oereb.core.config import Config
 from pyramid_oereb.contrib.data_sources.standard.sources.plr import StandardThemeConfigParser
-from pyramid_oereb.contrib.data_sources.standard import tables, create_sql, create_tables_sql
+from pyramid_oereb.contrib.data_sources.standard import tables, create_sql, create_tables_sql, \
+    create_indexes_sql
 
 logging.basicConfig()
 log = logging.getLogger(__name__)
 
 
-def create_theme_tables_(theme_config, source_class, tables_only=False, sql_file=None, if_not_exists=False):
+def create_theme_tables_(theme_config, source_class, tables_only=False, sql_file=None, if_not_exists=False,
+                         indexes=True, covering_indexes=False):
     """
     Create the tables for a specific theme.
 
@@ -24,6 +26,9 @@ def create_theme_tables_(theme_config, source_class, tables_only=False, sql_file
         tables_only (bool): True to skip creation of schema. Default is False.
         sql_file (file): The file to generate. Default is None (in the database).
         if_not_exists (bool): create Schema with the flag `IF NOT EXISTS`
+        indexes (bool): True to create the recommended indexes. Default is True.
+        covering_indexes (bool): True to include the filter columns in the indexes of the foreign keys.
+            Default is False.
     """
     if theme_config['source']['class'] == source_class:
         config_parser = StandardThemeConfigParser(**theme_config)
@@ -34,6 +39,8 @@ def create_theme_tables_(theme_config, source_class, tables_only=False, sql_file
             sql = create_tables_sql(theme_tables, if_not_exists)
         else:
             sql = create_sql(theme_schema_name, theme_tables, if_not_exists)
+        if indexes:
+            sql += create_indexes_sql(theme_tables, if_not_exists, covering_indexes)
 
         sql_file.write(sql)
 
@@ -45,7 +52,9 @@ def create_tables_from_standard_configuration(
         c2ctemplate_style=False,
         tables_only=False,
         sql_file=None,
-        if_not_exists=False):
+        if_not_exists=False,
+        indexes=True,
+        covering_indexes=False):
     """
     Creates all schemas which are defined in the passed yaml file: <section>.<plrs>.[<plr>.<code>]. The code
     must be camel case. It will be transformed to snake case and used as schema name.
@@ -61,6 +70,9 @@ def create_tables_from_standard_configuration(
         tables_only (bool): True to skip creation of schema. Default is False.
         sql_file (file): the file to generate. Default is None (in the database).
         if_not_exists (bool): create Schema with the flag `IF NOT EXISTS`
+        indexes (bool): True to create the recommended indexes. Default is True.
+        covering_indexes (bool): True to include the filter columns in the indexes of the foreign keys.
+            Default is False.
     """
     if Config.get_config() is None:
         Config.init(configuration_yaml_path, section, c2ctemplate_style)
@@ -71,7 +83,9 @@ def create_tables_from_standard_configuration(
             source_class,
             tables_only=tables_only,
             sql_file=sql_file,
-            if_not_exists=if_not_exists
+            if_not_exists=if_not_exists,
+            indexes=indexes,
+            covering_indexes=covering_indexes
         )
 
 
@@ -81,7 +95,9 @@ def create_main_schema_from_configuration_(
         c2ctemplate_style=False,
         tables_only=False,
         sql_file=None,
-        if_not_exists=False):
+        if_not_exists=False,
+        indexes=True,
+        covering_indexes=False):
     """
     Creates all schemas which are defined in the passed yaml file: <section>.<plrs>.[<plr>.<code>]. The code
     must be camel case. It will be transformed to snake case and used as schema name.
@@ -97,6 +113,9 @@ def create_main_schema_from_configuration_(
         tables_only (bool): True to skip creation of schema. Default is False.
         sql_file (file): the file to generate. Default is None (in the database).
         if_not_exists (bool): create Schema with the flag `IF NOT EXISTS`
+        indexes (bool): True to create the recommended indexes. Default is True.
+        covering_indexes (bool): True to include the filter columns in the indexes of the foreign keys.
+            Default is False.
     """
     if Config.get_config() is None:
         Config.init(configuration_yaml_path, section, c2ctemplate_style)
@@ -110,6 +129,8 @@ def create_main_schema_from_configuration_(
         sql = create_tables_sql(main_tables, if_not_exists)
     else:
         sql = create_sql(main_schema_name, main_tables, if_not_exists)
+    if indexes:
+        sql += create_indexes_sql(main_tables, if_not_exists, covering_indexes)
 
     sql_file.write(sql)
 
@@ -142,6 +163,20 @@ def create_main_schema_tables():
         default=False,
         help='Use this flag to skip the creation of the schema.'
     )
+    parser.add_option(
+        '--no-indexes',
+        dest='indexes',
+        action='store_false',
+        default=True,
+        help='Use this flag to skip the creation of the recommended indexes.'
+    )
+    parser.add_option(
+        '--covering-indexes',
+        dest='covering_indexes',
+        action='store_true',
+        default=False,
+        help='Include the law status and publication columns in the indexes of the foreign keys.'
+    )
     parser.add_option(
         '--sql-file',
         type='string',
@@ -182,7 +217,9 @@ def create_main_schema_tables():
             configuration_yaml_path=options.configuration,
             section=options.section,
             c2ctemplate_style=options.c2ctemplate_style,
-            tables_only=options.tables_only
+            tables_only=options.tables_only,
+            indexes=options.indexes,
+            covering_indexes=options.covering_indexes
         )
     else:
         append_to_sql = 'w' if options.append_to_sql else 'a'
@@ -191,7 +228,9 @@ def create_main_schema_tables():
                 configuration_yaml_path=options.configuration,
                 section=options.section,
                 c2ctemplate_style=options.c2ctemplate_style,
-                sql_file=sql_file
+                sql_file=sql_file,
+                indexes=options.indexes,
+                covering_indexes=options.covering_indexes
             )
 
 
@@ -229,6 +268,20 @@ def create_theme_tables():
         default=False,
         help='Use this flag to skip the creation of the schema.'
     )
+    parser.add_option(
+        '--no-indexes',
+        dest='indexes',
+        action='store_false',
+        default=True,
+        help='Use this flag to skip the creation of the recommended indexes.'
+    )
+    parser.add_option(
+        '--covering-indexes',
+        dest='covering_indexes',
+        action='store_true',
+        default=False,
+        help='Include the law status and publication columns in the indexes of the foreign keys.'
+    )
     parser.add_option(
         '--sql-file',
         type='string',
@@ -272,5 +325,7 @@ def create_theme_tables():
             theme_config,
             options.config_source,
             tables_only=options.tables_only,
-            sql_file=sql_file
+            sql_file=sql_file,
+            indexes=options.indexes,
+            covering_indexes=options.covering_indexes
         )
@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+import optparse
+import sys
+
+from pyramid.path import DottedNameResolver
+from sqlalchemy import event, text
+
+from pyramid_oereb import database_adapter
+from pyramid_oereb.contrib.data_sources.standard import tables, recommended_indexes, create_index_sql
+from pyramid_oereb.core.config import Config
+from pyramid_oereb.core.readers.real_estate import RealEstateReader
+from pyramid_oereb.core.sources import BaseDatabaseSource
+from pyramid_oereb.core.views.webservice import Parameter
+
+logging.basicConfig()
+log = logging.getLogger(__name__)
+
+
+def existing_indexes(connection, tables_to_check):
+    """
+    Reads the columns of the indexes (including the primary keys) of the tables from the catalog.
+
+    Args:
+        connection (sqlalchemy.engine.Connection): The connection to the database.
+        tables_to_check (list of sqlalchemy.schema.Table): The table objects from sqlalchemy.
+
+    Returns:
+        dict: The indexes by full table name (including the schema). Every index is a tuple of its key
+        columns followed by its included columns, expressions are None. Tables which do not exist in the
+        database are missing.
+    """
+    preparer = connection.dialect.identifier_preparer
+    result = {}
+    for table in tables_to_check:
+        name = preparer.format_table(table)
+        if connection.execute(text('SELECT to_regclass(:name)'), {'name': name}).scalar() is None:
+            continue
+        result[table.fullname] = [tuple(columns) for columns in connection.execute(text(
+            'SELECT array_agg(a.attname ORDER BY k.position) FROM pg_index i '
+            'CROSS JOIN LATERAL unnest(i.indkey::int2[]) WITH ORDINALITY AS k(attnum, position) '
+            'LEFT JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum '
+            'WHERE i.indrelid = to_regclass(:name) '
+            'GROUP BY i.indexrelid'
+        ), {'name': name}).scalars()]
+    return result
+
+
+def missing_indexes(tables_to_check, existing, covering=False):
+    """
+    Args:
+        tables_to_check (list of sqlalchemy.schema.Table): The table objects from sqlalchemy.
+        existing (dict): The indexes by table name as returned by :func:`existing_indexes`.
+        covering (bool): True to recommend covering indexes for the foreign keys.
+
+    Returns:
+        list of dict: The recommended indexes (see
+        :func:`pyramid_oereb.contrib.data_sources.standard.recommended_indexes`) of the existing tables
+        which are not covered by an index yet: no index is led by their column or, for covering indexes,
+        none of these indexes contains all the included columns.
+    """
+    result = []
+    for table in tables_to_check:
+        indexes = existing.get(table.fullname)
+        if indexes is None:
+            continue
+        for index in recommended_indexes(table, covering):
+            if not any(
+                columns[0] == index['column'] and set(index['include']).issubset(columns[1:])
+                for columns in indexes
+            ):
+                result.append(index)
+    return result
+
+
+def sequential_scans(plan, min_rows=1000):
+    """
+    Collects the sequential scans of a plan which read many rows.
+
+    Args:
+        plan (dict): A node of the plan as returned by ``EXPLAIN (FORMAT JSON)``.
+        min_rows (int): The number of rows (actual rows if analyzed, estimated rows otherwise) from which
+            a sequential scan is reported.
+
+    Returns:
+        list of dict: The relation and the number of rows of every reported sequential scan.
+    """
+    result = []
+    if plan.get('Node Type') == 'Seq Scan':
+        rows = plan.get('Actual Rows', plan.get('Plan Rows', 0)) + plan.get('Rows Removed by Filter', 0)
+        if rows >= min_rows:
+            result.append({
+                'relation': '{0}.{1}'.format(plan.get('Schema'), plan.get('Relation Name')),
+                'rows': rows
+            })
+    for child in plan.get('Plans', []):
+        result.extend(sequential_scans(child, min_rows))
+    return result
+
+
+def explain(connection, statement, parameters, analyze=True):
+    """
+    Args:
+        connection (sqlalchemy.engine.Connection): The connection to the database.
+        statement (str): The statement as sent to the driver.
+        parameters (dict or tuple): The parameters of the statement.
+        analyze (bool): True to execute the statement and report the actual times and rows.
+
+    Returns:
+        dict: The plan as returned by ``EXPLAIN (FORMAT JSON)``, with the keys Plan, Planning Time and
+        Execution Time.
+    """
+    options = 'ANALYZE, FORMAT JSON' if analyze else 'FORMAT JSON'
+    plan = connection.exec_driver_sql('EXPLAIN ({0}) {1}'.format(options, statement), parameters).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+
+def capture_statements(source, params, real_estate):
+    """
+    Reads the public law restrictions of a theme and records the queries sent to the database.
+
+    Args:
+        source (pyramid_oereb.core.sources.BaseDatabaseSource): The PLR source.
+        params (pyramid_oereb.core.views.webservice.Parameter): The parameters of the extract request.
+        real_estate (pyramid_oereb.core.records.real_estate.RealEstateRecord): The real estate.
+
+    Returns:
+        list of tuple: The statements and their parameters.
+    """
+    session = source.get_session()
+    try:
+        engine = session.get_bind()
+    finally:
+        session.close()
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        source.read(params, real_estate, Config.get_bbox(real_estate.limit))
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+    return statements
+
+
+def sample_real_estates(count):
+    """
+    Args:
+        count (int): The maximum number of real estates.
+
+    Returns:
+        list of pyramid_oereb.core.records.real_estate.RealEstateRecord: The first real estates of the
+        configured real estate source.
+    """
+    source = Config.get_real_estate_config()['source']
+    model = DottedNameResolver().maybe_resolve(source['params']['model'])
+    session = database_adapter.get_session(source['params']['db_connection'])
+    try:
+        egrids = [row.egrid for row in session.query(model.egrid).limit(count).all()]
+    finally:
+        session.close()
+    reader = RealEstateReader(source['class'], **source['params'])
+    params = Parameter('json')
+    return [reader.read(params, egrid=egrid)[0] for egrid in egrids]
+
+
+def advise(count=5, themes=None, analyze=True, slow_ms=50.0, min_rows=1000, covering=False):
+    """
+    Checks the indexes and the plans of the extract queries of the themes read from a database with the
+    standard, OEREBlex or INTERLIS models.
+
+    Args:
+        count (int): The number of sample real estates.
+        themes (list of str or None): The codes of the themes to check, all database themes if None.
+        analyze (bool): True to execute the queries and report the actual times and rows.
+        slow_ms (float): The execution time in milliseconds from which an analyzed query is reported.
+        min_rows (int): The number of rows from which a sequential scan is reported.
+        covering (bool): True to recommend covering indexes for the foreign keys.
+
+    Returns:
+        list of dict: The report per theme: the code, the missing indexes and the reported queries with their
+        statement, planning and execution time in milliseconds and sequential scans.
+    """
+    real_estates = sample_real_estates(count)
+    params = Parameter('json')
+    report = []
+    for plr in Config.get('plrs'):
+        source_class = DottedNameResolver().maybe_resolve(plr['source']['class'])
+        if not issubclass(source_class, BaseDatabaseSource) or (themes and plr['code'] not in themes):
+            continue
+        source = source_class(**plr)
+        models = getattr(source, 'models', None)
+        if models is None:
+            log.info('Skipping theme {0}, its source has no models.'.format(plr['code']))
+            continue
+        theme_tables = tables(models.Base)
+        session = source.get_session()
+        try:
+            connection = session.connection()
+            missing = missing_indexes(theme_tables, existing_indexes(connection, theme_tables), covering)
+            queries = {}
+            for real_estate in real_estates:
+                for statement, parameters in capture_statements(source, params, real_estate):
+                    plan = explain(connection, statement, parameters, analyze)
+                    duration = plan.get('Execution Time', 0.0)
+                    scans = sequential_scans(plan['Plan'], min_rows)
+                    if duration < slow_ms and not scans:
+                        continue
+                    query = queries.setdefault(statement, {
+                        'statement': statement,
+                        'planning_ms': 0.0,
+                        'execution_ms': 0.0,
+                        'sequential_scans': []
+                    })
+                    if duration >= query['execution_ms']:
+                        query['planning_ms'] = plan.get('Planning Time', 0.0)
+                        query['execution_ms'] = duration
+                        query['sequential_scans'] = scans
+            session.rollback()
+        finally:
+            session.close()
+        report.append({
+            'theme': plr['code'],
+            'missing_indexes': missing,
+            'queries': list(queries.values())
+        })
+    return report
+
+
+def _format(report):
+    lines = []
+    for theme in report:
+        lines.append('{0}:'.format(theme['theme']))
+        for index in theme['missing_indexes']:
+            lines.append('  missing index: {0}'.format(create_index_sql(index)))
+        for query in theme['queries']:
+            lines.append('  query ({0:.3f} ms planning, {1:.3f} ms execution): {2}'.format(
+                query['planning_ms'], query['execution_ms'], ' '.join(query['statement'].split())
+            ))
+            for scan in query['sequential_scans']:
+                lines.append('    sequential scan on {relation} ({rows} rows)'.format(**scan))
+        if not theme['missing_indexes'] and not theme['queries']:
+            lines.append('  ok')
+    return lines
+
+
+def advise_indexes():
+    parser = optparse.OptionParser(
+        usage='usage: %prog [options]',
+        description='Reports the missing indexes and the slow plans of the extract queries of every theme '
+                    'for sample real estates.'
+    )
+    parser.add_option(
+        '-c', '--configuration',
+        dest='configuration',
+        metavar='YAML',
+        type='string',
+        help='The absolute path to the configuration yaml file.'
+    )
+    parser.add_option(
+        '-s', '--section',
+        dest='section',
+        metavar='SECTION',
+        type='string',
+        default='pyramid_oereb',
+        help='The section which contains configuration (default is: pyramid_oereb).'
+    )
+    parser.add_option(
+        '--c2ctemplate-style',
+        dest='c2ctemplate_style',
+        action='store_true',
+        default=False,
+        help='Is the yaml file using a c2ctemplate style (starting with vars)'
+    )
+    parser.add_option(
+        '-n', '--real-estates',
+        dest='count',
+        type='int',
+        default=5,
+        help='Number of sample real estates read from the database (default is: 5).'
+    )
+    parser.add_option(
+        '-t', '--theme',
+        dest='themes',
+        action='append',
+        help='Code of a theme to check, can be repeated (default is all database themes).'
+    )
+    parser.add_option(
+        '--no-analyze',
+        dest='analyze',
+        action='store_false',
+        default=True,
+        help='Use this flag to only plan the queries without executing them (EXPLAIN without ANALYZE).'
+    )
+    parser.add_option(
+        '--slow-ms',
+        dest='slow_ms',
+        type='float',
+        default=50.0,
+        help='Execution time in milliseconds from which a query is reported (default is: 50).'
+    )
+    parser.add_option(
+        '--seq-scan-rows',
+        dest='min_rows',
+        type='int',
+        default=1000,
+        help='Number of rows from which a sequential scan is reported (default is: 1000).'
+    )
+    parser.add_option(
+        '--covering-indexes',
+        dest='covering_indexes',
+        action='store_true',
+        default=False,
+        help='Recommend indexes of the foreign keys including the law status and publication columns.'
+    )
+    parser.add_option(
+        '--sql-file',
+        type='string',
+        help='Write the statements creating the missing indexes to this file.'
+    )
+    options, args = parser.parse_args()
+    if not options.configuration:
+        parser.error('No configuration file set.')
+
+    if Config.get_config() is None:
+        Config.init(
+            options.configuration,
+            options.section,
+            options.c2ctemplate_style
+        )
+
+    report = advise(
+        options.count,
+        options.themes,
+        options.analyze,
+        options.slow_ms,
+        options.min_rows,
+        options.covering_indexes
+    )
+    sys.stdout.write('\n'.join(_format(report)) + '\n')
+    if options.sql_file:
+        with open(options.sql_file, 'w') as sql_file:
+            for theme in report:
+                for index in theme['missing_indexes']:
+                    sql_file.write('{}\n'.format(create_index_sql(index, if_not_exists=True)))
@@ -2,12 +2,12 @@
 import logging
 import importlib
 import binascii
+from datetime import date
 
-from geoalchemy2.shape import to_shape, from_shape
 from shapely.geometry import Point, LineString, Polygon, MultiPoint, MultiLineString, MultiPolygon, \
     GeometryCollection
 from sqlalchemy import or_
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import configure_mappers, selectinload
 from geoalchemy2.functions import ST_DWithin
 
 from pyramid_oereb import Config
@@ -18,7 +18,8 @@ from pyramid_oereb.core.sources import BaseDatabaseSource
 from pyramid_oereb.core.sources.plr import PlrBaseSource
 from pyramid_oereb.contrib.data_sources.interlis_2_3.interlis_2_3_utils import from_multilingual_text_to_dict
 from pyramid_oereb.contrib.data_sources.interlis_2_3.interlis_2_3_utils import from_multilingual_uri_to_dict
-from pyramid_oereb.contrib import eliminate_duplicated_document_records
+from pyramid_oereb.contrib import document_filter, eliminate_duplicated_document_records, \
+    geometry_parameter, get_reference_date, published_filter, to_shapes
 
 log = logging.getLogger(__name__)
 
@@ -251,26 +252,29 @@ class DatabaseSource(BaseDatabaseSource, PlrBaseSource):
 
     def from_db_to_geometry_records(self, geometries_from_db):
         geometry_records = []
+        geometries_from_db = list(geometries_from_db)
+        geoms = []
         for geometry_from_db in geometries_from_db:
+            if geometry_from_db.point is not None:
+                geoms.append(geometry_from_db.point)
+            elif geometry_from_db.line is not None:
+                geoms.append(geometry_from_db.line)
+            else:
+                geoms.append(geometry_from_db.surface)
+
+        for geometry_from_db, shape in zip(geometries_from_db, to_shapes(geoms)):
             # Create law status record
             law_status = Config.get_law_status_by_data_code(
                     self._plr_info.get('code'),
                     geometry_from_db.law_status
                 )
 
-            if geometry_from_db.point is not None:
-                geom = geometry_from_db.point
-            elif geometry_from_db.line is not None:
-                geom = geometry_from_db.line
-            elif geometry_from_db.surface is not None:
-                geom = geometry_from_db.surface
-
             # Create geometry records
             geometry_records.extend(self.create_geometry_records_(
                 law_status,
                 geometry_from_db.published_from,
                 geometry_from_db.published_until,
-                to_shape(geom),
+                shape,
                 geometry_from_db.geo_metadata
             ))
 
@@ -412,49 +416,112 @@ class DatabaseSource(BaseDatabaseSource, PlrBaseSource):
         document_records = self.from_db_to_document_records(documents_from_db)
         return document_records
 
-    def collect_related_geometries_by_real_estate(self, session, real_estate):
+    def geometry_filter(self, geometry_to_check):
         """
-        Extracts all geometries in the topic which have spatial relation with the passed real estate
+        Creates the spatial filter of the point, line and surface geometries of the theme, respecting the
+        tolerances if needed.
+
+        Args:
+            geometry_to_check (shapely.geometry.base.BaseGeometry): geometry to be queried
+
+        Returns:
+            sqlalchemy.sql.elements.ClauseElement: The filter clause.
+        """
+        geometry = geometry_parameter(geometry_to_check, Config.get('srid'))
+        if self._tolerances is None:
+            return or_(
+                self._model_.point.ST_Intersects(geometry),
+                self._model_.line.ST_Intersects(geometry),
+                self._model_.surface.ST_Intersects(geometry)
+            )
+        return or_(
+            ST_DWithin(
+                self._model_.point,
+                geometry,
+                self._tolerances.get('ALL', self._tolerances.get('Point', 0))
+            ),
+            ST_DWithin(
+                self._model_.line,
+                geometry,
+                self._tolerances.get('ALL', self._tolerances.get('LineString', 0))
+            ),
+            ST_DWithin(
+                self._model_.surface,
+                geometry,
+                self._tolerances.get('ALL', self._tolerances.get('Polygon', 0))
+            )
+        )
+
+    def related_geometries(self, real_estate, reference_date):
+        """
+        Returns the relationship from a public law restriction to its geometries used to load them, limited
+        to the geometries published at the reference date. With `filter_plr_geometries` enabled, only the
+        geometries having spatial relation with the real estate are loaded instead of all parts of the
+        restriction.
+
+        Args:
+            real_estate (pyramid_oereb.lib.records.real_estate.RealEstateRecord): The real
+                estate in its record representation.
+            reference_date (datetime.date): The date the publication is checked against.
+
+        Returns:
+            sqlalchemy.orm.attributes.QueryableAttribute: The relationship to pass to the loader option.
+        """
+        # The relationship is created as backref of the geometry model once the mappers are configured
+        configure_mappers()
+        criteria = [published_filter(self._model_, reference_date)]
+        if Config.get('filter_plr_geometries', False):
+            criteria.append(self.geometry_filter(real_estate.limit))
+        return self.models.PublicLawRestriction.geometries.and_(*criteria)
+
+    def related_legal_provisions(self, real_estate, reference_date):
+        """
+        Returns the relationship from a public law restriction to its documents used to load them, limited
+        to the documents published at the reference date and relevant for the municipality of the real
+        estate.
+
+        Args:
+            real_estate (pyramid_oereb.lib.records.real_estate.RealEstateRecord): The real
+                estate in its record representation.
+            reference_date (datetime.date): The date the publication is checked against.
+
+        Returns:
+            sqlalchemy.orm.attributes.QueryableAttribute: The relationship to pass to the loader option.
+        """
+        configure_mappers()
+        return self.models.PublicLawRestriction.legal_provisions.and_(
+            self.models.PublicLawRestrictionDocument.document.has(
+                document_filter(self.models.Document, reference_date, real_estate.fosnr)
+            )
+        )
+
+    def collect_related_geometries_by_real_estate(self, session, real_estate, reference_date=None):
+        """
+        Extracts all geometries in the topic which have spatial relation with the passed real estate and
+        which are published at the reference date together with their public law restriction.
 
         Args:
             session (sqlalchemy.orm.Session): The requested clean session instance ready for use
             real_estate (pyramid_oereb.lib.records.real_estate.RealEstateRecord): The real
                 estate in its record representation.
+            reference_date (datetime.date or None): The date the publication is checked against, the
+                current date if None.
 
         Returns:
             list: The result of the related geometries unique by the public law restriction id
         """
-        if self._tolerances is None:
-            query = session.query(self._model_).filter(
-                or_(
-                    self._model_.point.ST_Intersects(from_shape(real_estate.limit, srid=Config.get('srid'))),
-                    self._model_.line.ST_Intersects(from_shape(real_estate.limit, srid=Config.get('srid'))),
-                    self._model_.surface.ST_Intersects(from_shape(real_estate.limit, srid=Config.get('srid')))
-                ))
-        else:
-            query = session.query(self._model_).filter(
-                or_(
-                    ST_DWithin(
-                        self._model_.point,
-                        from_shape(real_estate.limit, srid=Config.get('srid')),
-                        self._tolerances.get('ALL', self._tolerances.get('Point', 0))
-                    ),
-                    ST_DWithin(
-                        self._model_.line,
-                        from_shape(real_estate.limit, srid=Config.get('srid')),
-                        self._tolerances.get('ALL', self._tolerances.get('LineString', 0))
-                    ),
-                    ST_DWithin(
-                        self._model_.surface,
-                        from_shape(real_estate.limit, srid=Config.get('srid')),
-                        self._tolerances.get('ALL', self._tolerances.get('Polygon', 0))
-                    )
-                ))
+        if reference_date is None:
+            reference_date = date.today()
+        query = session.query(self._model_).join(self._model_.public_law_restriction).filter(
+            self.geometry_filter(real_estate.limit),
+            published_filter(self._model_, reference_date),
+            published_filter(self.models.PublicLawRestriction, reference_date)
+        )
         return query.distinct(self._model_.public_law_restriction_id).options(
             selectinload(self.models.Geometry.public_law_restriction)
-            .selectinload(self.models.PublicLawRestriction.geometries),
+            .selectinload(self.related_geometries(real_estate, reference_date)),
             selectinload(self.models.Geometry.public_law_restriction)
-            .selectinload(self.models.PublicLawRestriction.legal_provisions)
+            .selectinload(self.related_legal_provisions(real_estate, reference_date))
             .selectinload(self.models.PublicLawRestrictionDocument.document)
             .selectinload(self.models.Document.multilingual_uri)
             .selectinload(self.models.MultilingualUri.localised_uri),
@@ -484,6 +551,33 @@ class DatabaseSource(BaseDatabaseSource, PlrBaseSource):
         return session.query(self.legend_entry_model).filter(
             self.legend_entry_model.t_id.in_(legend_entry_ids)).all()
 
+    def collect_legend_entry_ids_by_bbox(self, session, bbox):
+        """
+        Queries the distinct law status and legend entry ids of the public law restrictions in the topic
+        which have spatial relation with the passed bounding box, without loading their geometries.
+
+        Args:
+            session (sqlalchemy.orm.Session): The requested clean session instance ready for use
+            bbox (shapely.geometry.base.BaseGeometry): The bbox to search the records.
+
+        Returns:
+            list: The law status and legend entry id of the public law restrictions as tuples.
+        """
+        public_law_restriction = self.models.PublicLawRestriction
+        bbox_geometry = geometry_parameter(bbox, Config.get('srid'))
+        return session.query(
+            public_law_restriction.law_status,
+            public_law_restriction.legend_entry_id
+        ).join(
+            self._model_, self._model_.public_law_restriction_id == public_law_restriction.t_id
+        ).filter(
+            or_(
+                self._model_.point.ST_Intersects(bbox_geometry),
+                self._model_.line.ST_Intersects(bbox_geometry),
+                self._model_.surface.ST_Intersects(bbox_geometry)
+            )
+        ).distinct().all()
+
     def collect_legend_entries_by_bbox(self, session, bbox):
         """
         Extracts all legend entries in the topic which have spatial relation with the passed bounding box of
@@ -494,41 +588,24 @@ class DatabaseSource(BaseDatabaseSource, PlrBaseSource):
             bbox (shapely.geometry.base.BaseGeometry): The bbox to search the records.
 
         Returns:
-            list: The result of the related geometries unique by the public law restriction id and law status
+            list: The legend entries and the law status as list for each law status.
         """
-        # Select the legend entries of all plr within bbox
-        geometries = session.query(self._model_).filter(
-                      or_(
-                       self._model_.point.ST_Intersects(from_shape(bbox, srid=Config.get('srid'))),
-                       self._model_.line.ST_Intersects(from_shape(bbox, srid=Config.get('srid'))),
-                       self._model_.surface.ST_Intersects(from_shape(bbox, srid=Config.get('srid')))
-                      )).distinct(self._model_.public_law_restriction_id).options(
-                        selectinload(self.models.Geometry.public_law_restriction)
-                      ).all()
-
         # Compile a list of unique legend entry ids for each law status
         legend_entry_ids = dict()
-        for geometry in geometries:
-            if geometry.public_law_restriction.law_status not in legend_entry_ids:
-                legend_entry_ids[geometry.public_law_restriction.law_status] = {
-                    geometry.public_law_restriction.legend_entry_id
-                }
-            else:
-                legend_entry_ids[geometry.public_law_restriction.law_status].add(
-                    geometry.public_law_restriction.legend_entry_id
-                )
+        for law_status, legend_entry_id in self.collect_legend_entry_ids_by_bbox(session, bbox):
+            legend_entry_ids.setdefault(law_status, set()).add(legend_entry_id)
 
-        # Retrieve legend entries
-        legend_entries_from_db = []
-        for law_status in legend_entry_ids:
-            legend_entries_from_db.append(
-                [
-                    self.get_legend_entries_from_db(session, list(legend_entry_ids[law_status])),
-                    law_status
-                ]
-            )
+        # Retrieve the legend entries of all law status at once
+        all_legend_entry_ids = set().union(*legend_entry_ids.values())
+        legend_entries = dict()
+        if all_legend_entry_ids:
+            for legend_entry in self.get_legend_entries_from_db(session, list(all_legend_entry_ids)):
+                legend_entries[legend_entry.t_id] = legend_entry
 
-        return legend_entries_from_db
+        return [
+            [[legend_entries[i] for i in ids if i in legend_entries], law_status]
+            for law_status, ids in legend_entry_ids.items()
+        ]
 
     def read(self, params, real_estate, bbox):
         """
@@ -555,7 +632,7 @@ class DatabaseSource(BaseDatabaseSource, PlrBaseSource):
 
                     # Try to find geometries which have spatial relation with real estate
                     geometry_results = self.collect_related_geometries_by_real_estate(
-                        session, real_estate
+                        session, real_estate, get_reference_date(params)
                     )
                     if len(geometry_results) == 0:
                         # We checked if there are spatially related elements in database. But there is none.
@@ -1,13 +1,95 @@
 # -*- coding: utf-8 -*-
 
+from geoalchemy2.types import Geometry
 from sqlalchemy.schema import CreateTable
 from sqlalchemy.dialects import postgresql
 
+FILTER_COLUMNS = [
+    'law_status', 'published_from', 'published_until', 'theme',
+    'rechtsstatus', 'publiziertab', 'publiziertbis', 'thema'
+]
+"""list of str: The columns (of the standard and the INTERLIS models) the extract queries filter on, which
+get an index besides the geometries and the foreign keys."""
+
 
 def tables(base):
     return base.metadata.sorted_tables
 
 
+def recommended_indexes(table, covering=False):
+    """
+    Args:
+        table (sqlalchemy.schema.Table): The table object from sqlalchemy.
+        covering (bool): defaults to false. Determines if the indexes of the foreign keys include the
+            filter columns of the table, so the joins can check them by an index only scan.
+
+    Returns:
+        list of dict: The recommended indexes of the table: a GiST index on every geometry column and a
+        btree index on every foreign key and filter column (see :data:`FILTER_COLUMNS`). The dictionaries
+        contain the keys name, table, column, using and include.
+    """
+    include = [column.name for column in table.columns if column.name in FILTER_COLUMNS]
+    indexes = []
+    for column in table.columns:
+        if column.primary_key:
+            continue
+        if isinstance(column.type, Geometry):
+            using = 'gist'
+        elif column.foreign_keys or column.name in FILTER_COLUMNS:
+            using = 'btree'
+        else:
+            continue
+        indexes.append({
+            'name': 'idx_{0}_{1}'.format(table.name, column.name),
+            'table': table,
+            'column': column.name,
+            'using': using,
+            'include': include if covering and column.foreign_keys else []
+        })
+    return indexes
+
+
+def create_index_sql(index, if_not_exists=False):
+    """
+    Args:
+        index (dict): The index as returned by :func:`recommended_indexes`.
+        if_not_exists (bool): defaults to false. Determines if the index is created if it already exists.
+            ... CREATE INDEX IF NOT EXISTS index ...
+
+    Returns:
+        str: query string to create the index
+    """
+    preparer = postgresql.dialect().identifier_preparer
+    return 'CREATE INDEX {0}{1} ON {2} USING {3} ({4}){5};'.format(
+        'IF NOT EXISTS ' if if_not_exists else '',
+        preparer.quote(index['name']),
+        preparer.format_table(index['table']),
+        index['using'],
+        preparer.quote(index['column']),
+        ' INCLUDE ({0})'.format(', '.join(preparer.quote(name) for name in index['include']))
+        if index['include'] else ''
+    )
+
+
+def create_indexes_sql(tables_to_create, if_not_exists=False, covering=False):
+    """
+    Args:
+        tables_to_create (list of sqlalchemy.schema.Table): The table objects from sqlalchemy.
+        if_not_exists (bool): defaults to false. Determines if the index is created if it already exists.
+            ... CREATE INDEX IF NOT EXISTS index ...
+        covering (bool): defaults to false. Determines if the indexes of the foreign keys include the
+            filter columns (see :func:`recommended_indexes`).
+
+    Returns:
+        a string with the sql statement used to create the recommended indexes of the tables
+    """
+    sqls = []
+    for table in tables_to_create:
+        for index in recommended_indexes(table, covering):
+            sqls.append('{}\n'.format(create_index_sql(index, if_not_exists)))
+    return ''.join(sqls)
+
+
 def create_schema_sql(schema_name):
     """
     Args:
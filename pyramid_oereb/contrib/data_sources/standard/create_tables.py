@@ -37,6 +37,20 @@ def create_standard_tables():
         default=False,
         help='Use this flag to skip the creation of the schema.'
     )
+    parser.add_option(
+        '--no-indexes',
+        dest='indexes',
+        action='store_false',
+        default=True,
+        help='Use this flag to skip the creation of the recommended indexes.'
+    )
+    parser.add_option(
+        '--covering-indexes',
+        dest='covering_indexes',
+        action='store_true',
+        default=False,
+        help='Include the law status and publication columns in the indexes of the foreign keys.'
+    )
     parser.add_option(
         '--sql-file',
         type='string',
@@ -72,5 +86,7 @@ def create_standard_tables():
             source_class=config_source,
             section=options.section,
             c2ctemplate_style=options.c2ctemplate_style,
-            sql_file=sql_file
+            sql_file=sql_file,
+            indexes=options.indexes,
+            covering_indexes=options.covering_indexes
         )
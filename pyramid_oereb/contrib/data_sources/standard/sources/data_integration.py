@@ -1,9 +1,9 @@
 
 from pyramid_oereb.core.sources import BaseDatabaseSource
-from pyramid_oereb.core.sources.data_integration import DataIntegrationRecord
+from pyramid_oereb.core.sources.data_integration import DataIntegrationBaseSource
 
 
-class DatabaseSource(BaseDatabaseSource, DataIntegrationRecord):
+class DatabaseSource(BaseDatabaseSource, DataIntegrationBaseSource):
 
     def read(self):
         """
@@ -19,8 +19,9 @@ class DatabaseSource(BaseDatabaseSource, DataIntegrationRecord):
             for result in results:
                 self.records.append(self._record_class_(
                     result.date,
-                    result.checksum,
-                    result.available
+                    checksum=result.checksum,
+                    theme_identifier=result.theme_code,
+                    office_identifier=result.office_id
                 ))
         finally:
             session.close()
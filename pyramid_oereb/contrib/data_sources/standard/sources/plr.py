@@ -1,13 +1,17 @@
 # -*- coding: utf-8 -*-
 import logging
 import importlib
+from datetime import date
+from types import SimpleNamespace
 
-from geoalchemy2.shape import to_shape, from_shape
-from geoalchemy2.functions import ST_DWithin, ST_Intersects
+from geoalchemy2 import Geometry
+from geoalchemy2.elements import WKBElement
+from geoalchemy2.functions import ST_AsEWKB, ST_CollectionExtract, ST_DWithin, ST_Intersects
+from pyramid.config import ConfigurationError
 from shapely.geometry import Point, LineString, Polygon, MultiPoint, MultiLineString, MultiPolygon, \
     GeometryCollection
-from sqlalchemy import text, or_
-from sqlalchemy.orm import selectinload
+from sqlalchemy import JSON, Date, func, inspect, literal, literal_column, or_, select, union_all
+from sqlalchemy.orm import configure_mappers, selectinload
 
 from pyramid_oereb import Config
 from pyramid_oereb.core import b64
@@ -15,10 +19,15 @@ from pyramid_oereb.core.records.image import ImageRecord
 from pyramid_oereb.core.records.plr import EmptyPlrRecord
 from pyramid_oereb.core.sources import BaseDatabaseSource
 from pyramid_oereb.core.sources.plr import PlrBaseSource
-from pyramid_oereb.contrib import eliminate_duplicated_document_records
+from pyramid_oereb.contrib import document_filter, eliminate_duplicated_document_records, \
+    geometry_parameter, get_reference_date, published_filter, to_shapes
 
 log = logging.getLogger(__name__)
 
+FETCH_STRATEGIES = ['orm', 'json']
+"""list of str: The ways the standard PLR sources load the restrictions: with the ORM and its loader options
+(``orm``) or as one nested JSON row per restriction built by the database (``json``)."""
+
 
 class StandardThemeConfigParser(object):
 
@@ -112,6 +121,7 @@ class DatabaseSource(BaseDatabaseSource, PlrBaseSource):
         PlrBaseSource.__init__(self, **kwargs)
 
         self.legend_entry_model = self.models.LegendEntry
+        self.prefetched_ids = None
 
         self._tolerances = self._plr_info.get('tolerances')
         if not self._tolerances and self._plr_info.get('tolerance'):
@@ -308,7 +318,9 @@ class DatabaseSource(BaseDatabaseSource, PlrBaseSource):
                 read from db entity.
         """
         geometry_records = []
-        for geometry_from_db in geometries_from_db:
+        geometries_from_db = list(geometries_from_db)
+        shapes = to_shapes(geometry_from_db.geom for geometry_from_db in geometries_from_db)
+        for geometry_from_db, shape in zip(geometries_from_db, shapes):
             # Create law status record
             law_status = Config.get_law_status_by_data_code(
                     self._plr_info.get('code'),
@@ -320,7 +332,7 @@ class DatabaseSource(BaseDatabaseSource, PlrBaseSource):
                 law_status,
                 geometry_from_db.published_from,
                 geometry_from_db.published_until,
-                to_shape(geometry_from_db.geom),
+                shape,
                 geometry_from_db.geo_metadata
             ))
 
@@ -500,13 +512,15 @@ class DatabaseSource(BaseDatabaseSource, PlrBaseSource):
         """
         Decides the geometry collection cases of geometric filter operations when the database contains multi
         geometries but the passed geometry does not.
-        The multi geometry will be extracted to it's sub parts for operation.
+        The multi geometry will be extracted to it's sub parts for operation. The passed geometry is bound
+        as WKB parameter, so the statement text does not depend on it.
 
         Args:
             db_path (str): The point separated string of schema_name.table_name.column_name from
                 which we can construct a correct SQL statement.
             real_estate_geometry (shapely.geometry.base.BaseGeometry): The shapely geometry
                 representation which is used for comparison.
+            tolerances (dict or None): The tolerances by geometry type or for `ALL` types.
 
         Returns:
             sqlalchemy.sql.elements.BooleanClauseList: The clause element.
@@ -514,33 +528,29 @@ class DatabaseSource(BaseDatabaseSource, PlrBaseSource):
         Raises:
             HTTPBadRequest
         """
-        srid = Config.get('srid')
-        extract_point = f"ST_CollectionExtract({db_path}, 1)"
-        extract_line = f"ST_CollectionExtract({db_path}, 2)"
-        extract_polygon = f"ST_CollectionExtract({db_path}, 3)"
-        geometry_string = f'ST_GeomFromText(\'{real_estate_geometry.wkt}\', {srid})'
+        column = literal_column(db_path)
+        geometry = geometry_parameter(real_estate_geometry, Config.get('srid'))
         tolerance_extracts = [
             tolerances.get('ALL', tolerances.get(geom_type)) if tolerances else None
             for geom_type in ['Point', 'LineString', 'Polygon']
         ]
         clause_blocks = [
-            text(f'ST_Intersects({extract}, {geometry_string})') if tolerance is None
-            else text(f'ST_DWithin({extract}, {geometry_string}, {tolerance})')
-            for extract, tolerance in zip([extract_point, extract_line, extract_polygon], tolerance_extracts)
+            ST_Intersects(ST_CollectionExtract(column, dimension), geometry) if tolerance is None
+            else ST_DWithin(ST_CollectionExtract(column, dimension), geometry, tolerance)
+            for dimension, tolerance in zip([1, 2, 3], tolerance_extracts)
         ]
         return or_(*clause_blocks)
 
-    def handle_collection(self, session, geometry_to_check):
+    def geometry_filter(self, geometry_to_check):
         """
-        Handles geometry collection in the geometry query if needed.
+        Creates the spatial filter of the geometries of the theme, handling geometry collections and
+        tolerances if needed.
 
         Args:
-            session (sqlalchemy.orm.Session or sqlalchemy.orm.scoped_session): The requested clean
-                session instance ready for use
             geometry_to_check (shapely.geometry.base.BaseGeometry): geometry to be queried
 
         Returns:
-            sqlalchemy.orm.Query : the query based on the geometry_to_check
+            sqlalchemy.sql.elements.ClauseElement: The filter clause.
         """
         geometry_types = Config.get('geometry_types')
         collection_types = geometry_types.get('collection').get('types')
@@ -548,72 +558,199 @@ class DatabaseSource(BaseDatabaseSource, PlrBaseSource):
         if self._plr_info.get('geometry_type') in [x.upper() for x in collection_types]:
 
             # The PLR is defined as a collection type. We need to do a special handling
-            query = session.query(self._model_).filter(
-                self.extract_geometry_collection_db(
-                    '{schema}.{table}.geom'.format(
-                        schema=self._model_.__table__.schema,
-                        table=self._model_.__table__.name
-                    ),
-                    geometry_to_check,
-                    self._tolerances
-                )
+            return self.extract_geometry_collection_db(
+                '{schema}.{table}.geom'.format(
+                    schema=self._model_.__table__.schema,
+                    table=self._model_.__table__.name
+                ),
+                geometry_to_check,
+                self._tolerances
             )
 
-        else:
-            # The PLR is not problematic at all cause we do not have a collection type here
-            if (self._tolerances is not None) and ('ALL' in self._tolerances):
-                query = session.query(self._model_).filter(
-                    ST_DWithin(
-                        self._model_.geom,
-                        from_shape(geometry_to_check, srid=Config.get('srid')),
-                        self._tolerances['ALL']
-                    )
-                )
-            elif (self._tolerances is not None) and (geometry_to_check.geom_type in self._tolerances):
-                query = session.query(self._model_).filter(
-                    ST_DWithin(
-                        self._model_.geom,
-                        from_shape(geometry_to_check, srid=Config.get('srid')),
-                        self._tolerances[geometry_to_check.geom_type]
-                    )
-                )
-            else:
-                query = session.query(self._model_).filter(
-                    ST_Intersects(
-                        self._model_.geom,
-                        from_shape(geometry_to_check, srid=Config.get('srid'))
-                    )
-                )
-        return query
+        # The PLR is not problematic at all cause we do not have a collection type here
+        if (self._tolerances is not None) and ('ALL' in self._tolerances):
+            return ST_DWithin(
+                self._model_.geom,
+                geometry_parameter(geometry_to_check, Config.get('srid')),
+                self._tolerances['ALL']
+            )
+        elif (self._tolerances is not None) and (geometry_to_check.geom_type in self._tolerances):
+            return ST_DWithin(
+                self._model_.geom,
+                geometry_parameter(geometry_to_check, Config.get('srid')),
+                self._tolerances[geometry_to_check.geom_type]
+            )
+        return ST_Intersects(
+            self._model_.geom,
+            geometry_parameter(geometry_to_check, Config.get('srid'))
+        )
+
+    def handle_collection(self, session, geometry_to_check):
+        """
+        Handles geometry collection in the geometry query if needed.
+
+        Args:
+            session (sqlalchemy.orm.Session or sqlalchemy.orm.scoped_session): The requested clean
+                session instance ready for use
+            geometry_to_check (shapely.geometry.base.BaseGeometry): geometry to be queried
+
+        Returns:
+            sqlalchemy.orm.Query : the query based on the geometry_to_check
+        """
+        return session.query(self._model_).filter(self.geometry_filter(geometry_to_check))
+
+    def related_geometries(self, real_estate, reference_date):
+        """
+        Returns the relationship from a public law restriction to its geometries used to load them, limited
+        to the geometries published at the reference date. With `filter_plr_geometries` enabled, only the
+        geometries having spatial relation with the real estate (respecting the tolerances) are loaded. The
+        others would be dropped by the processor anyway, so restrictions with many parts spread across the
+        canton do not load all of them.
+
+        Args:
+            real_estate (pyramid_oereb.lib.records.real_estate.RealEstateRecord): The real
+                estate in its record representation.
+            reference_date (datetime.date): The date the publication is checked against.
 
-    def collect_related_geometries_by_real_estate(self, session, real_estate):
+        Returns:
+            sqlalchemy.orm.attributes.QueryableAttribute: The relationship to pass to the loader option.
+        """
+        # The relationship is created as backref of the geometry model once the mappers are configured
+        configure_mappers()
+        criteria = [published_filter(self._model_, reference_date)]
+        if Config.get('filter_plr_geometries', False):
+            criteria.append(self.geometry_filter(real_estate.limit))
+        return self.models.PublicLawRestriction.geometries.and_(*criteria)
+
+    def related_legal_provisions(self, real_estate, reference_date):
         """
-        Extracts all geometries in the topic which have spatial relation with the passed real estate
+        Returns the relationship from a public law restriction to its documents used to load them, limited
+        to the documents published at the reference date and relevant for the municipality of the real
+        estate.
+
+        Args:
+            real_estate (pyramid_oereb.lib.records.real_estate.RealEstateRecord): The real
+                estate in its record representation.
+            reference_date (datetime.date): The date the publication is checked against.
+
+        Returns:
+            sqlalchemy.orm.attributes.QueryableAttribute: The relationship to pass to the loader option.
+        """
+        configure_mappers()
+        return self.models.PublicLawRestriction.legal_provisions.and_(
+            self.models.PublicLawRestrictionDocument.document.has(
+                document_filter(self.models.Document, reference_date, real_estate.fosnr)
+            )
+        )
+
+    def collect_related_geometries_by_real_estate(self, session, real_estate, reference_date=None):
+        """
+        Extracts all geometries in the topic which have spatial relation with the passed real estate and
+        which are published at the reference date together with their public law restriction.
 
         Args:
             session (sqlalchemy.orm.Session): The requested clean session instance ready for use
             real_estate (pyramid_oereb.lib.records.real_estate.RealEstateRecord): The real
                 estate in its record representation.
+            reference_date (datetime.date or None): The date the publication is checked against, the
+                current date if None.
 
         Returns:
             list: The result of the related geometries unique by the public law restriction id
         """
-        return self.handle_collection(session, real_estate.limit).distinct(
+        if reference_date is None:
+            reference_date = date.today()
+        public_law_restriction = self.models.PublicLawRestriction
+        return self.handle_collection(session, real_estate.limit).join(
+            self._model_.public_law_restriction
+        ).filter(
+            published_filter(self._model_, reference_date),
+            published_filter(public_law_restriction, reference_date)
+        ).distinct(
             self._model_.public_law_restriction_id
         ).options(
             selectinload(self.models.Geometry.public_law_restriction)
-            .selectinload(self.models.PublicLawRestriction.geometries),
+            .selectinload(self.related_geometries(real_estate, reference_date)),
             selectinload(self.models.Geometry.public_law_restriction)
-            .selectinload(self.models.PublicLawRestriction.legal_provisions)
+            .selectinload(self.related_legal_provisions(real_estate, reference_date))
             .selectinload(self.models.PublicLawRestrictionDocument.document),
             selectinload(self.models.Geometry.public_law_restriction)
-            .selectinload(self.models.PublicLawRestriction.legend_entry),
+            .selectinload(public_law_restriction.legend_entry),
             selectinload(self.models.Geometry.public_law_restriction)
-            .selectinload(self.models.PublicLawRestriction.view_service),
+            .selectinload(public_law_restriction.view_service),
             selectinload(self.models.Geometry.public_law_restriction)
-            .selectinload(self.models.PublicLawRestriction.responsible_office),
+            .selectinload(public_law_restriction.responsible_office),
+        ).all()
+
+    def collect_public_law_restrictions_by_ids(self, session, public_law_restriction_ids, real_estate,
+                                               reference_date):
+        """
+        Loads the public law restrictions with the passed ids and their related elements.
+
+        Args:
+            session (sqlalchemy.orm.Session): The requested clean session instance ready for use
+            public_law_restriction_ids (list): The ids of the public law restrictions.
+            real_estate (pyramid_oereb.lib.records.real_estate.RealEstateRecord): The real
+                estate in its record representation.
+            reference_date (datetime.date): The date the publication is checked against.
+
+        Returns:
+            list: The public law restrictions ordered by their id.
+        """
+        public_law_restriction = self.models.PublicLawRestriction
+        return session.query(public_law_restriction).filter(
+            public_law_restriction.id.in_(public_law_restriction_ids)
+        ).order_by(public_law_restriction.id).options(
+            selectinload(self.related_geometries(real_estate, reference_date)),
+            selectinload(self.related_legal_provisions(real_estate, reference_date))
+            .selectinload(self.models.PublicLawRestrictionDocument.document),
+            selectinload(public_law_restriction.legend_entry),
+            selectinload(public_law_restriction.view_service),
+            selectinload(public_law_restriction.responsible_office),
         ).all()
 
+    @classmethod
+    def prefetch(cls, sources, params, real_estate, bbox):
+        """
+        Queries the ids of the public law restrictions related to the real estate for all available themes
+        sharing a database connection in one statement (UNION ALL of the spatial query of every theme),
+        limited to the restrictions and geometries published at the reference date of the extract. The
+        ids are kept in `prefetched_ids` of every source, so its :meth:`read` only loads the details of
+        the concerned themes.
+
+        Args:
+            sources (list of DatabaseSource): The sources which will be read.
+            params (pyramid_oereb.core.views.webservice.Parameter): The parameters of the extract request.
+            real_estate (pyramid_oereb.lib.records.real_estate.RealEstateRecord): The real estate.
+            bbox (shapely.geometry.base.BaseGeometry): The bbox of the visible extent of the map.
+        """
+        reference_date = get_reference_date(params)
+        sources_by_connection = {}
+        for source in sources:
+            if Config.availability_by_theme_code_municipality_fosnr(source.info['code'], real_estate.fosnr):
+                sources_by_connection.setdefault(source._key_, []).append(source)
+        for connection_sources in sources_by_connection.values():
+            statement = union_all(*[
+                select(
+                    literal(index).label('source_index'),
+                    source._model_.public_law_restriction_id.label('public_law_restriction_id')
+                ).join(source._model_.public_law_restriction).where(
+                    source.geometry_filter(real_estate.limit),
+                    published_filter(source._model_, reference_date),
+                    published_filter(source.models.PublicLawRestriction, reference_date)
+                ).distinct()
+                for index, source in enumerate(connection_sources)
+            ])
+            session = connection_sources[0].get_session()
+            try:
+                rows = session.execute(statement).all()
+            finally:
+                session.close()
+            for source in connection_sources:
+                source.prefetched_ids = []
+            for source_index, public_law_restriction_id in rows:
+                connection_sources[source_index].prefetched_ids.append(public_law_restriction_id)
+
     def get_legend_entries_from_db(self, session, legend_entry_ids):
         """
         Retrieves the legend entries for a list of id-values.
@@ -629,6 +766,26 @@ class DatabaseSource(BaseDatabaseSource, PlrBaseSource):
         return session.query(self.legend_entry_model).filter(
             self.legend_entry_model.id.in_(legend_entry_ids)).all()
 
+    def collect_legend_entry_ids_by_bbox(self, session, bbox):
+        """
+        Queries the distinct law status and legend entry ids of the public law restrictions in the topic
+        which have spatial relation with the passed bounding box, without loading their geometries.
+
+        Args:
+            session (sqlalchemy.orm.Session): The requested clean session instance ready for use
+            bbox (shapely.geometry.base.BaseGeometry): The bbox to search the records.
+
+        Returns:
+            list: The law status and legend entry id of the public law restrictions as tuples.
+        """
+        public_law_restriction = self.models.PublicLawRestriction
+        return session.query(
+            public_law_restriction.law_status,
+            public_law_restriction.legend_entry_id
+        ).join(
+            self._model_, self._model_.public_law_restriction_id == public_law_restriction.id
+        ).filter(self.geometry_filter(bbox)).distinct().all()
+
     def collect_legend_entries_by_bbox(self, session, bbox):
         """
         Extracts all legend entries in the topic which have spatial relation with the passed bounding box of
@@ -639,37 +796,200 @@ class DatabaseSource(BaseDatabaseSource, PlrBaseSource):
             bbox (shapely.geometry.base.BaseGeometry): The bbox to search the records.
 
         Returns:
-            list: The result of the related geometries unique by the public law restriction id and law status
+            list: The legend entries and the law status as list for each law status.
         """
 
-        # Select the legend entries of all plr within bbox
-        geometries = self.handle_collection(session, bbox).options(
-            selectinload(self.models.Geometry.public_law_restriction)
-        ).all()
-
         # Compile a list of unique legend entry ids for each law status
         legend_entry_ids = dict()
-        for geometry in geometries:
-            if geometry.public_law_restriction.law_status not in legend_entry_ids:
-                legend_entry_ids[geometry.public_law_restriction.law_status] = {
-                    geometry.public_law_restriction.legend_entry_id
-                }
-            else:
-                legend_entry_ids[geometry.public_law_restriction.law_status].add(
-                    geometry.public_law_restriction.legend_entry_id
-                )
+        for law_status, legend_entry_id in self.collect_legend_entry_ids_by_bbox(session, bbox):
+            legend_entry_ids.setdefault(law_status, set()).add(legend_entry_id)
+
+        # Retrieve the legend entries of all law status at once
+        all_legend_entry_ids = set().union(*legend_entry_ids.values())
+        legend_entries = dict()
+        if all_legend_entry_ids:
+            for legend_entry in self.get_legend_entries_from_db(session, list(all_legend_entry_ids)):
+                legend_entries[legend_entry.id] = legend_entry
+
+        return [
+            [[legend_entries[i] for i in ids if i in legend_entries], law_status]
+            for law_status, ids in legend_entry_ids.items()
+        ]
+
+    @property
+    def fetch_strategy(self):
+        """
+        Returns:
+            str: The configured `plr_fetch_strategy`, one of :data:`FETCH_STRATEGIES`.
+
+        Raises:
+            pyramid.config.ConfigurationError: If the strategy is unknown.
+        """
+        strategy = Config.get('plr_fetch_strategy', 'orm')
+        if strategy not in FETCH_STRATEGIES:
+            raise ConfigurationError('Unknown plr_fetch_strategy {}, possible are: {}'.format(
+                strategy, ', '.join(FETCH_STRATEGIES)
+            ))
+        return strategy
+
+    @staticmethod
+    def json_object(model, **related):
+        """
+        Creates the JSON object of a row of the model containing all its mapped columns (geometries as hex
+        encoded EWKB) and the passed related elements.
+
+        Args:
+            model (sqlalchemy.orm.decl_api.DeclarativeMeta): The model.
+            related (sqlalchemy.sql.expression.ColumnElement): The related elements by their key.
+
+        Returns:
+            sqlalchemy.sql.functions.Function: The ``json_build_object`` expression.
+        """
+        arguments = []
+        for attribute in inspect(model).column_attrs:
+            column = attribute.columns[0]
+            if isinstance(column.type, Geometry):
+                column = func.encode(ST_AsEWKB(column), literal_column("'hex'"))
+            arguments.extend([literal_column("'{}'".format(attribute.key)), column])
+        for key, value in related.items():
+            arguments.extend([literal_column("'{}'".format(key)), value])
+        return func.json_build_object(*arguments, type_=JSON)
+
+    def from_json(self, model, data):
+        """
+        Converts a JSON object created by :meth:`json_object` to an object with the attributes of the model
+        instances, so it can be passed to the methods converting database elements to records.
 
-        # Retrieve legend entries
-        legend_entries_from_db = []
-        for law_status in legend_entry_ids:
-            legend_entries_from_db.append(
-                [
-                    self.get_legend_entries_from_db(session, list(legend_entry_ids[law_status])),
-                    law_status
-                ]
+        Args:
+            model (sqlalchemy.orm.decl_api.DeclarativeMeta): The model.
+            data (dict or None): The JSON object.
+
+        Returns:
+            types.SimpleNamespace or None: The element.
+        """
+        if data is None:
+            return None
+        values = {}
+        for attribute in inspect(model).column_attrs:
+            column = attribute.columns[0]
+            value = data.get(attribute.key)
+            if value is not None and isinstance(column.type, Geometry):
+                value = WKBElement(value, srid=column.type.srid, extended=True)
+            elif value is not None and isinstance(column.type, Date):
+                value = date.fromisoformat(value)
+            values[attribute.key] = value
+        return SimpleNamespace(**values)
+
+    def public_law_restrictions_statement(self, real_estate, reference_date, public_law_restriction_ids=None):
+        """
+        Creates the statement returning every public law restriction related to the real estate as a single
+        nested JSON row with its geometries, documents, legend entry, view service and responsible office.
+        The criteria of the ORM loading (publication at the reference date, documents relevant for the
+        municipality and `filter_plr_geometries`) are applied in the subqueries.
+
+        Args:
+            real_estate (pyramid_oereb.lib.records.real_estate.RealEstateRecord): The real
+                estate in its record representation.
+            reference_date (datetime.date): The date the publication is checked against.
+            public_law_restriction_ids (list or None): The ids of the public law restrictions, if they are
+                known already. Otherwise the restrictions are looked up spatially in the same statement.
+
+        Returns:
+            sqlalchemy.sql.expression.Select: The statement.
+        """
+        models = self.models
+        public_law_restriction = models.PublicLawRestriction
+        document_link = models.PublicLawRestrictionDocument
+        geometry_criteria = [published_filter(models.Geometry, reference_date)]
+        if Config.get('filter_plr_geometries', False):
+            geometry_criteria.append(self.geometry_filter(real_estate.limit))
+        if public_law_restriction_ids is None:
+            public_law_restriction_ids = select(self._model_.public_law_restriction_id).join(
+                self._model_.public_law_restriction
+            ).where(
+                self.geometry_filter(real_estate.limit),
+                published_filter(self._model_, reference_date),
+                published_filter(public_law_restriction, reference_date)
             )
+        geometries = select(func.json_agg(self.json_object(models.Geometry))).where(
+            models.Geometry.public_law_restriction_id == public_law_restriction.id,
+            *geometry_criteria
+        ).scalar_subquery()
+        documents = select(func.json_agg(self.json_object(
+            models.Document,
+            responsible_office=select(self.json_object(models.Office)).where(
+                models.Office.id == models.Document.office_id
+            ).scalar_subquery()
+        ))).join_from(document_link, models.Document, document_link.document_id == models.Document.id).where(
+            document_link.public_law_restriction_id == public_law_restriction.id,
+            document_filter(models.Document, reference_date, real_estate.fosnr)
+        ).scalar_subquery()
+        return select(self.json_object(
+            public_law_restriction,
+            geometries=geometries,
+            documents=documents,
+            legend_entry=select(self.json_object(models.LegendEntry)).where(
+                models.LegendEntry.id == public_law_restriction.legend_entry_id
+            ).scalar_subquery(),
+            view_service=select(self.json_object(models.ViewService)).where(
+                models.ViewService.id == public_law_restriction.view_service_id
+            ).scalar_subquery(),
+            responsible_office=select(self.json_object(models.Office)).where(
+                models.Office.id == public_law_restriction.office_id
+            ).scalar_subquery()
+        )).where(
+            public_law_restriction.id.in_(public_law_restriction_ids)
+        ).order_by(public_law_restriction.id)
+
+    def from_json_to_public_law_restriction(self, data):
+        """
+        Converts a JSON row of :meth:`public_law_restrictions_statement` to an element with the attributes
+        and relations used by :meth:`from_db_to_plr_record`.
 
-        return legend_entries_from_db
+        Args:
+            data (dict): The JSON row.
+
+        Returns:
+            types.SimpleNamespace: The public law restriction.
+        """
+        models = self.models
+        public_law_restriction = self.from_json(models.PublicLawRestriction, data)
+        public_law_restriction.legend_entry = self.from_json(models.LegendEntry, data['legend_entry'])
+        public_law_restriction.view_service = self.from_json(models.ViewService, data['view_service'])
+        public_law_restriction.responsible_office = self.from_json(models.Office, data['responsible_office'])
+        public_law_restriction.geometries = [
+            self.from_json(models.Geometry, geometry) for geometry in data['geometries'] or []
+        ]
+        public_law_restriction.legal_provisions = []
+        for document_data in data['documents'] or []:
+            document = self.from_json(models.Document, document_data)
+            document.responsible_office = self.from_json(models.Office, document_data['responsible_office'])
+            public_law_restriction.legal_provisions.append(SimpleNamespace(document=document))
+        return public_law_restriction
+
+    def collect_public_law_restrictions_as_json(self, session, real_estate, reference_date,
+                                                public_law_restriction_ids=None):
+        """
+        Loads the public law restrictions related to the real estate with a single statement, see
+        :meth:`public_law_restrictions_statement`.
+
+        Args:
+            session (sqlalchemy.orm.Session): The requested clean session instance ready for use
+            real_estate (pyramid_oereb.lib.records.real_estate.RealEstateRecord): The real
+                estate in its record representation.
+            reference_date (datetime.date): The date the publication is checked against.
+            public_law_restriction_ids (list or None): The ids of the public law restrictions, if they are
+                known already.
+
+        Returns:
+            list of types.SimpleNamespace: The public law restrictions ordered by their id.
+        """
+        statement = self.public_law_restrictions_statement(
+            real_estate, reference_date, public_law_restriction_ids
+        )
+        return [
+            self.from_json_to_public_law_restriction(data) for data in session.execute(statement).scalars()
+        ]
 
     def read(self, params, real_estate, bbox):  # pylint: disable=W:0221
         """
@@ -684,41 +1004,58 @@ class DatabaseSource(BaseDatabaseSource, PlrBaseSource):
         # Check if the plr is marked as available
         if Config.availability_by_theme_code_municipality_fosnr(self._plr_info['code'], real_estate.fosnr):
             session = self.get_session()
+            reference_date = get_reference_date(params)
 
             try:
-                if session.query(self._model_).count() == 0:
+                if self.prefetched_ids is not None and len(self.prefetched_ids) == 0:
+                    # The themes have been queried together and none of this theme is related
+                    public_law_restrictions = []
+                elif self.prefetched_ids is None and session.query(self._model_).count() == 0:
                     # We can stop here already because there are no items in the database
-                    self.records = [EmptyPlrRecord(Config.get_theme_by_code_sub_code(self._plr_info['code']))]
+                    public_law_restrictions = []
+                elif self.fetch_strategy == 'json':
+                    # The database returns every related public law restriction as one nested row
+                    public_law_restrictions = self.collect_public_law_restrictions_as_json(
+                        session, real_estate, reference_date, self.prefetched_ids
+                    )
+                elif self.prefetched_ids is not None:
+                    # The related public law restrictions have been queried together with other themes
+                    public_law_restrictions = self.collect_public_law_restrictions_by_ids(
+                        session, self.prefetched_ids, real_estate, reference_date
+                    )
                 else:
                     # We need to investigate more in detail
 
                     # Try to find geometries which have spatial relation with real estate
-                    geometry_results = self.collect_related_geometries_by_real_estate(
-                        session, real_estate
-                    )
-                    if len(geometry_results) == 0:
-                        # We checked if there are spatially related elements in database. But there is none.
-                        # So we can stop here.
-                        self.records = [EmptyPlrRecord(
-                            Config.get_theme_by_code_sub_code(self._plr_info['code'])
-                        )]
-                    else:
-                        # We found spatially related elements. This means we need to extract the actual plr
-                        # information related to the found geometries.
-
-                        # get legend_entries per law_status
-                        legend_entries_from_db = self.collect_legend_entries_by_bbox(session, bbox)
-
-                        self.records = []
-                        for geometry_result in geometry_results:
-                            self.records.append(
-                                self.from_db_to_plr_record(
-                                    params,
-                                    geometry_result.public_law_restriction,
-                                    next(elem for elem in legend_entries_from_db
-                                         if elem[1] == geometry_result.public_law_restriction.law_status)[0]
-                                )
+                    public_law_restrictions = [
+                        geometry_result.public_law_restriction
+                        for geometry_result in self.collect_related_geometries_by_real_estate(
+                            session, real_estate, reference_date
+                        )
+                    ]
+                if len(public_law_restrictions) == 0:
+                    # We checked if there are spatially related elements in database. But there is none.
+                    # So we can stop here.
+                    self.records = [EmptyPlrRecord(
+                        Config.get_theme_by_code_sub_code(self._plr_info['code'])
+                    )]
+                else:
+                    # We found spatially related elements. This means we need to extract the actual plr
+                    # information related to the found geometries.
+
+                    # get legend_entries per law_status
+                    legend_entries_from_db = self.collect_legend_entries_by_bbox(session, bbox)
+
+                    self.records = []
+                    for public_law_restriction in public_law_restrictions:
+                        self.records.append(
+                            self.from_db_to_plr_record(
+                                params,
+                                public_law_restriction,
+                                next(elem for elem in legend_entries_from_db
+                                     if elem[1] == public_law_restriction.law_status)[0]
                             )
+                        )
 
             finally:
                 session.close()
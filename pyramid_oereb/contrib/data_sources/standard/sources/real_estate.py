@@ -2,7 +2,7 @@
 from geoalchemy2.elements import _SpatialElement
 
 from pyramid_oereb.core.sources import BaseDatabaseSource
-from geoalchemy2.shape import to_shape
+from pyramid_oereb.contrib import to_shapes
 
 from pyramid_oereb.core.sources.real_estate import RealEstateBaseSource
 
@@ -38,15 +38,18 @@ class DatabaseSource(BaseDatabaseSource, RealEstateBaseSource):
             else:
                 raise AttributeError('Necessary parameter were missing.')
 
+            limits = to_shapes(
+                result.limit if isinstance(result.limit, _SpatialElement) else None for result in results
+            )
             self.records = list()
-            for result in results:
+            for result, limit in zip(results, limits):
                 self.records.append(self._record_class_(
                     result.type,
                     result.canton,
                     result.municipality,
                     result.fosnr,
                     result.land_registry_area,
-                    to_shape(result.limit) if isinstance(result.limit, _SpatialElement) else None,
+                    limit,
                     metadata_of_geographical_base_data=result.metadata_of_geographical_base_data,
                     number=result.number,
                     identdn=result.identdn,
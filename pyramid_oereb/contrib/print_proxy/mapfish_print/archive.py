@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import logging
+import os
+import queue
+import sqlite3
+import tempfile
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_pdf_archive = None
+
+# Attributes of the print specification which differ on every request for the same data
+VOLATILE_ATTRIBUTES = ['CreationDate', 'ExtractIdentifier', 'Footer']
+
+# Default age in seconds up to which an archived extract is reused, it shows the original creation date
+REUSE_MAX_AGE = 86400
+
+INDEX_FILE_NAME = 'index.sqlite'
+
+CREATE_INDEX = """
+CREATE TABLE IF NOT EXISTS archive (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    egrid TEXT,
+    identdn TEXT,
+    number TEXT,
+    topics TEXT,
+    language TEXT,
+    data_version TEXT,
+    extract_identifier TEXT,
+    sha256 TEXT NOT NULL
+)
+"""
+
+CREATE_LOOKUP_INDEX = """
+CREATE INDEX IF NOT EXISTS archive_lookup ON archive (egrid, topics, language, data_version, created)
+"""
+
+
+def get_data_version(spec):
+    """
+    Computes a version of the data shown in a static extract. Two extracts of the same real estate with
+    the same version contain the same information apart from their creation date and identifier.
+
+    Args:
+        spec (dict): The mapfish print specification.
+
+    Returns:
+        str: The hex digest identifying the data version.
+    """
+    data = dict(spec)
+    data['attributes'] = dict(
+        (key, value) for key, value in spec.get('attributes', {}).items() if key not in VOLATILE_ATTRIBUTES
+    )
+    serialized = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+
+class PdfArchive(object):
+    """
+    Stores generated static extracts content addressed below a directory. Identical files are only
+    stored once. Every archived extract is recorded in a SQLite index together with the real estate,
+    the requested topics, the language and the data version, so an unchanged extract can be found again.
+
+    Files are written by a background thread. If its queue is full, the file is written in the calling
+    thread instead, so no extract gets lost.
+
+    Attributes:
+        path (str): The directory of the archive.
+        queue_size (int): The number of files which may wait to be written.
+    """
+
+    def __init__(self, path, queue_size=100):
+        """
+        Args:
+            path (str): The directory of the archive. It is created if it does not exist.
+            queue_size (int): The number of files which may wait to be written by the background thread.
+        """
+        self.path = path
+        self.queue_size = queue_size
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        os.makedirs(os.path.join(self.path, 'objects'), exist_ok=True)
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute(CREATE_INDEX)
+                connection.execute(CREATE_LOOKUP_INDEX)
+        finally:
+            connection.close()
+
+    def _connect(self):
+        return sqlite3.connect(os.path.join(self.path, INDEX_FILE_NAME), timeout=30)
+
+    def object_path(self, sha256):
+        """
+        Args:
+            sha256 (str): The hex digest of the file content.
+
+        Returns:
+            str: The path of the file with the passed digest.
+        """
+        return os.path.join(self.path, 'objects', sha256[:2], '{}.pdf'.format(sha256))
+
+    def submit(self, content, metadata):
+        """
+        Queues a static extract for archiving.
+
+        Args:
+            content (bytes): The pdf content.
+            metadata (dict): The index values: egrid, identdn, number, topics (list of str), language,
+                data_version and extract_identifier. Missing values are stored as NULL.
+        """
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((content, metadata, time.time()))
+        except queue.Full:
+            log.warning('PDF archive queue is full, archiving in the request thread')
+            self._write(content, metadata, time.time())
+
+    def find(self, egrid, topics, language, data_version, max_age=None, identdn=None, number=None):
+        """
+        Looks up the latest archived extract for the passed values. The real estate is identified by its
+        EGRID, its IdentDN and its number, so real estates without EGRID are found as well.
+
+        Args:
+            egrid (str or None): The EGRID of the real estate.
+            topics (list of str): The requested topics.
+            language (str): The language of the extract.
+            data_version (str): The data version as returned by :func:`get_data_version`.
+            max_age (float or None): Only extracts archived at most this many seconds ago are considered.
+            identdn (str or None): The IdentDN of the real estate.
+            number (str or None): The number of the real estate.
+
+        Returns:
+            bytes or None: The pdf content or None if there is no matching extract.
+        """
+        query = 'SELECT sha256 FROM archive WHERE egrid IS ? AND identdn IS ? AND number IS ? ' \
+                'AND topics = ? AND language = ? AND data_version = ?'
+        params = [egrid, identdn, number, self._format_topics(topics), language, data_version]
+        if max_age is not None:
+            query += ' AND created >= ?'
+            params.append(time.time() - max_age)
+        query += ' ORDER BY created DESC LIMIT 1'
+        connection = self._connect()
+        try:
+            row = connection.execute(query, params).fetchone()
+        finally:
+            connection.close()
+        if row is None:
+            return None
+        try:
+            with open(self.object_path(row[0]), 'rb') as f:
+                return f.read()
+        except OSError as e:
+            log.warning('Archived pdf {} could not be read: {}'.format(row[0], e))
+            return None
+
+    def flush(self):
+        """
+        Blocks until all queued extracts have been written.
+        """
+        self._queue.join()
+
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='pdf-archive', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            content, metadata, created = self._queue.get()
+            try:
+                self._write(content, metadata, created)
+            except Exception as e:
+                log.error('Archiving pdf for {} failed: {}'.format(metadata.get('egrid'), e))
+            finally:
+                self._queue.task_done()
+
+    def _write(self, content, metadata, created):
+        sha256 = hashlib.sha256(content).hexdigest()
+        path = self.object_path(sha256)
+        if not os.path.exists(path):
+            directory = os.path.dirname(path)
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(content)
+                os.replace(tmp_path, path)
+            except OSError:
+                os.unlink(tmp_path)
+                raise
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute(
+                    'INSERT INTO archive (created, egrid, identdn, number, topics, language, data_version, '
+                    'extract_identifier, sha256) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (
+                        created,
+                        metadata.get('egrid'),
+                        metadata.get('identdn'),
+                        metadata.get('number'),
+                        self._format_topics(metadata.get('topics')),
+                        metadata.get('language'),
+                        metadata.get('data_version'),
+                        metadata.get('extract_identifier'),
+                        sha256
+                    )
+                )
+        finally:
+            connection.close()
+        log.debug('Pdf file archived at: {}'.format(path))
+        return path
+
+    @staticmethod
+    def _format_topics(topics):
+        return ','.join(sorted(topics)) if topics else ''
+
+
+def get_pdf_archive(print_config):
+    """
+    Returns the process wide pdf archive for the passed print configuration. The archive is created on
+    first use.
+
+    Args:
+        print_config (dict): The `print` section of the application configuration.
+
+    Returns:
+        PdfArchive or None: The archive or None if `archive.path` is not configured.
+    """
+    global _pdf_archive
+    archive_config = print_config.get('archive') or {}
+    path = archive_config.get('path')
+    if not path:
+        return None
+    with _lock:
+        if _pdf_archive is None:
+            _pdf_archive = PdfArchive(path, int(archive_config.get('queue_size', 100)))
+        return _pdf_archive
+
+
+def reset():
+    """
+    Drops the shared archive after writing all queued extracts, so it is created again from the current
+    configuration.
+    """
+    global _pdf_archive
+    with _lock:
+        if _pdf_archive is not None:
+            _pdf_archive.flush()
+        _pdf_archive = None
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+log = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_print_slots = None
+_print_session = None
+
+
+class PrintSlots(object):
+    """
+    A bounded number of print jobs which may run concurrently against the print server together with a
+    bounded queue of jobs waiting for a free slot.
+
+    Attributes:
+        max_concurrent (int): The number of print jobs which may run at the same time.
+        max_queued (int): The number of print jobs which may wait for a free slot.
+        queue_timeout (float): Seconds a print job waits for a free slot before giving up.
+    """
+
+    def __init__(self, max_concurrent, max_queued=0, queue_timeout=None):
+        """
+        Args:
+            max_concurrent (int): The number of print jobs which may run at the same time.
+            max_queued (int): The number of print jobs which may wait for a free slot. Further jobs are
+                rejected immediately.
+            queue_timeout (float or None): Seconds a print job waits for a free slot. None means waiting
+                without limit.
+        """
+        if max_concurrent < 1:
+            raise ValueError('max_concurrent must be at least 1, got {}'.format(max_concurrent))
+        self.max_concurrent = max_concurrent
+        self.max_queued = max(0, max_queued)
+        self.queue_timeout = queue_timeout
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        self._waiting_lock = threading.Lock()
+        self._waiting = 0
+        self._active = 0
+
+    @property
+    def waiting(self):
+        """
+        Returns:
+            int: The number of print jobs currently waiting for a slot.
+        """
+        return self._waiting
+
+    @property
+    def active(self):
+        """
+        Returns:
+            int: The number of print jobs currently holding a slot.
+        """
+        return self._active
+
+    def acquire(self):
+        """
+        Tries to obtain a print slot. A free slot is taken immediately. Otherwise the caller is queued if
+        the queue is not full yet and waits at most `queue_timeout` seconds.
+
+        Returns:
+            bool: True if a slot was obtained, False if the queue was full or the wait timed out.
+        """
+        if self._semaphore.acquire(blocking=False):
+            self._mark_active(1)
+            return True
+        with self._waiting_lock:
+            if self._waiting >= self.max_queued:
+                log.warning('Print queue is full ({} waiting, {} running)'.format(
+                    self._waiting, self._active))
+                return False
+            self._waiting += 1
+        try:
+            acquired = self._semaphore.acquire(timeout=self.queue_timeout)
+        finally:
+            with self._waiting_lock:
+                self._waiting -= 1
+        if acquired:
+            self._mark_active(1)
+        else:
+            log.warning('No print slot available after waiting {} seconds'.format(self.queue_timeout))
+        return acquired
+
+    def release(self):
+        """
+        Gives back a print slot obtained by :meth:`acquire`.
+        """
+        self._mark_active(-1)
+        self._semaphore.release()
+
+    def _mark_active(self, delta):
+        with self._waiting_lock:
+            self._active += delta
+
+
+def get_print_slots(print_config):
+    """
+    Returns the process wide print slots for the passed print configuration. The slots are created on first
+    use.
+
+    Args:
+        print_config (dict): The `print` section of the application configuration.
+
+    Returns:
+        PrintSlots or None: The print slots or None if no limit is configured.
+    """
+    global _print_slots
+    max_concurrent = print_config.get('max_concurrent_prints')
+    if not max_concurrent:
+        return None
+    with _lock:
+        if _print_slots is None:
+            _print_slots = PrintSlots(
+                int(max_concurrent),
+                int(print_config.get('max_queued_prints', 0)),
+                print_config.get('print_queue_timeout', 30)
+            )
+        return _print_slots
+
+
+def get_print_session(print_config):
+    """
+    Returns the process wide HTTP session used to talk to the print server. Connections are kept in a pool
+    so they can be reused by subsequent print jobs.
+
+    Args:
+        print_config (dict): The `print` section of the application configuration.
+
+    Returns:
+        requests.Session: The shared session.
+    """
+    global _print_session
+    with _lock:
+        if _print_session is None:
+            pool_size = int(print_config.get('max_concurrent_prints') or 10)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _print_session = session
+        return _print_session
+
+
+def get_print_timeout(print_config):
+    """
+    Returns the timeout passed to requests when calling the print server.
+
+    Args:
+        print_config (dict): The `print` section of the application configuration.
+
+    Returns:
+        tuple: The connect and the read timeout in seconds. The read timeout may be None.
+    """
+    return print_config.get('connect_timeout', 10), print_config.get('read_timeout')
+
+
+def reset():
+    """
+    Drops the shared print slots and session, so they are created again from the current configuration.
+    """
+    global _print_slots, _print_session
+    with _lock:
+        if _print_session is not None:
+            _print_session.close()
+        _print_slots = None
+        _print_session = None
@@ -11,14 +11,22 @@ from pyramid.httpexceptions import HTTPBadRequest
 from pyramid_oereb import Config
 from pyramid_oereb.core.renderer.extract.json_ import Renderer as JsonRenderer
 from pyramid_oereb.core.url import parse_url
-from pyramid.httpexceptions import HTTPInternalServerError
+from pyramid_oereb.core.timing import stage
+from pyramid.httpexceptions import HTTPInternalServerError, HTTPServiceUnavailable
 from pypdf import PdfReader
 from pypdf.errors import PdfReadError
 from pyramid_oereb.contrib.print_proxy.mapfish_print.toc_pages import TocPages
+from pyramid_oereb.contrib.print_proxy.mapfish_print.backpressure import get_print_slots, \
+    get_print_session, get_print_timeout
+from pyramid_oereb.contrib.print_proxy.mapfish_print.archive import get_pdf_archive, get_data_version, \
+    REUSE_MAX_AGE
+from pyramid_oereb.core.coalescing import get_single_flight
 
 
 log = logging.getLogger(__name__)
 
+_MISSING = object()
+
 LEGEND_ELEMENT_SORT_ORDER = [
     'AreaShare',
     'LengthShare',
@@ -111,45 +119,40 @@ class Renderer(JsonRenderer):
         if self._request.GET.get('getspec', 'no') != 'no':
             response.headers['Content-Type'] = 'application/json; charset=UTF-8'
             return json.dumps(spec, sort_keys=True, indent=4)
+
+        pdf_archive = get_pdf_archive(print_config)
+        archive_metadata = None
+        if pdf_archive is not None:
+            archive_config = print_config.get('archive')
+            archive_metadata = {
+                'egrid': extract_as_dict.get('RealEstate_EGRID'),
+                'identdn': extract_as_dict.get('RealEstate_IdentDN'),
+                'number': extract_as_dict.get('RealEstate_Number'),
+                'topics': value[1].topics,
+                'language': self._language,
+                'data_version': self.get_data_version(spec),
+                'extract_identifier': extract_as_dict.get('ExtractIdentifier')
+            }
+            if archive_config.get('reuse', False):
+                content = pdf_archive.find(
+                    archive_metadata['egrid'],
+                    archive_metadata['topics'],
+                    archive_metadata['language'],
+                    archive_metadata['data_version'],
+                    archive_config.get('reuse_max_age', REUSE_MAX_AGE),
+                    identdn=archive_metadata['identdn'],
+                    number=archive_metadata['number']
+                )
+                if content is not None:
+                    log.debug('Serving archived pdf for unchanged extract of {}'.format(
+                        archive_metadata['egrid'] or '{identdn} {number}'.format(**archive_metadata)))
+                    response.content_type = 'application/pdf'
+                    return content
+
         pdf_url = urlparse.urljoin(print_config['base_url'] + '/', 'buildreport.pdf')
         pdf_headers = print_config['headers']
-        print_result = requests.post(
-            pdf_url,
-            headers=pdf_headers,
-            data=json.dumps(spec)
-        )
-        try:
-            log.debug('Validation of the TOC length with compute_toc_pages set to {} and expected_toc_length set to {}'.format(print_config.get('compute_toc_pages'), print_config.get('expected_toc_length'))) # noqa
-            with io.BytesIO() as pdf:
-                pdf.write(print_result.content)
-                pdf_reader = PdfReader(pdf)
-                x = []
-                for i in range(len(pdf_reader.outline)):
-                    if isinstance(pdf_reader.outline[i], list):
-                        x.append(pdf_reader.outline[i][0]['/Page']['/StructParents'])
-                    else:
-                        x.append(pdf_reader.outline[i]['/Page']['/StructParents'])
-                try:
-                    true_nb_of_toc = min(x)-1
-                except ValueError:
-                    true_nb_of_toc = 1
-
-                log.debug('True number of TOC pages is {}, expected number was {}'.format(true_nb_of_toc, extract_as_dict['nbTocPages'])) # noqa
-                if true_nb_of_toc != extract_as_dict['nbTocPages']:
-                    log.warning('nbTocPages in result pdf: {} are not equal to the one predicted : {}, request new pdf'.format(true_nb_of_toc,extract_as_dict['nbTocPages'])) # noqa
-                    log.debug('Secondary PDF extract call STARTED')
-                    extract_as_dict['nbTocPages'] = true_nb_of_toc
-                    print_result = requests.post(
-                        pdf_url,
-                        headers=pdf_headers,
-                        data=json.dumps(spec)
-                    )
-                    log.debug('Secondary PDF extract call to fix TOC pages number DONE')
-
-        except PdfReadError as e:
-            err_msg = 'a problem occurred while generating the pdf file'
-            log.error(err_msg + ': ' + str(e))
-            raise HTTPInternalServerError(self._static_error_message)
+        print_result, shared = self._coalesced_print(print_config, pdf_url, pdf_headers, spec,
+                                                     extract_as_dict)
 
         try:
             content = print_result.content
@@ -162,6 +165,8 @@ class Renderer(JsonRenderer):
         pdf_archive_path = print_config.get('pdf_archive_path', None)
         if pdf_archive_path is not None:
             self.archive_pdf_file(pdf_archive_path, content, extract_as_dict)
+        if pdf_archive is not None and print_result.status_code == 200 and not shared:
+            pdf_archive.submit(content, archive_metadata)
 
         response.status_code = print_result.status_code
         response.headers = print_result.headers
@@ -171,10 +176,138 @@ class Renderer(JsonRenderer):
             del response.headers['Connection']
         return content
 
+    def _coalesced_print(self, print_config, pdf_url, pdf_headers, spec, extract_as_dict):
+        """
+        Prints the static extract, sharing the print with the concurrent requests of the same data if the
+        `print` operation is coalesced. The requests are matched by the data version of the print
+        specification, so the shared PDF shows the identifier and creation date of the request which
+        printed it, like an extract reused from the archive.
+
+        Args:
+            print_config (dict): The `print` section of the application configuration.
+            pdf_url (str): The URL of the print report endpoint.
+            pdf_headers (dict): The headers sent to the print server.
+            spec (dict): The print specification.
+            extract_as_dict (dict): The attributes of the print specification.
+
+        Returns:
+            tuple: The response of the print server and True if it was printed for another request.
+        """
+        single_flight = get_single_flight('print', Config.get('coalescing'))
+        if single_flight is None:
+            return self._print(print_config, pdf_url, pdf_headers, spec, extract_as_dict), False
+        return single_flight.do(
+            self.get_data_version(spec),
+            lambda: self._print(print_config, pdf_url, pdf_headers, spec, extract_as_dict)
+        )
+
+    def _print(self, print_config, pdf_url, pdf_headers, spec, extract_as_dict):
+        """
+        Prints the static extract, using a print slot if configured. If the number of table of contents
+        pages differs from the expected one, the extract is printed again with the real number.
+
+        Args:
+            print_config (dict): The `print` section of the application configuration.
+            pdf_url (str): The URL of the print report endpoint.
+            pdf_headers (dict): The headers sent to the print server.
+            spec (dict): The print specification.
+            extract_as_dict (dict): The attributes of the print specification.
+
+        Returns:
+            requests.Response: The response of the print server.
+
+        Raises:
+            HTTPServiceUnavailable: when all print slots are busy.
+            HTTPInternalServerError: when the print server failed.
+        """
+        print_slots = get_print_slots(print_config)
+        if print_slots is not None and not print_slots.acquire():
+            raise HTTPServiceUnavailable(
+                self._static_error_message,
+                headers={'Retry-After': str(print_config.get('retry_after', 10))}
+            )
+        try:
+            print_result = self._post_print(print_config, pdf_url, pdf_headers, spec)
+            try:
+                log.debug('Validation of the TOC length with compute_toc_pages set to {} and expected_toc_length set to {}'.format(print_config.get('compute_toc_pages'), print_config.get('expected_toc_length'))) # noqa
+                with io.BytesIO() as pdf:
+                    pdf.write(print_result.content)
+                    pdf_reader = PdfReader(pdf)
+                    x = []
+                    for i in range(len(pdf_reader.outline)):
+                        if isinstance(pdf_reader.outline[i], list):
+                            x.append(pdf_reader.outline[i][0]['/Page']['/StructParents'])
+                        else:
+                            x.append(pdf_reader.outline[i]['/Page']['/StructParents'])
+                    try:
+                        true_nb_of_toc = min(x)-1
+                    except ValueError:
+                        true_nb_of_toc = 1
+
+                    log.debug('True number of TOC pages is {}, expected number was {}'.format(true_nb_of_toc, extract_as_dict['nbTocPages'])) # noqa
+                    if true_nb_of_toc != extract_as_dict['nbTocPages']:
+                        log.warning('nbTocPages in result pdf: {} are not equal to the one predicted : {}, request new pdf'.format(true_nb_of_toc,extract_as_dict['nbTocPages'])) # noqa
+                        log.debug('Secondary PDF extract call STARTED')
+                        extract_as_dict['nbTocPages'] = true_nb_of_toc
+                        print_result = self._post_print(print_config, pdf_url, pdf_headers, spec)
+                        log.debug('Secondary PDF extract call to fix TOC pages number DONE')
+
+            except PdfReadError as e:
+                err_msg = 'a problem occurred while generating the pdf file'
+                log.error(err_msg + ': ' + str(e))
+                raise HTTPInternalServerError(self._static_error_message)
+        finally:
+            if print_slots is not None:
+                print_slots.release()
+
+        return print_result
+
+    def _post_print(self, print_config, pdf_url, pdf_headers, spec):
+        """
+        Sends the print specification to the print server using the shared connection pool.
+
+        Args:
+            print_config (dict): The `print` section of the application configuration.
+            pdf_url (str): The URL of the print report endpoint.
+            pdf_headers (dict): The headers sent to the print server.
+            spec (dict): The print specification.
+
+        Returns:
+            requests.Response: The response of the print server.
+
+        Raises:
+            HTTPInternalServerError: when the print server could not be reached in time.
+        """
+        try:
+            with stage('print'):
+                return get_print_session(print_config).post(
+                    pdf_url,
+                    headers=pdf_headers,
+                    data=json.dumps(spec),
+                    timeout=get_print_timeout(print_config)
+                )
+        except requests.RequestException as e:
+            log.error('Calling the print server failed: {}'.format(e))
+            raise HTTPInternalServerError(self._static_error_message)
+
+    def get_data_version(self, spec):
+        """
+        Returns the version of the data shown in the static extract, used to find an archived extract
+        which can be served instead of printing the same content again.
+
+        Args:
+            spec (dict): The mapfish print specification.
+
+        Returns:
+            str: The data version.
+        """
+        return get_data_version(spec)
+
     def archive_pdf_file(self, pdf_archive_path, binary_content, extract_as_dict):
         """
         Writes the static extract (pdf) into a dedicated file; this functionality can thus be used
-        for archiving.
+        for archiving. The file is written in the request thread, this is deprecated in favour of the
+        `archive` of the `print` section, which writes the files in the background.
 
         Args:
             pdf_archive_path (str): directory path where the file shall be stored.
@@ -197,8 +330,8 @@ class Renderer(JsonRenderer):
         else:
             path_and_filename = pdf_archive_path + time_info + '_' + egrid + '.pdf'
 
-        archive = open(path_and_filename, 'ab')
-        archive.write(binary_content)
+        with open(path_and_filename, 'ab') as archive:
+            archive.write(binary_content)
         log.debug('Pdf file archived at: ' + path_and_filename)
         return path_and_filename
 
@@ -252,8 +385,9 @@ class Renderer(JsonRenderer):
                             convenient for mapfish-print
             feature_geometry: the geometry for this extract, will get added to the extract information
         """
-        log.debug("Starting transformation, extract_dict is {}".format(extract_dict))
-        log.debug("Parameter feature_geometry is {}".format(feature_geometry))
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Starting transformation, extract_dict is {}".format(extract_dict))
+            log.debug("Parameter feature_geometry is {}".format(feature_geometry))
         if self.global_datetime is None:
             # make sure this is set i.e when running tests
             self.set_global_datetime(extract_dict['CreationDate'])
@@ -318,11 +452,7 @@ class Renderer(JsonRenderer):
 
         flattened_general_info = []
         for item in extract_dict.get('GeneralInformation', []):
-            lang_obj = dict([(e['Language'], e['Text']) for e in item])
-            if self._language in lang_obj.keys():
-                flattened_general_info.append({'Info': lang_obj[self._language]})
-            else:
-                flattened_general_info.append({'Info': lang_obj[self._fallback_language]})
+            flattened_general_info.append({'Info': self._get_localized_text(item)})
         extract_dict['GeneralInformation'] = flattened_general_info
         update_date_cs = datetime.strptime(extract_dict['UpdateDateCS'], '%Y-%m-%dT%H:%M:%S')
         extract_dict['UpdateDateCS'] = update_date_cs.strftime('%d.%m.%Y')
@@ -334,84 +464,14 @@ class Renderer(JsonRenderer):
             self._multilingual_text(item, 'Content')
         self._multilingual_text(extract_dict, 'PLRCadastreAuthority_Name')
 
-        for restriction_on_landownership in extract_dict.get('RealEstate_RestrictionOnLandownership', []):
-            self._flatten_object(restriction_on_landownership, 'Lawstatus')
-            self._flatten_object(restriction_on_landownership, 'Theme')
-            self._flatten_object(restriction_on_landownership, 'SubTheme')
-            self._flatten_array_object(restriction_on_landownership, 'Geometry', 'ResponsibleOffice')
-            self._multilingual_text(restriction_on_landownership, 'Theme_Text')
-            self._multilingual_text(restriction_on_landownership, 'SubTheme_Text')
-            self._multilingual_text(restriction_on_landownership, 'Lawstatus_Text')
-            self._multilingual_text(restriction_on_landownership, 'LegendText')
-
-            self._multilingual_text(restriction_on_landownership['ResponsibleOffice'], 'Name')
-            self._multilingual_text(restriction_on_landownership['ResponsibleOffice'], 'OfficeAtWeb')
-            restriction_on_landownership['ResponsibleOffice'] = \
-                [restriction_on_landownership['ResponsibleOffice']]
-
-            self._multilingual_text(restriction_on_landownership['Map'], 'ReferenceWMS')
-            url, params = parse_url(restriction_on_landownership['Map']['ReferenceWMS'])
-
-            restriction_on_landownership['baseLayers'] = {
-                'layers': [{
-                    'type': params.pop('SERVICE', ['wms'])[0].lower(),
-                    'opacity': restriction_on_landownership['Map'].get('layerOpacity', 0.6),
-                    'styles': params.pop('STYLES', ['default'])[0],
-                    'baseURL': urlparse.urlunsplit((url.scheme, url.netloc, url.path, None, None)),
-                    'layers': params.pop('LAYERS', '')[0].split(','),
-                    'imageFormat': params.pop('FORMAT', ['image/png'])[0],
-                    'customParams': self.get_custom_wms_params(params),
-                }, basemap]
-            }
+        print_config = Config.get('print', {})
+        group_legal_provisions = print_config.get('group_legal_provisions', False)
 
-            # Legend of other visible restriction objects in the topic map
-            restriction_on_landownership['OtherLegend'] = restriction_on_landownership['Map'].get(
-                'OtherLegend', [])
-            for legend_item in restriction_on_landownership['OtherLegend']:
-                self._multilingual_text(legend_item, 'LegendText')
-
-            for legend_entry in restriction_on_landownership['OtherLegend']:
-                for element in list(legend_entry.keys()):
-                    if element not in ['LegendText', 'SymbolRef', 'TypeCode']:
-                        del legend_entry[element]
-
-            del restriction_on_landownership['Map']  # /definitions/Map
-
-            for item in restriction_on_landownership.get('Geometry', []):
-                self._multilingual_text(item, 'ResponsibleOffice_Name')
-
-            legal_provisions = {}
-            laws = {}
-            hints = {}
-
-            if 'LegalProvisions' in restriction_on_landownership:
-                finish = False
-                while not finish:
-                    finish = True
-                    for legal_provision in restriction_on_landownership['LegalProvisions']:
-                        if 'Base64TextAtWeb' in legal_provision:
-                            del legal_provision['Base64TextAtWeb']
-                        if 'Reference' in legal_provision:
-                            for reference in legal_provision['Reference']:
-                                self._categorize_documents(reference, legal_provisions, laws, hints)
-                            del legal_provision['Reference']
-                            finish = False
-                        if 'Article' in legal_provision:
-                            for article in legal_provision['Article']:
-                                self._categorize_documents(article, legal_provisions, laws, hints)
-                            del legal_provision['Article']
-                            finish = False
-
-                        self._categorize_documents(legal_provision, legal_provisions, laws, hints)
-
-                del restriction_on_landownership['LegalProvisions']
-
-            restriction_on_landownership['LegalProvisions'] = legal_provisions
-            restriction_on_landownership['Laws'] = laws
-            restriction_on_landownership['Hints'] = hints
-
-        # One restriction entry per theme
+        # One restriction entry per theme. Every restriction is flattened and merged into the entry of
+        # its theme in the same pass.
         theme_restriction = {}
+        # Symbols of the merged legend entries per theme, removed from the other legend afterwards
+        theme_symbol_refs = {}
         text_element = [
             'LegendText', 'Lawstatus_Code', 'Lawstatus_Text', 'SymbolRef', 'TypeCode'
         ]
@@ -420,6 +480,7 @@ class Renderer(JsonRenderer):
             'SymbolRef', 'LegendText'
         ]
         for restriction_on_landownership in extract_dict.get('RealEstate_RestrictionOnLandownership', []):
+            self._flatten_restriction_on_landownership(restriction_on_landownership, basemap)
 
             theme_text = restriction_on_landownership['Theme_Text']
             if 'Theme_SubCode' in restriction_on_landownership:
@@ -448,6 +509,7 @@ class Renderer(JsonRenderer):
                 current = dict(restriction_on_landownership)
                 current['Geom_Type'] = geom_type
                 theme_restriction[theme] = current
+                theme_symbol_refs[theme] = set()
 
                 # Legend
                 legend = {}
@@ -480,11 +542,7 @@ class Renderer(JsonRenderer):
                     del restriction_on_landownership[element]
                     legend['Geom_Type'] = geom_type
             current['Legend'].append(legend)
-
-            # Remove in OtherLegend elements that are already in the legend
-            current['OtherLegend'] = [other_legend_element
-                                      for other_legend_element in current['OtherLegend']
-                                      if other_legend_element['SymbolRef'] != legend['SymbolRef']]
+            theme_symbol_refs[theme].add(legend['SymbolRef'])
 
             # Number or array
             for element in ['Laws', 'LegalProvisions', 'Hints']:
@@ -524,26 +582,28 @@ class Renderer(JsonRenderer):
                 if element in restriction_on_landownership:
                     current[element].add(restriction_on_landownership[element])
 
-        for restriction_on_landownership in theme_restriction.values():
+        restrictions = []
+        for theme, restriction in theme_restriction.items():
+            # Remove in OtherLegend elements that are already in the legend
+            symbol_refs = theme_symbol_refs[theme]
+            if symbol_refs:
+                restriction['OtherLegend'] = [other_legend_element
+                                              for other_legend_element in restriction['OtherLegend']
+                                              if other_legend_element['SymbolRef'] not in symbol_refs]
+
             for element in text_element:
-                restriction_on_landownership[element] = '\n'.join(restriction_on_landownership[element])
+                restriction[element] = '\n'.join(restriction[element])
             for element in ['Laws', 'LegalProvisions', 'Hints']:
-                values = list(restriction_on_landownership[element].values())
+                values = list(restriction[element].values())
                 self.lpra_flatten(values)
-                restriction_on_landownership[element] = values
+                restriction[element] = values
 
                 # Group legal provisions and hints which have the same title.
-                if (
-                       (Config.get('print', {}).get('group_legal_provisions', False)) and
-                       (element == 'LegalProvisions' or element == 'Hints')
-                   ):
-                    restriction_on_landownership[element] = \
-                        self.group_legal_provisions(restriction_on_landownership[element])
+                if group_legal_provisions and (element == 'LegalProvisions' or element == 'Hints'):
+                    restriction[element] = self.group_legal_provisions(restriction[element])
 
-            self.sort_restriction_on_landownership_documents(restriction_on_landownership)
+            self.sort_restriction_on_landownership_documents(restriction)
 
-        restrictions = list(theme_restriction.values())
-        for restriction in restrictions:
             legends = {}
             for legend in restriction['Legend']:
                 type_ = f"{legend['SymbolRef']}"
@@ -557,9 +617,20 @@ class Renderer(JsonRenderer):
                 else:
                     legends[type_] = legend
             # After transformation, get the new legend entries, sorted by TypeCode
-            transformed_legend = \
-                list([transformed_entry for (key, transformed_entry) in legends.items()])
-            restriction['Legend'] = self.sort_dict_list(transformed_legend, self.sort_legend_elem)
+            restriction['Legend'] = self.sort_dict_list(list(legends.values()), self.sort_legend_elem)
+
+            # Reformat AreaShare, LengthShare, NrOfPoints and part in percent values
+            for legend in restriction['Legend']:
+                if 'LengthShare' in legend:
+                    legend['LengthShare'] = '{0} m'.format(legend['LengthShare'])
+                if 'AreaShare' in legend:
+                    legend['AreaShare'] = u'{0} m²'.format(legend['AreaShare'])
+                if 'PartInPercent' in legend:
+                    legend['PartInPercent'] = '{0}%'.format(round(legend['PartInPercent'], 2))
+                if 'NrOfPoints' in legend:
+                    legend['NrOfPoints'] = '{0}'.format(legend['NrOfPoints'])
+
+            restrictions.append(restriction)
 
         extract_dict['RealEstate_RestrictionOnLandownership'] = restrictions
         # End one restriction entry per theme
@@ -592,24 +663,88 @@ class Renderer(JsonRenderer):
             extract_dict['RealEstate_LandRegistryArea']
         )
 
-        # Reformat AreaShare, LengthShare, NrOfPoints and part in percent values
-        for restriction in extract_dict['RealEstate_RestrictionOnLandownership']:
-            for legend in restriction['Legend']:
-                if 'LengthShare' in legend:
-                    legend['LengthShare'] = '{0} m'.format(legend['LengthShare'])
-                if 'AreaShare' in legend:
-                    legend['AreaShare'] = u'{0} m²'.format(legend['AreaShare'])
-                if 'PartInPercent' in legend:
-                    legend['PartInPercent'] = '{0}%'.format(round(legend['PartInPercent'], 2))
-                if 'NrOfPoints' in legend:
-                    legend['NrOfPoints'] = '{0}'.format(legend['NrOfPoints'])
-
-        extract_dict['PrintCantonLogo'] = Config.get('print', {}).get('print_canton_logo', True)
-        extract_dict['PrintMunicipalityName'] = Config.get('print', {}).get('print_municipality_name', True)
+        extract_dict['PrintCantonLogo'] = print_config.get('print_canton_logo', True)
+        extract_dict['PrintMunicipalityName'] = print_config.get('print_municipality_name', True)
 
-        log.debug("After transformation, extract_dict is {}".format(json.dumps(extract_dict, indent=4)))
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("After transformation, extract_dict is {}".format(json.dumps(extract_dict, indent=4)))
         return extract_dict
 
+    def _flatten_restriction_on_landownership(self, restriction_on_landownership, basemap):
+        """
+        Flattens and translates a single restriction on landownership and categorizes its documents.
+
+        Args:
+            restriction_on_landownership (dict): the restriction on landownership of the extract
+            basemap (dict): the base layer of the land register plan added to the restriction's map
+        """
+        self._flatten_object(restriction_on_landownership, 'Lawstatus')
+        self._flatten_object(restriction_on_landownership, 'Theme')
+        self._flatten_object(restriction_on_landownership, 'SubTheme')
+        self._flatten_array_object(restriction_on_landownership, 'Geometry', 'ResponsibleOffice')
+        self._multilingual_text(restriction_on_landownership, 'Theme_Text')
+        self._multilingual_text(restriction_on_landownership, 'SubTheme_Text')
+        self._multilingual_text(restriction_on_landownership, 'Lawstatus_Text')
+        self._multilingual_text(restriction_on_landownership, 'LegendText')
+
+        self._multilingual_text(restriction_on_landownership['ResponsibleOffice'], 'Name')
+        self._multilingual_text(restriction_on_landownership['ResponsibleOffice'], 'OfficeAtWeb')
+        restriction_on_landownership['ResponsibleOffice'] = \
+            [restriction_on_landownership['ResponsibleOffice']]
+
+        self._multilingual_text(restriction_on_landownership['Map'], 'ReferenceWMS')
+        url, params = parse_url(restriction_on_landownership['Map']['ReferenceWMS'])
+
+        restriction_on_landownership['baseLayers'] = {
+            'layers': [{
+                'type': params.pop('SERVICE', ['wms'])[0].lower(),
+                'opacity': restriction_on_landownership['Map'].get('layerOpacity', 0.6),
+                'styles': params.pop('STYLES', ['default'])[0],
+                'baseURL': urlparse.urlunsplit((url.scheme, url.netloc, url.path, None, None)),
+                'layers': params.pop('LAYERS', '')[0].split(','),
+                'imageFormat': params.pop('FORMAT', ['image/png'])[0],
+                'customParams': self.get_custom_wms_params(params),
+            }, basemap]
+        }
+
+        # Legend of other visible restriction objects in the topic map
+        restriction_on_landownership['OtherLegend'] = restriction_on_landownership['Map'].get(
+            'OtherLegend', [])
+        for legend_entry in restriction_on_landownership['OtherLegend']:
+            self._multilingual_text(legend_entry, 'LegendText')
+            for element in list(legend_entry.keys()):
+                if element not in ['LegendText', 'SymbolRef', 'TypeCode']:
+                    del legend_entry[element]
+
+        del restriction_on_landownership['Map']  # /definitions/Map
+
+        for item in restriction_on_landownership.get('Geometry', []):
+            self._multilingual_text(item, 'ResponsibleOffice_Name')
+
+        legal_provisions = {}
+        laws = {}
+        hints = {}
+
+        documents = restriction_on_landownership.pop('LegalProvisions', None)
+        if documents is not None:
+            nested = False
+            for legal_provision in documents:
+                legal_provision.pop('Base64TextAtWeb', None)
+                for name in ['Reference', 'Article']:
+                    if name in legal_provision:
+                        for document in legal_provision.pop(name):
+                            self._categorize_documents(document, legal_provisions, laws, hints)
+                        nested = True
+                self._categorize_documents(legal_provision, legal_provisions, laws, hints)
+            if nested:
+                # A referenced document must not replace a provision with the same key
+                for legal_provision in documents:
+                    self._categorize_documents(legal_provision, legal_provisions, laws, hints)
+
+        restriction_on_landownership['LegalProvisions'] = legal_provisions
+        restriction_on_landownership['Laws'] = laws
+        restriction_on_landownership['Hints'] = hints
+
     @staticmethod
     def group_legal_provisions(legal_provisions):
         """
@@ -622,11 +757,12 @@ class Renderer(JsonRenderer):
             list: the list of grouped legal provision documents
         """
         merged_provision = []
+        provision_by_title = {}
         for element in legal_provisions:
             # get element with same title if existing
-            existing_element = \
-                next((item for item in merged_provision if item['Title'] == element['Title']), None)
-            if not existing_element:
+            existing_element = provision_by_title.get(element['Title'])
+            if existing_element is None:
+                provision_by_title[element['Title']] = element
                 merged_provision.append(element)
                 continue
 
@@ -718,11 +854,7 @@ class Renderer(JsonRenderer):
         """
         name = 'TextAtWeb'
         if name in parent:
-            lang_obj = dict([(e['Language'], e['Text']) for e in parent[name]])
-            if self._language in lang_obj.keys():
-                parent[name] = [{'URL': lang_obj[self._language]}]
-            else:
-                parent[name] = [{'URL': lang_obj[self._fallback_language]}]
+            parent[name] = [{'URL': self._get_localized_text(parent[name])}]
 
     def _multilingual_text(self, parent, name):
         """
@@ -733,11 +865,35 @@ class Renderer(JsonRenderer):
             name: the entry name to be translated
         """
         if name in parent:
-            lang_obj = dict([(e['Language'], e['Text']) for e in parent[name]])
-            if self._language in lang_obj.keys():
-                parent[name] = lang_obj[self._language]
-            else:
-                parent[name] = lang_obj[self._fallback_language]
+            parent[name] = self._get_localized_text(parent[name])
+
+    def _get_localized_text(self, values):
+        """
+        Picks the text in the appropriate language, or in the fallback language if it is missing.
+
+        Args:
+            values (list of dict): the translations, each with a `Language` and a `Text`
+
+        Returns:
+            str: the translated text
+
+        Raises:
+            KeyError: if neither the language nor the fallback language is available
+        """
+        text = self._find_text(values, self._language)
+        if text is _MISSING:
+            text = self._find_text(values, self._fallback_language)
+            if text is _MISSING:
+                raise KeyError(self._fallback_language)
+        return text
+
+    @staticmethod
+    def _find_text(values, language):
+        text = _MISSING
+        for entry in values:
+            if entry['Language'] == language:
+                text = entry['Text']
+        return text
 
     @staticmethod
     def sort_restriction_on_landownership_documents(restriction_on_landownership):
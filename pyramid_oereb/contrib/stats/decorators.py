@@ -1,30 +1,52 @@
 import logging
 import json
+import time
+
+from pyramid_oereb.core.config import Config
+from pyramid_oereb.contrib.stats.pipeline import get_stats_pipeline
 
 LOG = logging.getLogger('JSON')
 
 
 def log_response(wrapped):
     def wrapper(context, request):
+        start = time.time()
         response = wrapped(context, request)
-        ret_dict = _serialize_response(response)
-        ret_dict.update(_serialize_request(request))
-        LOG.info(json.dumps(ret_dict))
+        stats_config = Config.get('stats')
+        pipeline = get_stats_pipeline(stats_config)
+        if pipeline is None:
+            ret_dict = _serialize_response(response)
+            ret_dict.update(_serialize_request(request))
+            LOG.info(json.dumps(ret_dict, default=str))
+        elif pipeline.sample():
+            headers = stats_config.get('headers')
+            ret_dict = _serialize_response(response, headers)
+            ret_dict.update(_serialize_request(request, headers))
+            ret_dict['time'] = start
+            ret_dict['duration'] = time.time() - start
+            pipeline.submit(ret_dict)
         return response
     return wrapper
 
 
-def _serialize_response(response):
+def _filter_headers(headers, whitelist=None):
+    if whitelist is None:
+        return dict(headers)
+    allowed = set(name.lower() for name in whitelist)
+    return dict((name, value) for name, value in headers.items() if name.lower() in allowed)
+
+
+def _serialize_response(response, headers=None):
     x = {}
     x['status_code'] = response.status_code
-    x['headers'] = dict(response.headers)
+    x['headers'] = _filter_headers(response.headers, headers)
     x['extras'] = response.extras if hasattr(response, 'extras') else None
     return {'response': x}
 
 
-def _serialize_request(request):
+def _serialize_request(request, headers=None):
     x = {}
-    x['headers'] = dict(request.headers)
+    x['headers'] = _filter_headers(request.headers, headers)
     x['traversed'] = str(request.traversed)
     x['parameters'] = dict(request.GET)
     x['path'] = str(request.path)
@@ -0,0 +1,372 @@
+# -*- coding: utf-8 -*-
+import atexit
+import json
+import logging
+import queue
+import random
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, create_engine, func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from pyramid_oereb.contrib.stats.tables import create_stats_metadata
+
+log = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_stats_pipeline = None
+
+
+class LoggerSink(object):
+    """
+    Writes each statistics entry as JSON message to a logger, by default the `JSON` logger configured in
+    the ini file.
+    """
+
+    def __init__(self, logger_name='JSON'):
+        """
+        Args:
+            logger_name (str): The name of the logger the entries are written to.
+        """
+        self.logger = logging.getLogger(logger_name)
+
+    def __call__(self, entries):
+        """
+        Args:
+            entries (list of dict): The statistics entries to write.
+        """
+        for entry in entries:
+            self.logger.info(json.dumps(entry, default=str))
+
+
+class SQLAlchemySink(object):
+    """
+    Writes statistics entries batch wise into the log table used by the c2cwsgiutils SQLAlchemyHandler,
+    so the reporting views keep working. A batch is inserted with a single statement.
+    """
+
+    def __init__(self, url, tablename='logs', schema=None, logger_name='JSON'):
+        """
+        Args:
+            url (str): The SQLAlchemy connection string of the statistics database.
+            tablename (str): The name of the log table.
+            schema (str or None): The schema of the log table.
+            logger_name (str): The value written into the `logger` column.
+        """
+        self.engine = create_engine(url)
+        self.logger_name = logger_name
+        self.table = Table(
+            tablename, MetaData(),
+            Column('id', Integer, primary_key=True),
+            Column('logger', String),
+            Column('level', String),
+            Column('trace', String),
+            Column('msg', String),
+            Column('created_at', DateTime, default=func.now()),
+            schema=schema
+        )
+        self._created = False
+
+    def __call__(self, entries):
+        """
+        Args:
+            entries (list of dict): The statistics entries to write.
+        """
+        if not self._created:
+            self.table.create(self.engine, checkfirst=True)
+            self._created = True
+        rows = [{
+            'logger': self.logger_name,
+            'level': 'INFO',
+            'trace': None,
+            'msg': json.dumps(entry, default=str)
+        } for entry in entries]
+        with self.engine.begin() as connection:
+            connection.execute(self.table.insert(), rows)
+
+
+class StructuredSink(object):
+    """
+    Writes statistics entries as typed rows into the `stats_requests` table and adds them to the daily
+    aggregates in `stats_daily` in the same transaction (see
+    :func:`pyramid_oereb.contrib.stats.tables.create_stats_metadata`). Reports can then use indexed
+    columns and the aggregates instead of parsing the JSON messages of the log table.
+    """
+
+    def __init__(self, url, schema=None):
+        """
+        Args:
+            url (str): The SQLAlchemy connection string of the statistics database.
+            schema (str or None): The schema of the statistics tables.
+        """
+        self.engine = create_engine(url)
+        self.metadata = create_stats_metadata(schema)
+        tables = dict((table.name, table) for table in self.metadata.sorted_tables)
+        self.requests = tables['stats_requests']
+        self.daily = tables['stats_daily']
+        self._created = False
+
+    def __call__(self, entries):
+        """
+        Args:
+            entries (list of dict): The statistics entries to write.
+        """
+        if not self._created:
+            self.metadata.create_all(self.engine, checkfirst=True)
+            self._created = True
+        rows = [self.to_row(entry) for entry in entries]
+        aggregates = {}
+        for row in rows:
+            key = (row['created_at'].date(), row['service'] or '', row['format'] or '', row['status'] or 0)
+            duration = row['duration'] or 0.0
+            aggregate = aggregates.setdefault(key, [0, 0.0, 0.0])
+            aggregate[0] += 1
+            aggregate[1] += duration
+            aggregate[2] = max(aggregate[2], duration)
+        with self.engine.begin() as connection:
+            connection.execute(self.requests.insert(), rows)
+            for (day, service, output_format, status), values in aggregates.items():
+                connection.execute(self._upsert_daily({
+                    'day': day,
+                    'service': service,
+                    'format': output_format,
+                    'status': status,
+                    'nb_requests': values[0],
+                    'total_duration': values[1],
+                    'max_duration': values[2]
+                }))
+
+    def _upsert_daily(self, values):
+        if self.engine.dialect.name == 'sqlite':
+            statement = sqlite.insert(self.daily).values(**values)
+            greatest = func.max
+        else:
+            statement = postgresql.insert(self.daily).values(**values)
+            greatest = func.greatest
+        return statement.on_conflict_do_update(
+            index_elements=['day', 'service', 'format', 'status'],
+            set_={
+                'nb_requests': self.daily.c.nb_requests + statement.excluded.nb_requests,
+                'total_duration': self.daily.c.total_duration + statement.excluded.total_duration,
+                'max_duration': greatest(self.daily.c.max_duration, statement.excluded.max_duration)
+            }
+        )
+
+    @staticmethod
+    def to_row(entry):
+        """
+        Extracts the typed values of a statistics entry.
+
+        Args:
+            entry (dict): The statistics entry as built by
+                :func:`pyramid_oereb.contrib.stats.decorators.log_response`.
+
+        Returns:
+            dict: The values of a `stats_requests` row.
+        """
+        response = entry.get('response') or {}
+        request = entry.get('request') or {}
+        extras = response.get('extras') or {}
+        params = extras.get('params') or {}
+        topics = params.get('__topics__') or params.get('TOPICS')
+        if isinstance(topics, (list, tuple)):
+            topics = ','.join(topics)
+        created = entry.get('time')
+        return {
+            'created_at': datetime.fromtimestamp(created) if created is not None else datetime.now(),
+            'service': extras.get('service'),
+            'status': response.get('status_code'),
+            'format': extras.get('output_format'),
+            'egrid': params.get('__egrid__') or params.get('EGRID'),
+            'topics': topics,
+            'duration': entry.get('duration'),
+            'path': request.get('path')
+        }
+
+
+class StatsPipeline(object):
+    """
+    Collects statistics entries in a bounded in-memory queue and hands them in batches to a sink from a
+    background thread, so writing statistics never blocks a request. Entries which do not fit into the
+    queue are dropped and counted.
+
+    Attributes:
+        sink (callable): Receives a list of entries per batch.
+        queue_size (int): The maximum number of entries waiting to be written.
+        batch_size (int): The maximum number of entries passed to the sink at once.
+        flush_interval (float): Seconds after which a batch is written even if it is not full.
+        sample_rate (float): The share of requests (0 to 1) recorded at all.
+    """
+
+    def __init__(self, sink, queue_size=1000, batch_size=100, flush_interval=1.0, sample_rate=1.0):
+        """
+        Args:
+            sink (callable): Receives a list of entries per batch.
+            queue_size (int): The maximum number of entries waiting to be written.
+            batch_size (int): The maximum number of entries passed to the sink at once.
+            flush_interval (float): Seconds after which a batch is written even if it is not full.
+            sample_rate (float): The share of requests (0 to 1) recorded at all.
+        """
+        self.sink = sink
+        self.queue_size = queue_size
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.sample_rate = sample_rate
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._counter_lock = threading.Lock()
+        self._counters = {'submitted': 0, 'sampled_out': 0, 'dropped': 0, 'written': 0, 'failed': 0}
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    def sample(self):
+        """
+        Decides whether the current request is recorded. Call this before building the entry, so
+        requests which are not sampled cost nothing.
+
+        Returns:
+            bool: True if the request should be recorded.
+        """
+        if self.sample_rate >= 1 or random.random() < self.sample_rate:
+            return True
+        self._count('sampled_out')
+        return False
+
+    def submit(self, entry):
+        """
+        Queues an entry without blocking.
+
+        Args:
+            entry (dict): The statistics entry, serializable to JSON.
+
+        Returns:
+            bool: False if the queue was full and the entry got dropped.
+        """
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            dropped = self._count('dropped')
+            if dropped == 1 or dropped % 1000 == 0:
+                log.warning('Statistics queue is full, {} entries dropped so far'.format(dropped))
+            return False
+        self._count('submitted')
+        return True
+
+    @property
+    def counters(self):
+        """
+        Returns:
+            dict: The number of submitted, sampled out, dropped, written and failed entries.
+        """
+        with self._counter_lock:
+            return dict(self._counters)
+
+    def flush(self):
+        """
+        Blocks until all queued entries have been passed to the sink.
+        """
+        self._queue.join()
+
+    def _count(self, name, value=1):
+        with self._counter_lock:
+            self._counters[name] += value
+            return self._counters[name]
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='stats-pipeline', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def _write(self, batch):
+        try:
+            self.sink(batch)
+            self._count('written', len(batch))
+        except Exception as e:
+            self._count('failed', len(batch))
+            log.error('Writing {} statistics entries failed: {}'.format(len(batch), e))
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+
+def create_stats_pipeline(stats_config):
+    """
+    Creates a statistics pipeline from the `stats` section of the application configuration.
+
+    Args:
+        stats_config (dict): The `stats` section of the application configuration.
+
+    Returns:
+        StatsPipeline: The new pipeline.
+    """
+    if stats_config.get('db_connection') and stats_config.get('structured', False):
+        sink = StructuredSink(stats_config['db_connection'], stats_config.get('schema'))
+    elif stats_config.get('db_connection'):
+        sink = SQLAlchemySink(
+            stats_config['db_connection'],
+            stats_config.get('tablename', 'logs'),
+            stats_config.get('schema')
+        )
+    else:
+        sink = LoggerSink()
+    return StatsPipeline(
+        sink,
+        queue_size=int(stats_config.get('queue_size', 1000)),
+        batch_size=int(stats_config.get('batch_size', 100)),
+        flush_interval=float(stats_config.get('flush_interval', 1.0)),
+        sample_rate=float(stats_config.get('sample_rate', 1.0))
+    )
+
+
+def get_stats_pipeline(stats_config):
+    """
+    Returns the process wide statistics pipeline, created on first use.
+
+    Args:
+        stats_config (dict or None): The `stats` section of the application configuration.
+
+    Returns:
+        StatsPipeline or None: The pipeline or None if the `stats` section is missing.
+    """
+    global _stats_pipeline
+    if not stats_config:
+        return None
+    if _stats_pipeline is None:
+        with _lock:
+            if _stats_pipeline is None:
+                _stats_pipeline = create_stats_pipeline(stats_config)
+    return _stats_pipeline
+
+
+def reset():
+    """
+    Drops the shared pipeline after writing all queued entries, so it is created again from the current
+    configuration.
+    """
+    global _stats_pipeline
+    with _lock:
+        if _stats_pipeline is not None:
+            _stats_pipeline.flush()
+        _stats_pipeline = None
+
+
+atexit.register(reset)
@@ -8,13 +8,15 @@ import os
 import optparse
 from sqlalchemy import text
 
+from pyramid_oereb.contrib.stats.tables import create_stats_metadata
+
 SCRIPT_FOLDER = os.path.dirname(os.path.abspath(__file__))
 
 
 def create_stats_tables():
     parser = optparse.OptionParser(
         usage='usage: %prog [options]',
-        description='creates database and views for sqlalchemylogger'
+        description='creates database, views and structured tables for sqlalchemylogger'
     )
     parser.add_option(
         '-c', '--config',
@@ -37,17 +39,27 @@ def create_stats_tables():
         default='args',
         help='subsection in the ini-file. Default = "args"'
     )
+    parser.add_option(
+        '-b', '--backfill',
+        dest='backfill',
+        action='store_true',
+        default=False,
+        help='copy the requests logged before the structured tables were used into them and rebuild the '
+             'daily aggregates'
+    )
     options, _ = parser.parse_args()
     if not options.configfile:
         parser.error('No configfile set')
     _create_views(config_file=options.configfile,
                   config_section=options.config_section,
-                  config_sql_args=options.config_sql_args)
+                  config_sql_args=options.config_sql_args,
+                  backfill=options.backfill)
 
 
 def _create_views(config_file,
                   config_section='handler_sqlalchemylogger',
-                  config_sql_args='args'):
+                  config_sql_args='args',
+                  backfill=False):
     config = configparser.ConfigParser(Config.get_db_vars_from_env())
     config.read(config_file)
     schema_name = ast.literal_eval(config[config_section][config_sql_args])[0]['tableargs']['schema']
@@ -57,3 +69,8 @@ def _create_views(config_file,
     create_view_sql = Template(filename='{}/templates/views.sql.mako'.format(SCRIPT_FOLDER))
     fake_handler.session.execute(text(create_view_sql.render(schema_name=schema_name, tablename=tablename)))
     fake_handler.session.commit()
+    create_stats_metadata(schema_name).create_all(fake_handler.engine, checkfirst=True)
+    if backfill:
+        backfill_sql = Template(filename='{}/templates/backfill.sql.mako'.format(SCRIPT_FOLDER))
+        fake_handler.session.execute(text(backfill_sql.render(schema_name=schema_name, tablename=tablename)))
+        fake_handler.session.commit()
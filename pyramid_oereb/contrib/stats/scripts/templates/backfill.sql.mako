@@ -0,0 +1,34 @@
+/*Copy the requests logged before the structured tables were written*/
+INSERT INTO ${schema_name|u}.stats_requests (created_at, service, status, format, egrid, topics, path)
+    SELECT created_at,
+           msg_json -> 'response' -> 'extras' ->> 'service',
+           cast(msg_json -> 'response' ->> 'status_code' AS INTEGER),
+           msg_json -> 'response' -> 'extras' ->> 'output_format',
+           coalesce(msg_json -> 'response' -> 'extras' -> 'params' ->> '__egrid__',
+                    msg_json -> 'response' -> 'extras' -> 'params' ->> 'EGRID'),
+           CASE WHEN json_typeof(msg_json -> 'response' -> 'extras' -> 'params' -> '__topics__') = 'array'
+                THEN (SELECT string_agg(topic, ',')
+                      FROM json_array_elements_text(msg_json -> 'response' -> 'extras' -> 'params' -> '__topics__')
+                      AS topic)
+                ELSE msg_json -> 'response' -> 'extras' -> 'params' ->> 'TOPICS'
+           END,
+           msg_json -> 'request' ->> 'path'
+    FROM (
+        SELECT created_at, cast(msg AS json) AS msg_json
+        FROM ${schema_name|u}.${tablename|u}
+        WHERE logger = 'JSON'
+          AND created_at < (SELECT coalesce(min(created_at), 'infinity') FROM ${schema_name|u}.stats_requests)
+    ) AS logs;
+
+/*Rebuild the daily aggregates from the structured table*/
+DELETE FROM ${schema_name|u}.stats_daily;
+INSERT INTO ${schema_name|u}.stats_daily (day, service, format, status, nb_requests, total_duration, max_duration)
+    SELECT cast(created_at AS date),
+           coalesce(service, ''),
+           coalesce(format, ''),
+           coalesce(status, 0),
+           count(1),
+           coalesce(sum(duration), 0),
+           coalesce(max(duration), 0)
+    FROM ${schema_name|u}.stats_requests
+    GROUP BY 1, 2, 3, 4;
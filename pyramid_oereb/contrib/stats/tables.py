@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from sqlalchemy import BigInteger, Column, Date, DateTime, Float, Index, Integer, MetaData, String, Table
+
+
+def create_stats_metadata(schema=None):
+    """
+    Defines the structured statistics tables.
+
+    * `stats_requests` holds one typed row per request.
+    * `stats_daily` holds the number of requests and their durations per day, service, format and status.
+      It is updated together with every batch written to `stats_requests`.
+
+    Args:
+        schema (str or None): The schema of the tables.
+
+    Returns:
+        sqlalchemy.MetaData: The metadata containing both tables.
+    """
+    metadata = MetaData(schema=schema)
+    requests = Table(
+        'stats_requests', metadata,
+        Column('id', BigInteger().with_variant(Integer, 'sqlite'), primary_key=True, autoincrement=True),
+        Column('created_at', DateTime, nullable=False),
+        Column('service', String),
+        Column('status', Integer),
+        Column('format', String),
+        Column('egrid', String),
+        Column('topics', String),
+        Column('duration', Float),
+        Column('path', String)
+    )
+    Index('stats_requests_created_at_idx', requests.c.created_at)
+    Index('stats_requests_service_created_at_idx', requests.c.service, requests.c.created_at)
+    Index('stats_requests_egrid_idx', requests.c.egrid)
+    Table(
+        'stats_daily', metadata,
+        Column('day', Date, primary_key=True),
+        Column('service', String, primary_key=True),
+        Column('format', String, primary_key=True),
+        Column('status', Integer, primary_key=True),
+        Column('nb_requests', BigInteger, nullable=False),
+        Column('total_duration', Float, nullable=False),
+        Column('max_duration', Float, nullable=False)
+    )
+    return metadata
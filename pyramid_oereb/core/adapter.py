@@ -1,13 +1,100 @@
 # -*- coding: utf-8 -*-
 import logging
 import os
+from timeit import default_timer as timer
 
 from io import open
+from pyramid.config import ConfigurationError
 from sqlalchemy import create_engine, orm
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+from pyramid_oereb.core.config import Config
+from pyramid_oereb.core.timing import Histograms, instrument_engine
 
 
 log = logging.getLogger(__name__)
 
+POOL_SETTINGS = ['pool_size', 'max_overflow', 'pool_timeout', 'pool_recycle', 'pool_pre_ping']
+"""list of str: The settings of the ``database`` configuration passed to the engine."""
+
+pool_histograms = Histograms(
+    'pyramid_oereb_db_pool_checkout_seconds',
+    'Time waited for a connection from the database pool.',
+    labels=('pool', 'detail')
+)
+
+
+class TimedQueuePool(QueuePool):
+    """
+    Queue pool adding the time waited for every connection to :data:`pool_histograms`.
+    """
+
+    def __init__(self, creator, pool_name=None, **kwargs):
+        """
+        Args:
+            creator (callable): Creates the database connections.
+            pool_name (str or None): The name of the pool in the metrics.
+        """
+        super(TimedQueuePool, self).__init__(creator, **kwargs)
+        self.pool_name = pool_name
+
+    def recreate(self):
+        pool = super(TimedQueuePool, self).recreate()
+        pool.pool_name = self.pool_name
+        return pool
+
+    def _do_get(self):
+        start = timer()
+        try:
+            return super(TimedQueuePool, self)._do_get()
+        finally:
+            pool_histograms.observe(self.pool_name, timer() - start)
+
+
+def get_engine_settings(connection_string, database_config):
+    """
+    Assembles the keyword arguments of the engine of a connection from the ``database`` section of the
+    application configuration. The settings of a connection listed in ``connections`` with its
+    ``db_connection`` override the general ones.
+
+    Args:
+        connection_string (str): The rfc1738 URL string of the connection.
+        database_config (dict or None): The ``database`` section of the application configuration.
+
+    Returns:
+        dict: The keyword arguments for :func:`sqlalchemy.create_engine` and the name of the pool in the
+        metrics (`pool_name`) if it is a :class:`TimedQueuePool`.
+    """
+    database_config = database_config or {}
+    settings = {'pool_recycle': 30}
+    settings.update(database_config)
+    for connection_config in database_config.get('connections', []):
+        if connection_config.get('db_connection') == connection_string:
+            settings.update(connection_config)
+    url = make_url(connection_string)
+    kwargs = dict((key, settings[key]) for key in POOL_SETTINGS if settings.get(key) is not None)
+    connect_args = {}
+    if settings.get('application_name'):
+        connect_args['application_name'] = settings['application_name']
+    if settings.get('statement_timeout'):
+        connect_args['options'] = '-c statement_timeout={}'.format(int(settings['statement_timeout']))
+    if settings.get('prepare_threshold') is not None:
+        if url.get_driver_name() == 'psycopg':
+            connect_args['prepare_threshold'] = settings['prepare_threshold']
+        else:
+            log.warning('prepare_threshold is only supported by the psycopg driver, '
+                        'ignoring it for {}'.format(url.render_as_string(hide_password=True)))
+    if url.get_backend_name() == 'postgresql':
+        kwargs['poolclass'] = TimedQueuePool
+        kwargs['pool_name'] = settings.get('name') or url.render_as_string(hide_password=True)
+        if connect_args:
+            kwargs['connect_args'] = connect_args
+    elif connect_args:
+        log.warning('application_name and statement_timeout are only supported for PostgreSQL, '
+                    'ignoring them for {}'.format(url.render_as_string(hide_password=True)))
+    return kwargs
+
 
 class DatabaseAdapter(object):
     _connections_ = dict()
@@ -22,14 +109,32 @@ class DatabaseAdapter(object):
 
     def add_connection(self, connection_string):
         """
-        Adds a new connection to this object. Also creates the necessary engine and session object.
+        Adds a new connection to this object. Also creates the necessary engine and session object,
+        configured by the ``database`` section of the application configuration (see
+        :func:`get_engine_settings`).
 
         Args:
             connection_string (str): The rfc1738 URL string which defines the database
                 connection
+
+        Raises:
+            pyramid.config.ConfigurationError: The name of the pool in the metrics is already used by
+                another connection.
         """
         if connection_string not in self._connections_:
-            engine = create_engine(connection_string, pool_recycle=30)
+            settings = get_engine_settings(connection_string, (Config.get_config() or {}).get('database'))
+            pool_name = settings.pop('pool_name', None)
+            if pool_name is not None and any(
+                getattr(connection['engine'].pool, 'pool_name', None) == pool_name
+                for connection in self._connections_.values()
+            ):
+                raise ConfigurationError(
+                    'The pool name {} is used by several database connections'.format(pool_name)
+                )
+            engine = create_engine(connection_string, **settings)
+            if pool_name is not None:
+                engine.pool.pool_name = pool_name
+            instrument_engine(engine)
             session = orm.scoped_session(orm.sessionmaker(bind=engine))
             self._connections_[connection_string] = {
                 'engine': engine,
@@ -72,6 +177,34 @@ class DatabaseAdapter(object):
             log.info('Connection does not exist, implicitly creating it: {0}'.format(key))
             return self.get_session(key, request=request)
 
+    def render_metrics(self):
+        """
+        Returns:
+            str: The size, the checked out and the overflow connections of every pool and the time waited
+            for a connection in the Prometheus text format.
+        """
+        gauges = [
+            ('size', 'Configured size of the database pool.', lambda pool: pool.size()),
+            ('checked_out', 'Connections currently checked out from the database pool.',
+             lambda pool: pool.checkedout()),
+            ('overflow', 'Connections opened beyond the size of the database pool.',
+             lambda pool: max(pool.overflow(), 0))
+        ]
+        pools = sorted((
+            (connection['engine'].pool.pool_name, connection['engine'].pool)
+            for connection in self._connections_.values()
+            if isinstance(connection['engine'].pool, TimedQueuePool)
+        ), key=lambda item: item[0])
+        lines = []
+        for name, description, value in gauges:
+            metric = 'pyramid_oereb_db_pool_{}'.format(name)
+            lines.append('# HELP {} {}'.format(metric, description))
+            lines.append('# TYPE {} gauge'.format(metric))
+            for pool_name, pool in pools:
+                lines.append('{}{{pool="{}"}} {}'.format(
+                    metric, pool_name.replace('"', '\\"'), value(pool)))
+        return '\n'.join(lines) + '\n' + pool_histograms.render()
+
 
 class FileAdapter(object):
 
@@ -0,0 +1,612 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from copy import deepcopy
+from datetime import datetime
+
+from pyramid_oereb.core.config import Config
+from pyramid_oereb.core.data_version import digest as _digest, get_data_version, \
+    reset as reset_data_version
+from pyramid_oereb.core.records.image import ImageRecord
+
+log = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_response_cache = None
+_extract_cache = None
+
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%S'
+"""str: The format of the creation date in the rendered extracts."""
+
+
+class Entry(object):
+    """
+    The common part of the cached values.
+
+    Attributes:
+        themes (list of str or None): The themes the value depends on, None for all themes.
+        created (float): The time the entry was stored (seconds since the epoch).
+    """
+
+    size = 0
+    """int: The size of the value in bytes, as far as it is known."""
+
+    def __init__(self, themes, created=None):
+        self.themes = themes
+        self.created = time.time() if created is None else created
+
+    def expired(self, ttl):
+        """
+        Args:
+            ttl (float or None): The time to live in seconds, None for no expiry.
+
+        Returns:
+            bool: True if the entry is older than the time to live.
+        """
+        return ttl is not None and time.time() - self.created > ttl
+
+    def concerns(self, theme_code):
+        """
+        Args:
+            theme_code (str or None): A theme code, None for all themes.
+
+        Returns:
+            bool: True if the value depends on the passed theme.
+        """
+        return theme_code is None or self.themes is None or theme_code in self.themes
+
+
+class CacheEntry(Entry):
+    """
+    A rendered extract kept in the cache.
+
+    Attributes:
+        body (bytes): The rendered extract.
+        content_type (str): The content type header of the response.
+        creation_date (str): The creation date as rendered in the extract.
+        extract_identifier (str): The extract identifier as rendered in the extract.
+    """
+
+    def __init__(self, body, content_type, themes, creation_date, extract_identifier, created=None):
+        super(CacheEntry, self).__init__(themes, created)
+        self.body = body
+        self.content_type = content_type
+        self.creation_date = creation_date
+        self.extract_identifier = extract_identifier
+
+    @property
+    def size(self):
+        return len(self.body)
+
+    def metadata(self):
+        return {
+            'content_type': self.content_type,
+            'themes': self.themes,
+            'creation_date': self.creation_date,
+            'extract_identifier': self.extract_identifier,
+            'created': self.created
+        }
+
+
+class MemoryBackend(object):
+    """
+    Keeps the entries in the memory of the process. The least recently used entries are dropped when the
+    number of entries or their total size exceed the limits.
+
+    Attributes:
+        ttl (float or None): The time to live of an entry in seconds.
+        max_entries (int or None): The maximum number of entries.
+        max_bytes (int or None): The maximum total size of the entries.
+    """
+
+    def __init__(self, ttl=None, max_entries=1000, max_bytes=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Args:
+            key (str): The key of the entry.
+
+        Returns:
+            Entry or None: The entry or None if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expired(self.ttl):
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        """
+        Args:
+            key (str): The key of the entry.
+            entry (Entry): The entry to store.
+        """
+        if self.max_bytes is not None and entry.size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while (self.max_entries is not None and len(self._entries) > self.max_entries) or \
+                    (self.max_bytes is not None and self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, theme_code=None):
+        """
+        Drops the entries depending on a theme.
+
+        Args:
+            theme_code (str or None): The theme code, None drops all entries.
+        """
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry.concerns(theme_code)]:
+                self._remove(key)
+
+    def _remove(self, key):
+        self._bytes -= self._entries.pop(key).size
+
+
+class DiskBackend(object):
+    """
+    Keeps the entries as files below a directory, so they can be shared by the processes of a host and
+    survive a restart. Every file contains a line with the metadata followed by the rendered extract. The
+    oldest files are deleted when the number of files or their total size exceed the limits.
+
+    Attributes:
+        path (str): The directory of the files.
+        ttl (float or None): The time to live of an entry in seconds.
+        max_entries (int or None): The maximum number of entries.
+        max_bytes (int or None): The maximum total size of the entries.
+    """
+
+    def __init__(self, path, ttl=None, max_entries=None, max_bytes=None):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self._files, self._bytes = self._usage()
+
+    def __len__(self):
+        return len(self._list())
+
+    def _file(self, key):
+        return os.path.join(self.path, '{}.cache'.format(key))
+
+    def _list(self):
+        return [
+            os.path.join(self.path, name) for name in os.listdir(self.path) if name.endswith('.cache')
+        ]
+
+    def _usage(self):
+        files = self._list()
+        return len(files), sum(os.path.getsize(path) for path in files if os.path.exists(path))
+
+    @staticmethod
+    def _read(path, with_body=True):
+        with open(path, 'rb') as f:
+            metadata = json.loads(f.readline().decode('utf-8'))
+            body = f.read() if with_body else b''
+        return CacheEntry(body, **metadata)
+
+    def get(self, key):
+        """
+        Args:
+            key (str): The key of the entry.
+
+        Returns:
+            CacheEntry or None: The entry or None if it is missing or expired.
+        """
+        path = self._file(key)
+        try:
+            entry = self._read(path)
+        except (OSError, ValueError):
+            return None
+        if entry.expired(self.ttl):
+            self._delete(path)
+            return None
+        return entry
+
+    def set(self, key, entry):
+        """
+        Args:
+            key (str): The key of the entry.
+            entry (CacheEntry): The entry to store.
+        """
+        fd, temporary = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(json.dumps(entry.metadata()).encode('utf-8') + b'\n')
+                f.write(entry.body)
+            size = os.path.getsize(temporary)
+            os.replace(temporary, self._file(key))
+        except OSError as e:
+            log.error('Writing cache entry {} failed: {}'.format(key, e))
+            self._delete(temporary)
+            return
+        with self._lock:
+            self._files += 1
+            self._bytes += size
+            if (self.max_entries is not None and self._files > self.max_entries) or \
+                    (self.max_bytes is not None and self._bytes > self.max_bytes):
+                self._prune()
+
+    def _prune(self):
+        files = []
+        for path in self._list():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+        self._files = len(files)
+        self._bytes = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if (self.max_entries is None or self._files <= self.max_entries) and \
+                    (self.max_bytes is None or self._bytes <= self.max_bytes):
+                break
+            self._delete(path)
+            self._files -= 1
+            self._bytes -= size
+
+    def invalidate(self, theme_code=None):
+        """
+        Deletes the entries depending on a theme.
+
+        Args:
+            theme_code (str or None): The theme code, None deletes all entries.
+        """
+        for path in self._list():
+            try:
+                if self._read(path, with_body=False).concerns(theme_code):
+                    self._delete(path)
+            except (OSError, ValueError):
+                continue
+        with self._lock:
+            self._files, self._bytes = self._usage()
+
+    @staticmethod
+    def _delete(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class ResponseCache(object):
+    """
+    Caches the rendered JSON and XML extracts. The key consists of the normalized parameters of the
+    request, the application URL (the extracts contain absolute links), the reference date the publication
+    is checked against and the version of the data of the themes the extract depends on, so a new delivery
+    of a theme only invalidates the extracts containing it. With `fresh_identifier` enabled, every response
+    served from the cache gets a new creation date and extract identifier.
+
+    Attributes:
+        backend (MemoryBackend or DiskBackend): The storage of the entries.
+        data_version (DataVersion): The version of the data.
+        fresh_identifier (bool): Whether to replace the creation date and identifier of cached extracts.
+    """
+
+    FORMATS = ['json', 'xml']
+    """list of str: The cached formats."""
+
+    def __init__(self, backend, data_version, fresh_identifier=True):
+        self.backend = backend
+        self.data_version = data_version
+        self.fresh_identifier = fresh_identifier
+        data_version.subscribe(backend.invalidate)
+
+    def accepts(self, params):
+        """
+        Args:
+            params (pyramid_oereb.core.views.webservice.Parameter): The parameters of the request.
+
+        Returns:
+            bool: True if the response to the request can be cached.
+        """
+        return params.format in self.FORMATS
+
+    def key(self, params, application_url):
+        """
+        Returns the key of a request and the themes its extract depends on.
+
+        Args:
+            params (pyramid_oereb.core.views.webservice.Parameter): The parameters of the request.
+            application_url (str): The URL of the application.
+
+        Returns:
+            tuple: The key (str) and the theme codes (list of str, None for all themes).
+        """
+        themes = _requested_themes(params)
+        versioned = list(self.data_version.themes()) if themes is None else themes
+        key = _digest([
+            application_url,
+            params.format,
+            params.egrid,
+            params.identdn,
+            params.number,
+            params.language,
+            sorted(params.topics or []),
+            params.with_geometry,
+            params.images,
+            params.signed,
+            params.reference_date.isoformat(),
+            self.data_version.digest(versioned)
+        ])
+        return key, themes
+
+    def get(self, key):
+        """
+        Args:
+            key (str): The key as returned by :meth:`key`.
+
+        Returns:
+            CacheEntry or None: The cached extract or None.
+        """
+        entry = self.backend.get(key)
+        if entry is None:
+            log.debug('Response cache miss: {}'.format(key))
+            return None
+        log.debug('Response cache hit: {}'.format(key))
+        if not self.fresh_identifier:
+            return entry
+        creation_date = datetime.now().strftime(DATE_FORMAT)
+        extract_identifier = str(uuid.uuid4())
+        body = entry.body.replace(
+            entry.extract_identifier.encode('utf-8'), extract_identifier.encode('utf-8')
+        )
+        for template in ('"{}"', '>{}<'):
+            body = body.replace(
+                template.format(entry.creation_date).encode('utf-8'),
+                template.format(creation_date).encode('utf-8')
+            )
+        return CacheEntry(body, entry.content_type, entry.themes, creation_date, extract_identifier,
+                          entry.created)
+
+    def set(self, key, themes, response, extract):
+        """
+        Stores a rendered extract.
+
+        Args:
+            key (str): The key as returned by :meth:`key`.
+            themes (list of str or None): The themes as returned by :meth:`key`.
+            response (pyramid.response.Response): The response containing the rendered extract.
+            extract (pyramid_oereb.core.records.extract.ExtractRecord): The rendered extract record.
+        """
+        self.backend.set(key, CacheEntry(
+            response.body,
+            response.headers.get('Content-Type'),
+            themes,
+            extract.creation_date.strftime(DATE_FORMAT),
+            extract.extract_identifier
+        ))
+
+    def invalidate(self, theme_code=None):
+        """
+        Drops the cached extracts depending on a theme.
+
+        Args:
+            theme_code (str or None): The theme code, None drops all extracts.
+        """
+        self.backend.invalidate(theme_code)
+
+
+class ExtractEntry(Entry):
+    """
+    A processed extract kept in the cache.
+
+    Attributes:
+        extract (pyramid_oereb.core.records.extract.ExtractRecord): The processed extract.
+    """
+
+    def __init__(self, extract, themes, created=None):
+        super(ExtractEntry, self).__init__(themes, created)
+        self.extract = extract
+
+
+class ExtractCache(object):
+    """
+    Caches the processed extracts, i.e. the extracts after the tolerance check and the sorting but before
+    the view service handling and the rendering, which depend on the format, the language and the images.
+    A JSON extract followed by the static extract of the same real estate therefore reads and processes
+    the data only once. The key consists of the real estate, the requested topics, the reference date the
+    publication is checked against and the version of the data of the concerned themes. The language is part
+    of the key if OEREBlex is configured, as the documents read from OEREBlex depend on it.
+
+    The extracts are copied when stored and when returned, as the following steps modify them. Every
+    returned extract gets a new identifier, creation date and QR code.
+
+    Attributes:
+        backend (MemoryBackend): The storage of the entries.
+        data_version (DataVersion): The version of the data.
+    """
+
+    def __init__(self, backend, data_version):
+        self.backend = backend
+        self.data_version = data_version
+        data_version.subscribe(backend.invalidate)
+
+    def key(self, real_estate, params):
+        """
+        Returns the key of an extract and the themes it depends on.
+
+        Args:
+            real_estate (pyramid_oereb.core.records.real_estate.RealEstateRecord): The real estate.
+            params (pyramid_oereb.core.views.webservice.Parameter): The parameters of the request.
+
+        Returns:
+            tuple: The key (str) and the theme codes (list of str, None for all themes).
+        """
+        themes = _requested_themes(params)
+        versioned = list(self.data_version.themes()) if themes is None else themes
+        key = _digest([
+            real_estate.egrid,
+            real_estate.number,
+            real_estate.identdn,
+            sorted(params.topics or []),
+            params.language if Config.get_oereblex_config() else None,
+            params.reference_date.isoformat(),
+            self.data_version.digest(versioned)
+        ])
+        return key, themes
+
+    def get(self, key, params):
+        """
+        Args:
+            key (str): The key as returned by :meth:`key`.
+            params (pyramid_oereb.core.views.webservice.Parameter): The parameters of the request.
+
+        Returns:
+            pyramid_oereb.core.records.extract.ExtractRecord or None: A copy of the cached extract or None.
+        """
+        entry = self.backend.get(key)
+        if entry is None:
+            log.debug('Extract cache miss: {}'.format(key))
+            return None
+        log.debug('Extract cache hit: {}'.format(key))
+        return copy_extract(entry.extract, params)
+
+    def set(self, key, themes, extract):
+        """
+        Stores a copy of a processed extract.
+
+        Args:
+            key (str): The key as returned by :meth:`key`.
+            themes (list of str or None): The themes as returned by :meth:`key`.
+            extract (pyramid_oereb.core.records.extract.ExtractRecord): The processed extract.
+        """
+        self.backend.set(key, ExtractEntry(deepcopy(extract), themes))
+
+    def invalidate(self, theme_code=None):
+        """
+        Drops the cached extracts depending on a theme.
+
+        Args:
+            theme_code (str or None): The theme code, None drops all extracts.
+        """
+        self.backend.invalidate(theme_code)
+
+
+def copy_extract(extract, params):
+    """
+    Copies an extract for another request, with a new identifier, creation date and QR code.
+
+    Args:
+        extract (pyramid_oereb.core.records.extract.ExtractRecord): The extract to copy.
+        params (pyramid_oereb.core.views.webservice.Parameter): The parameters of the request.
+
+    Returns:
+        pyramid_oereb.core.records.extract.ExtractRecord: The copy.
+    """
+    extract = deepcopy(extract)
+    extract.extract_identifier = str(uuid.uuid4())
+    extract.creation_date = datetime.now()
+    extract.qr_code = ImageRecord(params.qr_code)
+    extract.qr_code_ref = params.qr_code_ref
+    return extract
+
+
+def _requested_themes(params):
+    if params.topics and 'ALL' not in params.topics:
+        return sorted(
+            plr['code'] for plr in Config.get('plrs') or [] if not params.skip_topic(plr['code'])
+        )
+    return None
+
+
+def _ttl(cache_config):
+    ttl = cache_config.get('ttl')
+    return None if ttl is None else float(ttl)
+
+
+def get_response_cache(cache_config):
+    """
+    Returns the process wide response cache, created on first use.
+
+    Args:
+        cache_config (dict or None): The `response_cache` section of the application configuration.
+
+    Returns:
+        ResponseCache or None: The cache or None if it is not configured.
+    """
+    global _response_cache
+    if not cache_config:
+        return None
+    data_version = get_data_version()
+    with _lock:
+        if _response_cache is None:
+            if cache_config.get('backend', 'memory') == 'disk':
+                backend = DiskBackend(
+                    cache_config['path'],
+                    ttl=_ttl(cache_config),
+                    max_entries=cache_config.get('max_entries'),
+                    max_bytes=cache_config.get('max_bytes')
+                )
+            else:
+                backend = MemoryBackend(
+                    ttl=_ttl(cache_config),
+                    max_entries=cache_config.get('max_entries', 1000),
+                    max_bytes=cache_config.get('max_bytes')
+                )
+            _response_cache = ResponseCache(
+                backend,
+                data_version,
+                fresh_identifier=cache_config.get('fresh_identifier', True)
+            )
+        return _response_cache
+
+
+def get_extract_cache(cache_config):
+    """
+    Returns the process wide cache of processed extracts, created on first use.
+
+    Args:
+        cache_config (dict or None): The `extract_cache` section of the application configuration.
+
+    Returns:
+        ExtractCache or None: The cache or None if it is not configured.
+    """
+    global _extract_cache
+    if not cache_config:
+        return None
+    data_version = get_data_version()
+    with _lock:
+        if _extract_cache is None:
+            _extract_cache = ExtractCache(
+                MemoryBackend(ttl=_ttl(cache_config), max_entries=cache_config.get('max_entries', 100)),
+                data_version
+            )
+        return _extract_cache
+
+
+def reset():
+    """
+    Drops the shared caches and data version, so they are created again from the current configuration.
+    """
+    global _response_cache, _extract_cache
+    reset_data_version()
+    with _lock:
+        _response_cache = None
+        _extract_cache = None
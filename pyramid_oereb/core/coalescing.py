@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+from collections import Counter
+from copy import deepcopy
+
+log = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_single_flights = {}
+
+
+class _Flight(object):
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.waiting = 0
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Coalesces concurrent identical calls: while a call for a key is running, further calls for the same key
+    wait for it and share its result instead of computing it again. A waiting call which is not answered
+    within `timeout` seconds computes the result itself. Exceptions of the first call are raised in the
+    waiting calls as well.
+
+    Attributes:
+        name (str): The name of the coalesced operation, used in the metrics.
+        timeout (float): Seconds a call waits for the running one.
+        counts (collections.Counter): The number of calls which computed the result (`leader`), which
+            shared the result of another call (`coalesced`) and which gave up waiting (`timeout`).
+    """
+
+    def __init__(self, name, timeout=30):
+        self.name = name
+        self.timeout = timeout
+        self.counts = Counter()
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def do(self, key, function, share=None):
+        """
+        Returns the result of the function, computed once for concurrent calls with the same key.
+
+        Args:
+            key (str): Identifies identical calls.
+            function (callable): Computes the result, called without arguments.
+            share (callable or None): Creates the result of a waiting call from a copy of the result of the
+                first one, e.g. to assign a new identifier. Without it, all calls get the same object.
+
+        Returns:
+            tuple: The result and whether it was shared from another call (bool).
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                flight.waiting += 1
+        if leader:
+            return self._lead(key, flight, function, share), False
+        if not flight.done.wait(self.timeout):
+            log.warning('Waiting for {} {} timed out, computing it again'.format(self.name, key))
+            self._count('timeout')
+            return function(), False
+        self._count('coalesced')
+        if flight.error is not None:
+            raise flight.error
+        if share is None:
+            return flight.result, True
+        return share(flight.result), True
+
+    def _lead(self, key, flight, function, share):
+        self._count('leader')
+        result = None
+        try:
+            result = function()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+                waiting = flight.waiting
+            if flight.error is None and waiting:
+                flight.result = result if share is None else deepcopy(result)
+            flight.done.set()
+        if waiting:
+            log.debug('Shared {} {} with {} waiting requests'.format(self.name, key, waiting))
+        return result
+
+    def _count(self, role):
+        with self._lock:
+            self.counts[role] += 1
+
+
+def get_single_flight(name, coalescing_config):
+    """
+    Returns the process wide coalescing of an operation, created on first use.
+
+    Args:
+        name (str): The name of the operation, e.g. `process` or `print`.
+        coalescing_config (dict or None): The `coalescing` section of the application configuration.
+
+    Returns:
+        SingleFlight or None: The coalescing or None if it is not configured.
+    """
+    if not coalescing_config or name not in coalescing_config.get('operations', ['process', 'print']):
+        return None
+    with _lock:
+        single_flight = _single_flights.get(name)
+        if single_flight is None:
+            single_flight = _single_flights[name] = SingleFlight(
+                name,
+                timeout=float(coalescing_config.get('timeout', 30))
+            )
+        return single_flight
+
+
+def render_metrics():
+    """
+    Returns:
+        str: The number of coalesced calls per operation and role in the Prometheus text format.
+    """
+    lines = [
+        '# HELP pyramid_oereb_coalesced_requests_total Identical concurrent calls by operation and role.',
+        '# TYPE pyramid_oereb_coalesced_requests_total counter'
+    ]
+    with _lock:
+        single_flights = sorted(_single_flights.items())
+    for name, single_flight in single_flights:
+        for role in ['leader', 'coalesced', 'timeout']:
+            lines.append('pyramid_oereb_coalesced_requests_total{{operation="{}",role="{}"}} {}'.format(
+                name, role, single_flight.counts[role]))
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    """
+    Drops the shared coalescings, so they are created again from the current configuration.
+    """
+    with _lock:
+        _single_flights.clear()
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from pyramid_oereb.core.config import Config
+from pyramid_oereb.core.readers.data_integration import DataIntegrationReader
+
+log = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_data_version = None
+
+
+def digest(value):
+    """
+    Args:
+        value (*): A JSON serializable value.
+
+    Returns:
+        str: The hex digest of the value.
+    """
+    serialized = json.dumps(value, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+
+class DataVersion(object):
+    """
+    The version of the published data per theme, read from the data integration table (date and checksum
+    of the last delivery of every theme). Together with a digest of the configuration, it identifies the
+    state an extract was created from.
+
+    The versions are either read by a background thread every `refresh` seconds (`poll`), so requests
+    never wait for the database, or on demand when they are older than `refresh` seconds. Functions
+    registered with :meth:`subscribe` are called with the code of every theme whose version changed, e.g.
+    to drop the cached extracts containing it.
+
+    Attributes:
+        refresh (float): Seconds between two reads of the versions.
+        poll (bool): Whether the versions are read by a background thread.
+    """
+
+    def __init__(self, reader=None, refresh=60, poll=False):
+        """
+        Args:
+            reader (pyramid_oereb.core.readers.data_integration.DataIntegrationReader or None): The reader
+                of the data integration records. Without reader, only the configuration is versioned.
+            refresh (float): Seconds between two reads of the versions.
+            poll (bool): Whether the versions are read by a background thread, see :meth:`start`.
+        """
+        self.refresh = refresh
+        self.poll = poll
+        self._reader = reader
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._themes = {}
+        self._read_at = None
+        self._subscribers = []
+        self._config_digest = digest(Config.get_config())
+        self._stop = threading.Event()
+        self._thread = None
+
+    def subscribe(self, callback):
+        """
+        Registers a function called with the theme code of every theme whose version changed.
+
+        Args:
+            callback (callable): The function to call.
+        """
+        self._subscribers.append(callback)
+
+    def start(self):
+        """
+        Reads the versions and starts the background thread reading them every `refresh` seconds.
+        """
+        if self._reader is None or self._thread is not None:
+            return
+        self.read()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='data-version', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the background thread.
+        """
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.refresh):
+            self.read()
+
+    def read(self):
+        """
+        Reads the versions from the data integration table. If reading fails, the known versions are kept.
+        """
+        try:
+            records = self._reader.read()
+        except Exception as e:
+            log.error('Reading the data version failed: {}'.format(e))
+            return
+        themes = {}
+        for record in records:
+            theme_code = record.theme_identifier if record.theme is None else record.theme.code
+            themes[theme_code] = '{}/{}'.format(record.date.isoformat(), record.checksum or '')
+        with self._lock:
+            self.update(themes)
+
+    def themes(self):
+        """
+        Returns:
+            dict: The version of every theme keyed by the theme code.
+        """
+        if self._reader is not None and self._thread is None:
+            with self._refresh_lock:
+                if self._read_at is None or time.monotonic() - self._read_at >= self.refresh:
+                    self.read()
+        return self._themes
+
+    def theme_version(self, theme_code):
+        """
+        Args:
+            theme_code (str): The theme code.
+
+        Returns:
+            str or None: The version of the theme, None if it is not recorded.
+        """
+        return self.themes().get(theme_code)
+
+    def token(self):
+        """
+        Returns:
+            str: The hex digest of the configuration and of the versions of all themes.
+        """
+        return self.digest(list(self.themes()))
+
+    def update(self, themes):
+        """
+        Replaces the versions and notifies the subscribers of the changed themes.
+
+        Args:
+            themes (dict): The version of every theme keyed by the theme code.
+        """
+        changed = [
+            theme_code for theme_code in set(self._themes) | set(themes)
+            if self._themes.get(theme_code) != themes.get(theme_code)
+        ]
+        first = self._read_at is None
+        self._themes = themes
+        self._read_at = time.monotonic()
+        if first:
+            return
+        for theme_code in sorted(changed):
+            log.info('Data of theme {} changed'.format(theme_code))
+            for callback in self._subscribers:
+                try:
+                    callback(theme_code)
+                except Exception as e:
+                    log.error('Notifying the change of theme {} failed: {}'.format(theme_code, e))
+
+    def digest(self, theme_codes):
+        """
+        Args:
+            theme_codes (list of str): The themes an extract depends on.
+
+        Returns:
+            str: The hex digest of the configuration and of the versions of the passed themes.
+        """
+        themes = self.themes()
+        return digest([self._config_digest, [(code, themes.get(code)) for code in sorted(theme_codes)]])
+
+
+def get_data_version():
+    """
+    Returns the process wide data version, created on first use from the `data_version` section of the
+    application configuration. With `poll` enabled, its background thread is started.
+
+    Returns:
+        DataVersion: The data version.
+    """
+    global _data_version
+    with _lock:
+        if _data_version is None:
+            version_config = Config.get('data_version') or {}
+            reader = None
+            if version_config.get('source'):
+                reader = DataIntegrationReader(
+                    version_config['source']['class'],
+                    **version_config['source'].get('params', {})
+                )
+            _data_version = DataVersion(
+                reader,
+                refresh=float(version_config.get('refresh', 60)),
+                poll=version_config.get('poll', False)
+            )
+            if _data_version.poll:
+                _data_version.start()
+        return _data_version
+
+
+def reset():
+    """
+    Stops and drops the shared data version, so it is created again from the current configuration.
+    """
+    global _data_version
+    with _lock:
+        if _data_version is not None:
+            _data_version.stop()
+        _data_version = None
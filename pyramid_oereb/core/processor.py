@@ -9,6 +9,9 @@ from pyramid_oereb.core.config import Config
 from pyramid_oereb.core.records.plr import PlrRecord
 from pyramid_oereb.core.readers.extract import ExtractReader
 from pyramid_oereb.core.readers.real_estate import RealEstateReader
+from pyramid_oereb.core.timing import stage
+from pyramid_oereb.core.cache import copy_extract, get_extract_cache
+from pyramid_oereb.core.coalescing import get_single_flight
 
 
 log = logging.getLogger(__name__)
@@ -275,30 +278,74 @@ class Processor(object):
             pyramid_oereb.lib.records.extract.ExtractRecord: The generated extract record.
         """
         log.debug("process() start")
-        municipality = Config.municipality_by_fosnr(real_estate.fosnr)
-        extract_raw = self._extract_reader_.read(params, real_estate, municipality)
-        extract = self.plr_tolerance_check(extract_raw)
+        single_flight = get_single_flight('process', Config.get('coalescing'))
+        if single_flight is None:
+            return self._process(real_estate, params, sld_url)
+        key = '|'.join(str(value) for value in [
+            real_estate.egrid, real_estate.identdn, real_estate.number, params.format, params.language,
+            sorted(params.topics or []), params.with_geometry, params.images, sld_url
+        ])
+        extract, _ = single_flight.do(
+            key,
+            lambda: self._process(real_estate, params, sld_url),
+            share=lambda shared: copy_extract(shared, params)
+        )
+        return extract
 
-        resolver = DottedNameResolver()
-        sort_within_themes_method_string = Config.get('extract').get('sort_within_themes_method')
-        if sort_within_themes_method_string:
-            sort_within_themes_method = resolver.resolve(sort_within_themes_method_string)
-            extract = sort_within_themes_method(extract)
-        else:
-            log.info("No configuration is provided for extract sort_within_themes_method;"
-                     " no further sorting is applied.")
+    def _process(self, real_estate, params, sld_url):
+        """
+        Processes the extract, see :meth:`process`.
+        """
+        extract_cache = get_extract_cache(Config.get('extract_cache'))
+        extract = None
+        if extract_cache is not None:
+            with stage('extract_cache'):
+                cache_key, cache_themes = extract_cache.key(real_estate, params)
+                extract = extract_cache.get(cache_key, params)
+        if extract is None:
+            extract = self._read_extract(real_estate, params)
+            if extract_cache is not None:
+                extract_cache.set(cache_key, cache_themes, extract)
 
         # the selection of view services is done after the tolerance check. This enables us to take
         # care about the circumstance that after tolerance check plrs will be dismissed which were
         # recognized as intersecting before. To avoid this the tolerance check is gathering all plrs
         # intersecting and not intersecting and starts the legend entry sorting after.
-        self.view_service_handling(extract.real_estate, params.images, params.format, params.language)
+        with stage('view_service'):
+            self.view_service_handling(extract.real_estate, params.images, params.format, params.language)
 
         extract.disclaimers = Config.disclaimers
         extract.glossaries = Config.glossaries
         log.debug("process() done, returning extract.")
         return extract
 
+    def _read_extract(self, real_estate, params):
+        """
+        Reads the extract of the real estate and applies the tolerance check and the sorting.
+
+        Args:
+            real_estate (pyramid_oereb.lib.records.real_estate.RealEstateRecord): The real estate.
+            params (pyramid_oereb.views.webservice.Parameter): The parameters of the extract request.
+
+        Returns:
+            pyramid_oereb.lib.records.extract.ExtractRecord: The processed extract record.
+        """
+        municipality = Config.municipality_by_fosnr(real_estate.fosnr)
+        extract_raw = self._extract_reader_.read(params, real_estate, municipality)
+        with stage('tolerance_check'):
+            extract = self.plr_tolerance_check(extract_raw)
+
+        resolver = DottedNameResolver()
+        sort_within_themes_method_string = Config.get('extract').get('sort_within_themes_method')
+        if sort_within_themes_method_string:
+            sort_within_themes_method = resolver.resolve(sort_within_themes_method_string)
+            with stage('sort'):
+                extract = sort_within_themes_method(extract)
+        else:
+            log.info("No configuration is provided for extract sort_within_themes_method;"
+                     " no further sorting is applied.")
+        return extract
+
 
 def create_processor(real_estate_only=False):
     """
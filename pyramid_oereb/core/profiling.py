@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+import cProfile
+import hmac
+import itertools
+import logging
+import os
+import sys
+import threading
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_extract_profiler = None
+
+PROFILE_HEADER = 'X-Oereb-Profile'
+"""str: The request header which carries the secret to profile a single request."""
+
+PROFILE_ID_HEADER = 'X-Oereb-Profile-Id'
+"""str: The response header containing the id of the written profile."""
+
+
+class StackSampler(object):
+    """
+    Samples the call stack of one thread in a fixed interval and counts the collapsed stacks, as used by
+    flame graph tools (one line per stack, frames separated by semicolons, followed by the count).
+    """
+
+    def __init__(self, thread_id, interval=0.005):
+        """
+        Args:
+            thread_id (int): The identifier of the sampled thread.
+            interval (float): Seconds between two samples.
+        """
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='extract-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append('{}:{}'.format(os.path.basename(code.co_filename), code.co_name))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def write(self, path):
+        """
+        Writes the collapsed stacks.
+
+        Args:
+            path (str): The file to write.
+        """
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write('{} {}\n'.format(stack, count))
+
+
+class ExtractProfiler(object):
+    """
+    Profiles selected extract requests. A request is profiled if it is the n-th request of the process
+    (`every`) or if it carries the configured secret in the `X-Oereb-Profile` header. The results are
+    written as pstats file (`<id>.pstats`) and as collapsed stacks (`<id>.collapsed`) to a directory.
+
+    Attributes:
+        directory (str): The directory the profiles are written to.
+        every (int): Profile one of this many requests, 0 disables the sampling.
+        secret (str or None): The secret which enables profiling for a single request.
+        interval (float): Seconds between two samples of the collapsed stacks.
+    """
+
+    def __init__(self, directory, every=0, secret=None, interval=0.005):
+        """
+        Args:
+            directory (str): The directory the profiles are written to. It is created if it does not exist.
+            every (int): Profile one of this many requests, 0 disables the sampling.
+            secret (str or None): The secret which enables profiling for a single request.
+            interval (float): Seconds between two samples of the collapsed stacks.
+        """
+        self.directory = directory
+        self.every = every
+        self.secret = secret
+        self.interval = interval
+        self._counter = itertools.count(1)
+        self._active = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def should_profile(self, request):
+        """
+        Decides whether the request is profiled. The secret header is removed from the request, so it does
+        not end up in the statistics.
+
+        Args:
+            request (pyramid.request.Request): The current request.
+
+        Returns:
+            bool: True if the request should be profiled.
+        """
+        token = request.headers.get(PROFILE_HEADER)
+        if token is not None:
+            del request.headers[PROFILE_HEADER]
+            if self.secret and hmac.compare_digest(token.encode('utf-8'), self.secret.encode('utf-8')):
+                return True
+        return self.every > 0 and next(self._counter) % self.every == 0
+
+    @contextmanager
+    def profile(self):
+        """
+        Profiles the code executed within the context. Only one request is profiled at a time, as the
+        interpreter does not allow concurrent profilers. A request arriving meanwhile is not profiled.
+
+        Yields:
+            str or None: The id of the profile, used as file name, or None if the request is not profiled.
+        """
+        if not self._active.acquire(blocking=False):
+            log.debug('Another request is being profiled, skipping profiling.')
+            yield None
+            return
+        profile_id = uuid.uuid4().hex
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        profiler = cProfile.Profile()
+        try:
+            sampler.start()
+            profiler.enable()
+            try:
+                yield profile_id
+            finally:
+                profiler.disable()
+                sampler.stop()
+            try:
+                profiler.dump_stats(os.path.join(self.directory, '{}.pstats'.format(profile_id)))
+                sampler.write(os.path.join(self.directory, '{}.collapsed'.format(profile_id)))
+                log.info('Extract profile written: {}'.format(profile_id))
+            except OSError as e:
+                log.error('Writing extract profile {} failed: {}'.format(profile_id, e))
+        finally:
+            self._active.release()
+
+
+def get_extract_profiler(profiling_config):
+    """
+    Returns the process wide extract profiler, created on first use.
+
+    Args:
+        profiling_config (dict or None): The `profiling` section of the application configuration.
+
+    Returns:
+        ExtractProfiler or None: The profiler or None if no directory is configured.
+    """
+    global _extract_profiler
+    if not profiling_config or not profiling_config.get('directory'):
+        return None
+    with _lock:
+        if _extract_profiler is None:
+            _extract_profiler = ExtractProfiler(
+                profiling_config['directory'],
+                every=int(profiling_config.get('every', 0)),
+                secret=profiling_config.get('secret'),
+                interval=float(profiling_config.get('interval', 0.005))
+            )
+        return _extract_profiler
+
+
+def reset():
+    """
+    Drops the shared profiler, so it is created again from the current configuration.
+    """
+    global _extract_profiler
+    with _lock:
+        _extract_profiler = None
@@ -10,6 +10,7 @@ from pyramid_oereb.core.config import Config
 from pyramid_oereb.core.records.extract import ExtractRecord
 from pyramid_oereb.core.records.image import ImageRecord
 from pyramid_oereb.core.records.plr import PlrRecord, EmptyPlrRecord
+from pyramid_oereb.core.timing import stage
 
 log = logging.getLogger(__name__)
 
@@ -80,11 +81,19 @@ class ExtractReader(object):
 
         if municipality.published:
 
-            for plr_source in self._plr_sources_:
-                if not params.skip_topic(plr_source.info.get('code')):
+            plr_sources = [
+                plr_source for plr_source in self._plr_sources_
+                if not params.skip_topic(plr_source.info.get('code'))
+            ]
+            if Config.get('batch_plr_queries', False):
+                with stage('plr_batch'):
+                    self._prefetch(plr_sources, params, real_estate, bbox)
+
+            for plr_source in plr_sources:
+                with stage('plr', plr_source.info.get('code')):
                     plr_source.read(params, real_estate, bbox)
 
-                    real_estate.public_law_restrictions.extend(plr_source.records)
+                real_estate.public_law_restrictions.extend(plr_source.records)
 
             for plr in real_estate.public_law_restrictions:
 
@@ -149,6 +158,26 @@ class ExtractReader(object):
         log.debug("read() done")
         return self.extract
 
+    @staticmethod
+    def _prefetch(plr_sources, params, real_estate, bbox):
+        """
+        Passes the PLR sources grouped by their class to the prefetch method of the class, so sources
+        sharing a database can query all their themes at once.
+
+        Args:
+            plr_sources (list of pyramid_oereb.lib.sources.plr.PlrBaseSource): The sources to be read.
+            params (pyramid_oereb.views.webservice.Parameter): The parameters of the extract request.
+            real_estate (pyramid_oereb.lib.records.real_estate.RealEstateRecord): The real estate.
+            bbox (shapely.geometry.base.BaseGeometry): The bounding box of the visible extent of the map.
+        """
+        sources_by_class = {}
+        for plr_source in plr_sources:
+            sources_by_class.setdefault(type(plr_source), []).append(plr_source)
+        for source_class, sources in sources_by_class.items():
+            prefetch = getattr(source_class, 'prefetch', None)
+            if prefetch is not None:
+                prefetch(sources, params, real_estate, bbox)
+
     def _sort_plr_law_status(self, plr_element):
         """
         This method generates the sorting key for plr_elements according to their law_status code.
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 from pyramid_oereb import route_prefix
-from pyramid_oereb.core.views.webservice import PlrWebservice, Symbol, Logo, Sld, QRcode
+from pyramid_oereb.core.views.webservice import PlrWebservice, Symbol, Logo, Sld, QRcode, Metrics
 from pyramid_oereb.contrib.stats.decorators import log_response
 
 
@@ -116,5 +116,10 @@ def includeme(config):  # pragma: no cover
         decorator=log_response
     )
 
+    # Stage duration histograms in the Prometheus text format
+    config.add_route('{0}/metrics'.format(route_prefix), '/metrics')
+    config.add_view(Metrics, attr='get_metrics', route_name='{0}/metrics'.format(route_prefix),
+                    request_method='GET')
+
     # Commit config
     config.commit()
@@ -86,3 +86,19 @@ class PlrBaseSource(Base):
                 the visible extent of the map.
         """
         self.records = list()
+
+    @classmethod
+    def prefetch(cls, sources, params, real_estate, bbox):
+        """
+        Called once per extract with all sources of this class before their read methods, if
+        `batch_plr_queries` is enabled. Sources can use it to query the data of several themes at once and
+        keep the result for :meth:`read`. The default implementation does nothing.
+
+        Args:
+            sources (list of PlrBaseSource): The sources of this class which will be read.
+            params (pyramid_oereb.views.webservice.Parameter): The parameters of the extract request.
+            real_estate (pyramid_oereb.lib.records.real_estate.RealEstateRecord): The real estate which is
+                used as filter to find all related public law restrictions.
+            bbox (shapely.geometry.base.BaseGeometry): The bounding box of the visible extent of the map.
+        """
+        pass
@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+import bisect
+import contextvars
+import logging
+import threading
+from contextlib import contextmanager
+from timeit import default_timer as timer
+
+from sqlalchemy import event
+
+log = logging.getLogger(__name__)
+
+_current_timer = contextvars.ContextVar('pyramid_oereb_stage_timer', default=None)
+_current_stage = contextvars.ContextVar('pyramid_oereb_stage', default=(None, None))
+
+DEFAULT_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+
+
+class StageTimer(object):
+    """
+    Collects the durations of the stages of a single request.
+
+    Attributes:
+        stages (list of tuple): The measured stages as tuples of name, detail (str or None) and duration
+            in seconds, in the order they finished.
+        queries (dict): The SQL statements executed per stage, as list of count, rows and duration in
+            seconds keyed by the name and detail of the innermost stage.
+    """
+
+    def __init__(self):
+        self.stages = []
+        self.queries = {}
+
+    def add(self, name, duration, detail=None):
+        """
+        Records the duration of a stage.
+
+        Args:
+            name (str): The name of the stage.
+            duration (float): The duration in seconds.
+            detail (str or None): Distinguishes repeated stages, e.g. the theme code of a PLR source.
+        """
+        self.stages.append((name, detail, duration))
+
+    def add_query(self, name, detail, rows, duration):
+        """
+        Records an executed SQL statement.
+
+        Args:
+            name (str or None): The name of the stage the statement was executed in.
+            detail (str or None): The detail of the stage, e.g. the theme code of a PLR source.
+            rows (int): The number of rows returned or affected, as far as the driver reports it.
+            duration (float): The execution time in seconds.
+        """
+        query = self.queries.get((name, detail))
+        if query is None:
+            query = self.queries[(name, detail)] = [0, 0, 0.0]
+        query[0] += 1
+        query[1] += rows
+        query[2] += duration
+
+    def query_count(self, name=None, detail=None):
+        """
+        Args:
+            name (str or None): Only count the statements of this stage. All statements if None.
+            detail (str or None): Only count the statements of this detail, e.g. a theme code.
+
+        Returns:
+            int: The number of executed SQL statements.
+        """
+        return sum(
+            count for (stage_name, stage_detail), (count, _, _) in self.queries.items()
+            if (name is None or stage_name == name) and (detail is None or stage_detail == detail)
+        )
+
+    def queries_as_dict(self):
+        """
+        Returns:
+            dict: The number of statements, rows and the duration in milliseconds by stage name. Stages
+            with a detail are nested by detail.
+        """
+        result = {}
+        for (name, detail), (count, rows, duration) in self.queries.items():
+            values = {'count': count, 'rows': rows, 'duration': round(duration * 1000, 3)}
+            if detail is None:
+                result[name or 'none'] = values
+            else:
+                result.setdefault(name or 'none', {})[detail] = values
+        return result
+
+    def as_dict(self):
+        """
+        Returns:
+            dict: The durations in milliseconds by stage name. Stages with a detail are nested by detail,
+            repeated stages are summed up.
+        """
+        result = {}
+        for name, detail, duration in self.stages:
+            milliseconds = duration * 1000
+            if detail is None:
+                result[name] = round(result.get(name, 0) + milliseconds, 3)
+            else:
+                details = result.setdefault(name, {})
+                details[detail] = round(details.get(detail, 0) + milliseconds, 3)
+        return result
+
+    def server_timing(self):
+        """
+        Returns:
+            str: The value of a `Server-Timing` header listing every stage and the executed SQL
+            statements.
+        """
+        metrics = []
+        for name, detail, duration in self.stages:
+            if detail is None:
+                metrics.append('{};dur={:.1f}'.format(name, duration * 1000))
+            else:
+                metrics.append('{};desc="{}";dur={:.1f}'.format(
+                    name, detail.replace('\\', '').replace('"', ''), duration * 1000))
+        if self.queries:
+            metrics.append('db;desc="{} queries";dur={:.1f}'.format(
+                self.query_count(), sum(query[2] for query in self.queries.values()) * 1000))
+        return ', '.join(metrics)
+
+
+class Histograms(object):
+    """
+    Process wide histograms of durations, e.g. of the stages, rendered in the Prometheus text format.
+    """
+
+    def __init__(self, name, description, buckets=None, labels=('stage', 'theme')):
+        """
+        Args:
+            name (str): The metric name.
+            description (str): The help text of the metric.
+            buckets (list of float or None): The upper bounds of the buckets in seconds.
+            labels (tuple of str): The label names of the name and of the detail of the observed values.
+        """
+        self.name = name
+        self.description = description
+        self.buckets = sorted(buckets or DEFAULT_BUCKETS)
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, name, duration, detail=None):
+        """
+        Adds a measured duration.
+
+        Args:
+            name (str): The name of the stage.
+            duration (float): The duration in seconds.
+            detail (str or None): The detail of the stage, exposed as `theme` label.
+        """
+        index = bisect.bisect_left(self.buckets, duration)
+        with self._lock:
+            series = self._series.get((name, detail))
+            if series is None:
+                series = self._series[(name, detail)] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += duration
+            series[2] += 1
+
+    def reset(self):
+        """
+        Drops all observed values.
+        """
+        with self._lock:
+            self._series = {}
+
+    def render(self):
+        """
+        Returns:
+            str: The histograms in the Prometheus text exposition format.
+        """
+        lines = [
+            '# HELP {} {}'.format(self.name, self.description),
+            '# TYPE {} histogram'.format(self.name)
+        ]
+        with self._lock:
+            series = sorted(self._series.items(), key=lambda item: (item[0][0], item[0][1] or ''))
+            for (name, detail), (counts, total, count) in series:
+                labels = '{}="{}"'.format(self.labels[0], _escape_label(name))
+                if detail is not None:
+                    labels += ',{}="{}"'.format(self.labels[1], _escape_label(detail))
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append('{}_bucket{{{},le="{}"}} {}'.format(self.name, labels, bound, cumulative))
+                lines.append('{}_bucket{{{},le="+Inf"}} {}'.format(self.name, labels, count))
+                lines.append('{}_sum{{{}}} {}'.format(self.name, labels, total))
+                lines.append('{}_count{{{}}} {}'.format(self.name, labels, count))
+        return '\n'.join(lines) + '\n'
+
+
+def _escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+stage_histograms = Histograms(
+    'pyramid_oereb_stage_duration_seconds',
+    'Duration of the processing stages of the extract requests.'
+)
+
+
+@contextmanager
+def request_timing():
+    """
+    Collects the stages measured with :func:`stage` while the context is active. The durations are added
+    to :data:`stage_histograms` as well.
+
+    Yields:
+        StageTimer: The timer of the current request.
+    """
+    stage_timer = StageTimer()
+    token = _current_timer.set(stage_timer)
+    try:
+        yield stage_timer
+    finally:
+        _current_timer.reset(token)
+
+
+@contextmanager
+def stage(name, detail=None):
+    """
+    Measures a stage of the current request. Outside of :func:`request_timing` nothing is measured.
+
+    Args:
+        name (str): The name of the stage.
+        detail (str or None): Distinguishes repeated stages, e.g. the theme code of a PLR source.
+    """
+    stage_timer = _current_timer.get()
+    if stage_timer is None:
+        yield
+        return
+    token = _current_stage.set((name, detail))
+    start = timer()
+    try:
+        yield
+    finally:
+        duration = timer() - start
+        _current_stage.reset(token)
+        stage_timer.add(name, duration, detail)
+        stage_histograms.observe(name, duration, detail)
+
+
+def get_stage_timer():
+    """
+    Returns:
+        StageTimer or None: The timer of the current request, None outside of :func:`request_timing`.
+    """
+    return _current_timer.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_timer.get() is not None:
+        conn.info.setdefault('pyramid_oereb_query_start', []).append(timer())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stage_timer = _current_timer.get()
+    if stage_timer is None:
+        return
+    starts = conn.info.get('pyramid_oereb_query_start')
+    if not starts:
+        return
+    duration = timer() - starts.pop()
+    name, detail = _current_stage.get()
+    stage_timer.add_query(name, detail, max(cursor.rowcount or 0, 0), duration)
+
+
+def instrument_engine(engine):
+    """
+    Registers the statements executed by the engine in the :class:`StageTimer` of the current request,
+    attributed to the innermost running :func:`stage`. Outside of :func:`request_timing` only the check for
+    a running request is done.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The engine to instrument.
+    """
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+@contextmanager
+def query_budget(budget, name='plr'):
+    """
+    Fails if more SQL statements than allowed are executed within the context. Meant to be used in tests
+    to detect N+1 query patterns, e.g. per theme::
+
+        with query_budget({'ch.Nutzungsplanung': 5}):
+            processor.process(real_estate, params, sld_url)
+
+    The engines have to be instrumented with :func:`instrument_engine`, which is done for all engines of
+    the :class:`pyramid_oereb.core.adapter.DatabaseAdapter`.
+
+    Args:
+        budget (int or dict): The maximum number of statements per detail of the stage (e.g. per theme),
+            or a dict of maximums by detail. Details missing in the dict are not checked.
+        name (str): The name of the stage the budget applies to.
+
+    Yields:
+        StageTimer: The timer collecting the statements.
+
+    Raises:
+        AssertionError: If the budget has been exceeded.
+    """
+    with request_timing() as stage_timer:
+        yield stage_timer
+    exceeded = []
+    details = sorted(set(detail for stage_name, detail in stage_timer.queries if stage_name == name),
+                     key=lambda detail: detail or '')
+    for detail in details:
+        limit = budget.get(detail) if isinstance(budget, dict) else budget
+        count = stage_timer.query_count(name, detail)
+        if limit is not None and count > limit:
+            exceeded.append('{} ({} statements, budget {})'.format(detail, count, limit))
+    if exceeded:
+        raise AssertionError('Query budget of stage "{}" exceeded: {}'.format(name, ', '.join(exceeded)))
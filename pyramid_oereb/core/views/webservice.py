@@ -1,13 +1,13 @@
 # -*- coding: utf-8 -*-
 
 import logging
-# import yappi
 import qrcode
 import io
+from datetime import date
 # import re
 
 from pyramid.httpexceptions import HTTPBadRequest, HTTPSeeOther, HTTPInternalServerError, HTTPNoContent, \
-    HTTPNotFound
+    HTTPNotFound, HTTPServiceUnavailable
 from pyramid.path import DottedNameResolver
 from shapely.geometry import Point
 from pyramid.renderers import render_to_response
@@ -22,6 +22,10 @@ from pyramid_oereb.core.renderer import Base as Renderer
 from timeit import default_timer as timer
 
 from pyramid_oereb.contrib.stats.decorators import OerebStats
+from pyramid_oereb.core.timing import request_timing, stage, stage_histograms
+from pyramid_oereb.core.profiling import PROFILE_ID_HEADER, get_extract_profiler
+from pyramid_oereb.core.cache import get_response_cache
+from pyramid_oereb.core.coalescing import render_metrics as render_coalescing_metrics
 
 log = logging.getLogger(__name__)
 
@@ -263,71 +267,51 @@ class PlrWebservice(object):
         Returns:
             pyramid.response.Response: The `extract` response.
         """
+        profiler = get_extract_profiler(Config.get('profiling'))
+        profile_id = None
+        with request_timing() as stage_timer:
+            with stage('total'):
+                if profiler is not None and profiler.should_profile(self._request):
+                    with profiler.profile() as profile_id:
+                        response = self.__get_extract_by_id__()
+                else:
+                    response = self.__get_extract_by_id__()
+        if getattr(response, 'extras', None) is not None:
+            response.extras['timings'] = stage_timer.as_dict()
+            response.extras['queries'] = stage_timer.queries_as_dict()
+        if (Config.get('timing') or {}).get('server_timing', False):
+            response.headers['Server-Timing'] = stage_timer.server_timing()
+        if profile_id is not None:
+            response.headers[PROFILE_ID_HEADER] = profile_id
+        return response
+
+    def __get_extract_by_id__(self):
         start_time = timer()
         log.debug("get_extract_by_id() start")
         try:
             params = self.__validate_extract_params__()
-            processor = create_processor()
-            # read the real estate from configured source by the passed parameters
-            real_estate_reader = processor.real_estate_reader
-            if params.egrid:
-                real_estate_records = real_estate_reader.read(params, egrid=params.egrid)
-            elif params.identdn and params.number:
-                real_estate_records = real_estate_reader.read(
-                    params,
-                    nb_ident=params.identdn,
-                    number=params.number
-                )
-            else:
-                raise HTTPBadRequest("Missing required argument")
-            # check if result is strictly one (we queried with primary keys)
-            if len(real_estate_records) == 1:
-
-                # Redirect for format URL
-                if params.format == 'url':
-                    log.debug("get_extract_by_id() calling url")
-                    return self.__redirect_to_dynamic_client__(real_estate_records[0])
-                # yappi.set_clock_type("cpu")
-                # yappi.start()
-                extract = processor.process(
-                    real_estate_records[0],
-                    params,
-                    self._request.route_url('{0}/sld'.format(route_prefix))
-                )
-                # yappi.get_func_stats().save('/workspace/processor_function_stats.prof', "pstat")
-                # yappi.get_thread_stats().save('/workspace/processor_thread_stats.prof', "pstat")
-
-                if params.format == 'json':
-                    log.debug("get_extract_by_id() calling json")
-                    response = render_to_response(
-                        'pyramid_oereb_extract_json',
-                        (extract, params),
-                        request=self._request
-                    )
-                elif params.format == 'xml':
-                    log.debug("get_extract_by_id() calling xml")
-                    response = render_to_response(
-                        'pyramid_oereb_extract_xml',
-                        (extract, params),
-                        request=self._request
-                    )
-                elif params.format == 'pdf':
-                    log.debug("get_extract_by_id() calling pdf")
-                    response = render_to_response(
-                        'pyramid_oereb_extract_print',
-                        (extract, params),
-                        request=self._request
-                    )
+            response_cache = get_response_cache(Config.get('response_cache'))
+            if response_cache is not None and response_cache.accepts(params):
+                with stage('cache'):
+                    cache_key, cache_themes = response_cache.key(params, self._request.application_url)
+                    entry = response_cache.get(cache_key)
+                if entry is not None:
+                    response = self._request.response
+                    response.body = entry.body
+                    response.headers['Content-Type'] = entry.content_type
                 else:
-                    raise HTTPBadRequest("The format '{}' is wrong".format(params.format))
-                end_time = timer()
-                log.debug("DONE with extract, time spent: {} seconds".format(end_time - start_time))
+                    response, extract = self.__render_extract__(params, start_time)
+                    if extract is not None and response.status_int == 200:
+                        response_cache.set(cache_key, cache_themes, response, extract)
             else:
-                raise HTTPNoContent("No real estate found")
+                response, _ = self.__render_extract__(params, start_time)
         except HTTPNoContent as err:
             response = HTTPNoContent('{}'.format(err))
         except HTTPBadRequest as err:
             response = HTTPBadRequest('{}'.format(err))
+        except HTTPServiceUnavailable as err:
+            # the print queue is full, the response already carries the Retry-After header
+            response = err
         try:
             response.extras = OerebStats(service='GetExtractById',
                                          output_format=params.format,
@@ -344,6 +328,67 @@ class PlrWebservice(object):
                 response.extras = OerebStats(service='GetExtractById')
         return response
 
+    def __render_extract__(self, params, start_time):
+        """
+        Reads the real estate, processes its extract and renders it in the requested format.
+
+        Args:
+            params (pyramid_oereb.views.webservice.Parameter): The validated parameters.
+            start_time (float): The start of the request, used for logging.
+
+        Returns:
+            tuple: The response and the rendered extract record (None for a redirect).
+        """
+        processor = create_processor()
+        # read the real estate from configured source by the passed parameters
+        real_estate_reader = processor.real_estate_reader
+        if params.egrid:
+            with stage('real_estate'):
+                real_estate_records = real_estate_reader.read(params, egrid=params.egrid)
+        elif params.identdn and params.number:
+            with stage('real_estate'):
+                real_estate_records = real_estate_reader.read(
+                    params,
+                    nb_ident=params.identdn,
+                    number=params.number
+                )
+        else:
+            raise HTTPBadRequest("Missing required argument")
+        # check if result is strictly one (we queried with primary keys)
+        if len(real_estate_records) != 1:
+            raise HTTPNoContent("No real estate found")
+
+        # Redirect for format URL
+        if params.format == 'url':
+            log.debug("get_extract_by_id() calling url")
+            return self.__redirect_to_dynamic_client__(real_estate_records[0]), None
+        extract = processor.process(
+            real_estate_records[0],
+            params,
+            self._request.route_url('{0}/sld'.format(route_prefix))
+        )
+
+        if params.format == 'json':
+            log.debug("get_extract_by_id() calling json")
+            renderer_name = 'pyramid_oereb_extract_json'
+        elif params.format == 'xml':
+            log.debug("get_extract_by_id() calling xml")
+            renderer_name = 'pyramid_oereb_extract_xml'
+        elif params.format == 'pdf':
+            log.debug("get_extract_by_id() calling pdf")
+            renderer_name = 'pyramid_oereb_extract_print'
+        else:
+            raise HTTPBadRequest("The format '{}' is wrong".format(params.format))
+        with stage('render'):
+            response = render_to_response(
+                renderer_name,
+                (extract, params),
+                request=self._request
+            )
+        end_time = timer()
+        log.debug("DONE with extract, time spent: {} seconds".format(end_time - start_time))
+        return response, extract
+
     def __validate_extract_params__(self):
         """
         Validates the input parameters for get_extract_by_id.
@@ -638,6 +683,8 @@ class Parameter(object):
         self.__topics__ = topics
         self.__extract_url__ = extract_url
         self.__qr_code_ref__ = qr_code_ref
+        # kept as ISO string, the parameters are serialized to JSON for the statistics
+        self.__reference_date__ = date.today().isoformat()
 
     def set_identdn(self, identdn):
         """
@@ -792,6 +839,15 @@ class Parameter(object):
 
         return self.__qr_code_ref__
 
+    @property
+    def reference_date(self):
+        """
+        Returns:
+            datetime.date: The date the publication of the data is checked against, the same for the
+            whole extract.
+        """
+        return date.fromisoformat(self.__reference_date__)
+
     def skip_topic(self, theme_code):
         """
         Check if the topic should be skipped in extract.
@@ -1008,3 +1064,37 @@ class QRcode(object):
         qr_img.save(buffered, format="PNG")
         qr_code = buffered.getvalue()
         return qr_code
+
+
+class Metrics(object):
+    """
+    Webservice to deliver the metrics of the current process in the Prometheus text format.
+
+    Args:
+        request (pyramid.request.Request or pyramid.testing.DummyRequest): The pyramid request instance.
+    """
+    def __init__(self, request):
+        self._request = request
+
+    def get_metrics(self):
+        """
+        Returns a response containing the histograms, the database pools and the coalescing counters of the
+        current process.
+
+        Returns:
+            pyramid.response.Response: Response containing the metrics as plain text.
+
+        Raises:
+            HTTPNotFound: if the metrics are not enabled in the configuration.
+        """
+        if not (Config.get('timing') or {}).get('metrics', False):
+            raise HTTPNotFound()
+        response = self._request.response
+        response.status_int = 200
+        response.content_type = 'text/plain'
+        response.charset = 'utf-8'
+        from pyramid_oereb import database_adapter
+        response.text = stage_histograms.render() + database_adapter.render_metrics()
+        if Config.get('coalescing'):
+            response.text += render_coalescing_metrics()
+        return response
@@ -6,7 +6,8 @@ from sys import float_info as fi
 
 from pyramid.path import DottedNameResolver
 
-from sqlalchemy import create_engine, orm, text
+from sqlalchemy import create_engine, orm, select, text
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.schema import CreateSchema
 from sqlalchemy.engine.url import URL
 
@@ -16,6 +17,7 @@ from pyramid_oereb.core.records.real_estate import RealEstateRecord
 from pyramid_oereb.core.records.municipality import MunicipalityRecord
 from pyramid_oereb.core.records.theme import ThemeRecord
 
+from pyramid_oereb.core.config import Config
 from pyramid_oereb.core.processor import Processor
 from pyramid_oereb.contrib.data_sources.interlis_2_3.sources.plr import (
     StandardThemeConfigParser
@@ -304,60 +306,16 @@ def test_related_geometries(processor_data, pyramid_oereb_test_config, interlis_
     assert len(extract.real_estate.public_law_restrictions) == nb_results
 
 
-def mock_session_object_query_geometries(items_list):
-    class PublicLawRestrictionTest():
-        def __init__(self, law_status, legend_entry_id):
-            self.law_status = law_status
-            self.legend_entry_id = legend_entry_id
+class LegendEntryTest():
+    def __init__(self, t_id):
+        self.t_id = t_id
 
-    class GeometryTest():
-        def __init__(self, public_law_restriction):
-            self.public_law_restriction = public_law_restriction
 
-    geometries = []
-    for item in items_list:
-        geometries.append(GeometryTest(PublicLawRestrictionTest(item[0], item[1])))
-
-    class AllTest():
-        def all():
-            return iter(geometries)
-
-    class DistinctTest():
-        def __init__(self):
-            pass
-
-        def options(arg2):
-            return AllTest
-
-    class FilterTest():
-        def __init__(self):
-            pass
-
-        def distinct(arg2):
-            return DistinctTest
-
-    class QueryTest():
-        def __init__(self):
-            pass
-
-        def filter(arg3):
-            return FilterTest
-
-    class SessionTest():
-        def __init__(self):
-            pass
-
-        def query(arg1):
-            return QueryTest
-
-    return SessionTest
-
-
-def get_return_vals_of_get_legend_entries_from_db(arg1, arg2, list_of_ids):
-    return_value = []
-    for id in list_of_ids:
-        return_value.append((id, ))
-    return return_value
+def mock_get_legend_entries_from_db(calls):
+    def get_legend_entries_from_db(source, session, legend_entry_ids):
+        calls.append(sorted(legend_entry_ids))
+        return [LegendEntryTest(legend_entry_id) for legend_entry_id in legend_entry_ids]
+    return get_legend_entries_from_db
 
 
 @pytest.mark.parametrize('idx,items_list', [
@@ -384,25 +342,61 @@ def get_return_vals_of_get_legend_entries_from_db(arg1, arg2, list_of_ids):
     ])
 ])
 def test_collect_legend_entries_by_bbox(idx, items_list, plr_source_params):
+    calls = []
     with (
+        patch.object(
+            DatabaseSource,
+            'collect_legend_entry_ids_by_bbox',
+            lambda source, session, bbox: set(tuple(item) for item in items_list)
+        ),
         patch.object(
             DatabaseSource,
             'get_legend_entries_from_db',
-            get_return_vals_of_get_legend_entries_from_db
+            mock_get_legend_entries_from_db(calls)
         )
     ):
         source = DatabaseSource(**plr_source_params)
         result = source.collect_legend_entries_by_bbox(
-            mock_session_object_query_geometries(items_list),
+            None,
             Polygon(((0., 0.), (0., 1.), (1., 1.), (1., 0.), (0., 0.))))
 
+    def legend_entry_ids(law_status):
+        return sorted(legend_entry.t_id for legend_entries, status in result if status == law_status
+                      for legend_entry in legend_entries)
+
+    assert len(calls) == 1
     if idx == 0:
         assert len(result) == 2
-        assert sorted([x[0] for x in result if x[1] == 'inForce'][0]) == \
-            [(1, ), (3, ), (4, ), (7, ), (9, )]
-        assert sorted([x[0] for x in result if x[1] == 'changeWithoutPreEffect'][0]) == \
-            [(1, ), (2, ), (6, ), (7, )]
+        assert calls[0] == [1, 2, 3, 4, 6, 7, 9]
+        assert legend_entry_ids('inForce') == [1, 3, 4, 7, 9]
+        assert legend_entry_ids('changeWithoutPreEffect') == [1, 2, 6, 7]
     if idx == 1:
         assert len(result) == 1
-        assert sorted([x[0] for x in result if x[1] == 'inForce'][0]) == \
-            [(1, ), (3, ), (4, ), (7, ), (9, )]
+        assert legend_entry_ids('inForce') == [1, 3, 4, 7, 9]
+
+
+def test_collect_legend_entries_by_bbox_empty(plr_source_params):
+    calls = []
+    with (
+        patch.object(DatabaseSource, 'collect_legend_entry_ids_by_bbox', lambda source, session, bbox: []),
+        patch.object(DatabaseSource, 'get_legend_entries_from_db', mock_get_legend_entries_from_db(calls))
+    ):
+        source = DatabaseSource(**plr_source_params)
+        assert source.collect_legend_entries_by_bbox(None, None) == []
+    assert calls == []
+
+
+@pytest.mark.parametrize('filter_plr_geometries', [False, True])
+def test_related_geometries_filter(plr_source_params, filter_plr_geometries):
+    class RealEstate:
+        limit = Polygon(((0., 0.), (0., 1.), (1., 1.), (1., 0.), (0., 0.)))
+
+    config_get = Config.get
+    with patch.object(Config, 'get', side_effect=lambda key, default=None: filter_plr_geometries
+                      if key == 'filter_plr_geometries' else config_get(key, default)):
+        source = DatabaseSource(**plr_source_params)
+        geometries = source.related_geometries(RealEstate(), date(2024, 1, 1))
+    statement = select(source.models.PublicLawRestriction).join(geometries)
+    compiled = str(statement.compile(dialect=postgresql.dialect()))
+    assert 'land_use_plans.geometrie.publiziertab <= %(publiziertab_1)s' in compiled
+    assert compiled.count('ST_Intersects(') == (3 if filter_plr_geometries else 0)
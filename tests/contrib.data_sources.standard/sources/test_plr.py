@@ -2,12 +2,15 @@ import datetime
 import math
 
 import pytest
+import shapely
 from unittest.mock import patch
 
 from geoalchemy2 import WKTElement
+from pyramid.config import ConfigurationError
 from shapely.geometry import Polygon, Point, LineString, GeometryCollection
 from shapely.wkt import loads
-from sqlalchemy import String, text, create_engine, orm
+from sqlalchemy import String, create_engine, orm, select
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm import declarative_base
 
 from pyramid_oereb.core.config import Config
@@ -821,16 +824,15 @@ def test_handle_collection_tolerance(tolerances, with_collection, config_config,
 
         # check results for 8 combinations of with_collection + tolerances
         from sqlalchemy.sql.annotation import AnnotatedColumn
-        from sqlalchemy.sql.elements import BooleanClauseList, TextClause, BindParameter
+        from sqlalchemy.sql.elements import BooleanClauseList, BindParameter
         from geoalchemy2.functions import ST_Intersects, ST_DWithin, ST_GeomFromWKB
         if with_collection:
             assert type(query.received_clause) is BooleanClauseList
             for clause in query.received_clause.clauses:
-                assert type(clause) is TextClause
                 if tolerances:
-                    assert 'ST_DWithin' in clause.text
+                    assert type(clause.element) is ST_DWithin
                 else:
-                    assert 'ST_Intersects' in clause.text
+                    assert type(clause.element) is ST_Intersects
         else:
             if tolerances:
                 assert type(query.received_clause) is ST_DWithin
@@ -1197,27 +1199,33 @@ def test_get_document_records(plr_source_params, all_plr_result_session, plrs_fr
 
 
 def test_extract_geometry_collection_db(real_estate_shapely_geom):
-    real_estate_shapely_geom
     clause = DatabaseSource.extract_geometry_collection_db(
         'test.geometry.geom',
         real_estate_shapely_geom
     )
     assert len(clause.clauses) == 3
-    assert clause.clauses[0].text == text(
-        'ST_Intersects(ST_CollectionExtract(test.geometry.geom, 1), ST_GeomFromText(\'{}\', 2056))'.format(
-            real_estate_shapely_geom.wkt
-        )
-    ).text
-    assert clause.clauses[1].text == text(
-        'ST_Intersects(ST_CollectionExtract(test.geometry.geom, 2), ST_GeomFromText(\'{}\', 2056))'.format(
-            real_estate_shapely_geom.wkt
-        )
-    ).text
-    assert clause.clauses[2].text == text(
-        'ST_Intersects(ST_CollectionExtract(test.geometry.geom, 3), ST_GeomFromText(\'{}\', 2056))'.format(
-            real_estate_shapely_geom.wkt
-        )
-    ).text
+    compiled = clause.compile(dialect=postgresql.dialect())
+    for dimension in [1, 2, 3]:
+        assert 'ST_Intersects(ST_CollectionExtract(test.geometry.geom, ' \
+            '%(ST_CollectionExtract_{0})s::INTEGER), ST_GeomFromWKB(%(geometry_1)s, 2056))'.format(
+                dimension
+            ) in str(compiled)
+        assert compiled.params['ST_CollectionExtract_{}'.format(dimension)] == dimension
+    assert compiled.params['geometry_1'] == real_estate_shapely_geom.wkb
+    assert real_estate_shapely_geom.wkt not in str(compiled)
+
+
+def test_extract_geometry_collection_db_tolerance(real_estate_shapely_geom):
+    clause = DatabaseSource.extract_geometry_collection_db(
+        'test.geometry.geom',
+        real_estate_shapely_geom,
+        {'Point': 0.2, 'Polygon': 0.1}
+    )
+    compiled = clause.compile(dialect=postgresql.dialect())
+    assert str(compiled).count('ST_DWithin(') == 2
+    assert str(compiled).count('ST_Intersects(') == 1
+    assert compiled.params['ST_DWithin_1'] == 0.2
+    assert compiled.params['ST_DWithin_2'] == 0.1
 
 
 def test_handle_collection(plr_source_params, all_plr_result_session, real_estate_shapely_geom,
@@ -1244,45 +1252,21 @@ def test_handle_collection(plr_source_params, all_plr_result_session, real_estat
             FROM land_use_plans.geometry
             WHERE ST_Intersects(
                 land_use_plans.geometry.geom,
-                ST_GeomFromWKB(%(ST_GeomFromWKB_1)s, %(ST_GeomFromWKB_2)s)
+                ST_GeomFromWKB(%(geometry_1)s, 2056)
             )
         '''.replace('\n', '').replace(' ', '')
 
 
-def mock_return_value_handle_collection(items_list):
-    class PublicLawRestrictionTest():
-        def __init__(self, law_status, legend_entry_id):
-            self.law_status = law_status
-            self.legend_entry_id = legend_entry_id
-
-    class GeometryTest():
-        def __init__(self, public_law_restriction):
-            self.public_law_restriction = public_law_restriction
-
-    geometries = []
-    for item in items_list:
-        geometries.append(GeometryTest(PublicLawRestrictionTest(item[0], item[1])))
-
-    class AllTest():
-        def __init__(arg1, arg2):
-            pass
+class LegendEntryTest():
+    def __init__(self, identifier):
+        self.id = identifier
 
-        def all(arg3):
-            return iter(geometries)
 
-    class OptionsTest():
-        def __init__(self, arg1, arg2):
-            pass
-        options = AllTest
-
-    return OptionsTest
-
-
-def get_return_vals_of_get_legend_entries_from_db(arg1, arg2, list_of_ids):
-    return_value = []
-    for id in list_of_ids:
-        return_value.append((id, ))
-    return return_value
+def mock_get_legend_entries_from_db(calls):
+    def get_legend_entries_from_db(source, session, legend_entry_ids):
+        calls.append(sorted(legend_entry_ids))
+        return [LegendEntryTest(legend_entry_id) for legend_entry_id in legend_entry_ids]
+    return get_legend_entries_from_db
 
 
 @pytest.mark.parametrize('idx,items_list', [
@@ -1309,28 +1293,290 @@ def get_return_vals_of_get_legend_entries_from_db(arg1, arg2, list_of_ids):
     ])
 ])
 def test_collect_legend_entries_by_bbox(idx, items_list, plr_source_params):
+    calls = []
     with (
         patch.object(
             DatabaseSource,
-            'handle_collection',
-            mock_return_value_handle_collection(items_list)
+            'collect_legend_entry_ids_by_bbox',
+            lambda source, session, bbox: set(tuple(item) for item in items_list)
         ),
         patch.object(
             DatabaseSource,
             'get_legend_entries_from_db',
-            get_return_vals_of_get_legend_entries_from_db
+            mock_get_legend_entries_from_db(calls)
         )
     ):
         source = DatabaseSource(**plr_source_params)
         result = source.collect_legend_entries_by_bbox("", "")
 
+    def legend_entry_ids(law_status):
+        return sorted(legend_entry.id for legend_entries, status in result if status == law_status
+                      for legend_entry in legend_entries)
+
+    assert len(calls) == 1
     if idx == 0:
         assert len(result) == 2
-        assert sorted([x[0] for x in result if x[1] == 'inForce'][0]) == \
-            [(1, ), (3, ), (4, ), (7, ), (9, )]
-        assert sorted([x[0] for x in result if x[1] == 'changeWithoutPreEffect'][0]) == \
-            [(1, ), (2, ), (6, ), (7, )]
+        assert calls[0] == [1, 2, 3, 4, 6, 7, 9]
+        assert legend_entry_ids('inForce') == [1, 3, 4, 7, 9]
+        assert legend_entry_ids('changeWithoutPreEffect') == [1, 2, 6, 7]
     if idx == 1:
         assert len(result) == 1
-        assert sorted([x[0] for x in result if x[1] == 'inForce'][0]) == \
-            [(1, ), (3, ), (4, ), (7, ), (9, )]
+        assert legend_entry_ids('inForce') == [1, 3, 4, 7, 9]
+
+
+def test_collect_legend_entry_ids_by_bbox(plr_source_params):
+    queries = []
+
+    def all(query):
+        queries.append(query)
+        return []
+
+    plr_source_params['geometry_type'] = 'POLYGON'
+    with patch.object(orm.Query, 'all', all):
+        source = DatabaseSource(**plr_source_params)
+        source.collect_legend_entry_ids_by_bbox(orm.Session(), Polygon(((0, 0), (0, 1), (1, 1))))
+    statement = str(queries[0].statement.compile(dialect=postgresql.dialect()))
+    assert statement.startswith(
+        'SELECT DISTINCT land_use_plans.public_law_restriction.law_status, '
+        'land_use_plans.public_law_restriction.legend_entry_id'
+    )
+    assert 'land_use_plans.geometry.geom' not in statement.split('FROM')[0]
+
+
+def test_prefetch(plr_source_params, session, real_estate_shapely_geom):
+    class RealEstate:
+        fosnr = 1234
+        limit = real_estate_shapely_geom
+
+    executed = []
+
+    class Result:
+        def all(self):
+            return [(0, 'plr1'), (0, 'plr2'), (1, 'plr3')]
+
+    class Session(session):
+        def execute(self, statement):
+            executed.append(statement)
+            return Result()
+
+    plr_source_params['geometry_type'] = 'POLYGON'
+    other_params = dict(plr_source_params, source={
+        'class': plr_source_params['source']['class'],
+        'params': dict(plr_source_params['source']['params'], schema_name='forest_perimeters')
+    })
+    with (
+        patch('pyramid_oereb.core.adapter.DatabaseAdapter.get_session', return_value=Session()),
+        patch.object(Config, 'availability_by_theme_code_municipality_fosnr', return_value=True)
+    ):
+        sources = [DatabaseSource(**plr_source_params), DatabaseSource(**other_params)]
+        assert sources[0].prefetched_ids is None
+        DatabaseSource.prefetch(sources, None, RealEstate(), None)
+    assert len(executed) == 1
+    statement = str(executed[0])
+    assert 'UNION ALL' in statement
+    assert 'land_use_plans.geometry.public_law_restriction_id' in statement
+    assert 'forest_perimeters.geometry.public_law_restriction_id' in statement
+    assert sources[0].prefetched_ids == ['plr1', 'plr2']
+    assert sources[1].prefetched_ids == ['plr3']
+
+
+def test_read_prefetched(plr_source_params, session):
+    class RealEstate:
+        fosnr = 1234
+
+    class Session(session):
+        def query(self, model):
+            raise AssertionError('The prefetched source must not query the geometries')
+
+    with (
+        patch('pyramid_oereb.core.adapter.DatabaseAdapter.get_session', return_value=Session()),
+        patch.object(Config, 'availability_by_theme_code_municipality_fosnr', return_value=True)
+    ):
+        source = DatabaseSource(**plr_source_params)
+        source.prefetched_ids = []
+        source.read(None, RealEstate(), None)
+    assert len(source.records) == 1
+    assert source.records[0].theme.code == 'ch.Nutzungsplanung'
+    assert source.records[0].has_data
+
+
+@pytest.mark.parametrize('filter_plr_geometries', [False, True])
+def test_related_geometries(plr_source_params, real_estate_shapely_geom, filter_plr_geometries):
+    class RealEstate:
+        limit = real_estate_shapely_geom
+
+    config_get = Config.get
+    plr_source_params['geometry_type'] = 'POLYGON'
+    with patch.object(Config, 'get', side_effect=lambda key, default=None: filter_plr_geometries
+                      if key == 'filter_plr_geometries' else config_get(key, default)):
+        source = DatabaseSource(**plr_source_params)
+        geometries = source.related_geometries(RealEstate(), datetime.date(2024, 1, 1))
+    statement = select(source.models.PublicLawRestriction).join(geometries)
+    compiled = str(statement.compile(dialect=postgresql.dialect()))
+    assert 'land_use_plans.geometry.published_from <= %(published_from_1)s' in compiled
+    intersects = 'ST_Intersects(land_use_plans.geometry.geom, ST_GeomFromWKB('
+    assert (intersects in compiled) is filter_plr_geometries
+
+
+def test_collect_related_geometries_published(plr_source_params, real_estate_shapely_geom):
+    class RealEstate:
+        fosnr = 1234
+        limit = real_estate_shapely_geom
+
+    queries = []
+
+    def all(query):
+        queries.append(query)
+        return []
+
+    plr_source_params['geometry_type'] = 'POLYGON'
+    with patch.object(orm.Query, 'all', all):
+        source = DatabaseSource(**plr_source_params)
+        source.collect_related_geometries_by_real_estate(
+            orm.Session(), RealEstate(), datetime.date(2024, 1, 1)
+        )
+    compiled = queries[0].statement.compile(dialect=postgresql.dialect())
+    statement = str(compiled)
+    assert 'JOIN land_use_plans.public_law_restriction ON' in statement
+    assert 'land_use_plans.geometry.published_from <= ' in statement
+    assert 'land_use_plans.public_law_restriction.published_until IS NULL OR ' in statement
+    assert compiled.params['published_from_1'] == datetime.date(2024, 1, 1)
+
+
+@pytest.fixture
+def plr_json(png_binary, yesterday, tomorrow):
+    office = {
+        'id': '1', 'name': {'de': 'Office1'}, 'office_at_web': {'de': 'https://office1.url'},
+        'uid': 'abcde', 'line1': None, 'line2': None, 'street': None, 'number': None,
+        'postal_code': 4444, 'city': 'Office1 City'
+    }
+    yield {
+        'id': '1',
+        'law_status': 'inKraft',
+        'published_from': yesterday.isoformat(),
+        'published_until': None,
+        'view_service_id': '1',
+        'office_id': '1',
+        'legend_entry_id': '1',
+        'geometries': [{
+            'id': '1',
+            'law_status': 'inKraft',
+            'published_from': yesterday.isoformat(),
+            'published_until': tomorrow.isoformat(),
+            'geo_metadata': 'https://geocat.ch',
+            'geom': shapely.to_wkb(shapely.set_srid(Polygon(((0, 0), (0, 1), (1, 1))), 2056), hex=True,
+                                   include_srid=True),
+            'public_law_restriction_id': '1'
+        }],
+        'documents': [{
+            'id': '1', 'document_type': 'Hinweis', 'index': 1, 'law_status': 'inKraft',
+            'title': {'de': 'Titel1'}, 'office_id': '1', 'published_from': yesterday.isoformat(),
+            'published_until': None, 'text_at_web': {'de': 'https://test1.abcd'}, 'abbreviation': None,
+            'official_number': None, 'only_in_municipality': None, 'file': None,
+            'responsible_office': office
+        }],
+        'legend_entry': {
+            'id': '1', 'symbol': b64.encode(png_binary), 'legend_text': {'de': 'testlegende'},
+            'type_code': 'testCode', 'type_code_list': 'testCode,testCode2', 'theme': 'ch.Nutzungsplanung',
+            'sub_theme': None, 'view_service_id': '1'
+        },
+        'view_service': {
+            'id': '1', 'reference_wms': {'de': 'https://geowms.bl.ch/?SERVICE=WMS'}, 'layer_index': 1,
+            'layer_opacity': 1.0
+        },
+        'responsible_office': office
+    }
+
+
+def test_from_json_to_public_law_restriction(plr_source_params, plr_json, yesterday, tomorrow,
+                                             patch_config_get_law_status_by_data_code):
+    source = DatabaseSource(**plr_source_params)
+    public_law_restriction = source.from_json_to_public_law_restriction(plr_json)
+    assert public_law_restriction.published_from == yesterday
+    assert public_law_restriction.published_until is None
+    assert public_law_restriction.legend_entry.theme == 'ch.Nutzungsplanung'
+    assert public_law_restriction.view_service.layer_opacity == 1.0
+    assert public_law_restriction.responsible_office.name == {'de': 'Office1'}
+    assert len(public_law_restriction.geometries) == 1
+    assert public_law_restriction.geometries[0].published_until == tomorrow
+    assert len(public_law_restriction.legal_provisions) == 1
+    document = public_law_restriction.legal_provisions[0].document
+    assert document.published_from == yesterday
+    assert document.responsible_office.city == 'Office1 City'
+    geometry_records = source.from_db_to_geometry_records(public_law_restriction.geometries)
+    assert geometry_records[0].geom.equals(Polygon(((0, 0), (0, 1), (1, 1))))
+
+
+def test_from_json_to_public_law_restriction_without_relations(plr_source_params, plr_json):
+    plr_json['geometries'] = None
+    plr_json['documents'] = None
+    source = DatabaseSource(**plr_source_params)
+    public_law_restriction = source.from_json_to_public_law_restriction(plr_json)
+    assert public_law_restriction.geometries == []
+    assert public_law_restriction.legal_provisions == []
+
+
+def test_public_law_restrictions_statement(plr_source_params, real_estate_shapely_geom):
+    class RealEstate:
+        fosnr = 1234
+        limit = real_estate_shapely_geom
+
+    plr_source_params['geometry_type'] = 'POLYGON'
+    source = DatabaseSource(**plr_source_params)
+    statement = str(source.public_law_restrictions_statement(
+        RealEstate(), datetime.date(2024, 1, 1)
+    ).compile(dialect=postgresql.dialect()))
+    assert statement.startswith("SELECT json_build_object('id', land_use_plans.public_law_restriction.id")
+    assert "'geom', encode(ST_AsEWKB(land_use_plans.geometry.geom), 'hex')" in statement
+    assert statement.count('json_agg(') == 2
+    assert 'land_use_plans.document.only_in_municipality = ' in statement
+    assert 'WHERE land_use_plans.public_law_restriction.id IN (SELECT ' in statement
+    assert 'ST_Intersects(land_use_plans.geometry.geom, ST_GeomFromWKB(' in statement
+    statement = str(source.public_law_restrictions_statement(
+        RealEstate(), datetime.date(2024, 1, 1), ['1', '2']
+    ).compile(dialect=postgresql.dialect()))
+    assert 'ST_Intersects' not in statement
+
+
+def test_read_json(plr_source_params, session, plr_json, patch_config_get_law_status_by_data_code,
+                   patch_config_get_document_type_by_data_code):
+    class RealEstate:
+        fosnr = 1234
+        limit = Polygon(((0, 0), (0, 1), (1, 1)))
+
+    executed = []
+
+    class Result:
+        def scalars(self):
+            return [plr_json]
+
+    class Session(session):
+        def execute(self, statement):
+            executed.append(statement)
+            return Result()
+
+    config_get = Config.get
+    with (
+        patch('pyramid_oereb.core.adapter.DatabaseAdapter.get_session', return_value=Session()),
+        patch.object(Config, 'availability_by_theme_code_municipality_fosnr', return_value=True),
+        patch.object(Config, 'get', side_effect=lambda key, default=None: 'json'
+                     if key == 'plr_fetch_strategy' else config_get(key, default)),
+        patch.object(DatabaseSource, 'collect_legend_entries_by_bbox', return_value=[[[], 'inKraft']])
+    ):
+        source = DatabaseSource(**plr_source_params)
+        source.prefetched_ids = ['1']
+        source.read(Parameter('json'), RealEstate(), None)
+    assert len(executed) == 1
+    assert len(source.records) == 1
+    assert isinstance(source.records[0], PlrRecord)
+    assert source.records[0].legend_entry.type_code == 'testCode'
+    assert len(source.records[0].documents) == 1
+
+
+def test_fetch_strategy_unknown(plr_source_params):
+    config_get = Config.get
+    source = DatabaseSource(**plr_source_params)
+    with patch.object(Config, 'get', side_effect=lambda key, default=None: 'sql'
+                      if key == 'plr_fetch_strategy' else config_get(key, default)):
+        with pytest.raises(ConfigurationError):
+            source.fetch_strategy
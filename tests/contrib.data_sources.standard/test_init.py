@@ -1,8 +1,9 @@
 import pytest
+from geoalchemy2 import Geometry
 from sqlalchemy.orm import declarative_base
-from sqlalchemy import String, DateTime, Column
+from sqlalchemy import String, DateTime, Column, ForeignKey
 from pyramid_oereb.contrib.data_sources.standard import create_schema_sql, tables, create_tables_sql, \
-    create_sql
+    create_sql, recommended_indexes, create_indexes_sql
 
 
 @pytest.fixture
@@ -29,6 +30,28 @@ def datetime_table_base():
     yield base, Test, schema_name
 
 
+@pytest.fixture
+def indexed_table_base():
+    base = declarative_base()
+    schema_name = 'test'
+
+    class Parent(base):
+        __table_args__ = {'schema': schema_name}
+        __tablename__ = 'parent'
+        id = Column(String, primary_key=True)
+
+    class Test(base):
+        __table_args__ = {'schema': schema_name}
+        __tablename__ = 'test_table'
+        id = Column(String, primary_key=True)
+        law_status = Column(String)
+        published_from = Column(DateTime)
+        name = Column(String)
+        geom = Column(Geometry('POLYGON', srid=2056))
+        parent_id = Column(String, ForeignKey(Parent.id))
+    yield base, Test, schema_name
+
+
 def test_create_schema_sql():
     sql = create_schema_sql('test')
     assert sql == 'CREATE SCHEMA IF NOT EXISTS test;'
@@ -50,3 +73,30 @@ def test_create_sql(simple_table_base):
     sql = create_sql(simple_table_base[2], tables(simple_table_base[0]))
     expected_sql = 'CREATE SCHEMA IF NOT EXISTS test;CREATE TABLE test.test_table (test_column VARCHAR NOT NULL, PRIMARY KEY (test_column));'  # noqa: E501
     assert sql.replace('\n', '').replace('\t', '') == expected_sql
+
+
+def test_recommended_indexes(indexed_table_base):
+    indexes = recommended_indexes(indexed_table_base[1].__table__)
+    assert [(index['name'], index['column'], index['using'], index['include']) for index in indexes] == [
+        ('idx_test_table_law_status', 'law_status', 'btree', []),
+        ('idx_test_table_published_from', 'published_from', 'btree', []),
+        ('idx_test_table_geom', 'geom', 'gist', []),
+        ('idx_test_table_parent_id', 'parent_id', 'btree', [])
+    ]
+
+
+def test_create_indexes_sql(indexed_table_base):
+    sql = create_indexes_sql(tables(indexed_table_base[0]))
+    assert sql == (
+        'CREATE INDEX idx_test_table_law_status ON test.test_table USING btree (law_status);\n'
+        'CREATE INDEX idx_test_table_published_from ON test.test_table USING btree (published_from);\n'
+        'CREATE INDEX idx_test_table_geom ON test.test_table USING gist (geom);\n'
+        'CREATE INDEX idx_test_table_parent_id ON test.test_table USING btree (parent_id);\n'
+    )
+
+
+def test_create_indexes_sql_covering(indexed_table_base):
+    sql = create_indexes_sql(tables(indexed_table_base[0]), if_not_exists=True, covering=True)
+    assert 'CREATE INDEX IF NOT EXISTS idx_test_table_parent_id ON test.test_table USING btree (parent_id) ' \
+        'INCLUDE (law_status, published_from);' in sql
+    assert 'CREATE INDEX IF NOT EXISTS idx_test_table_geom ON test.test_table USING gist (geom);' in sql
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import os
+import sqlite3
+
+import pytest
+
+from pyramid_oereb.contrib.print_proxy.mapfish_print import archive
+from pyramid_oereb.contrib.print_proxy.mapfish_print.archive import PdfArchive, get_pdf_archive, \
+    get_data_version
+
+
+@pytest.fixture
+def metadata():
+    yield {
+        'egrid': 'CH113928077734',
+        'topics': ['ch.Nutzungsplanung', 'ch.Laermempfindlichkeitsstufen'],
+        'language': 'de',
+        'data_version': 'v1',
+        'extract_identifier': '2a2c5e3f'
+    }
+
+
+@pytest.fixture
+def reset_archive():
+    archive.reset()
+    yield
+    archive.reset()
+
+
+def test_get_data_version_ignores_volatile_attributes():
+    spec = {'layout': 'A4 portrait', 'attributes': {
+        'RealEstate_EGRID': 'CH113928077734',
+        'CreationDate': '21.08.2023',
+        'ExtractIdentifier': 'a',
+        'Footer': '21.08.2023   13:48:07   a'
+    }}
+    other = {'layout': 'A4 portrait', 'attributes': {
+        'RealEstate_EGRID': 'CH113928077734',
+        'CreationDate': '22.08.2023',
+        'ExtractIdentifier': 'b',
+        'Footer': '22.08.2023   08:00:00   b'
+    }}
+    assert get_data_version(spec) == get_data_version(other)
+    other['attributes']['RealEstate_EGRID'] = 'CH000000000000'
+    assert get_data_version(spec) != get_data_version(other)
+
+
+def test_archive_submit_and_find(tmp_path, metadata):
+    pdf_archive = PdfArchive(str(tmp_path))
+    pdf_archive.submit(b'%PDF-1', metadata)
+    pdf_archive.flush()
+    topics = list(reversed(metadata['topics']))
+    assert pdf_archive.find('CH113928077734', topics, 'de', 'v1') == b'%PDF-1'
+    assert pdf_archive.find('CH113928077734', topics, 'fr', 'v1') is None
+    assert pdf_archive.find('CH113928077734', topics, 'de', 'v2') is None
+
+
+def test_archive_find_without_egrid(tmp_path, metadata):
+    pdf_archive = PdfArchive(str(tmp_path))
+    pdf_archive.submit(b'%PDF-1', dict(metadata, egrid=None, identdn='BL0200002771', number='70'))
+    pdf_archive.flush()
+    topics = metadata['topics']
+    assert pdf_archive.find(None, topics, 'de', 'v1', identdn='BL0200002771', number='70') == b'%PDF-1'
+    assert pdf_archive.find(None, topics, 'de', 'v1', identdn='BL0200002771', number='71') is None
+    assert pdf_archive.find(None, topics, 'de', 'v1') is None
+
+
+def test_archive_content_addressed(tmp_path, metadata):
+    pdf_archive = PdfArchive(str(tmp_path))
+    pdf_archive.submit(b'%PDF-1', metadata)
+    pdf_archive.submit(b'%PDF-1', dict(metadata, extract_identifier='3b3d6f40'))
+    pdf_archive.flush()
+    files = [f for _, _, names in os.walk(os.path.join(str(tmp_path), 'objects')) for f in names]
+    assert len(files) == 1
+    connection = sqlite3.connect(os.path.join(str(tmp_path), 'index.sqlite'))
+    assert connection.execute('SELECT count(*) FROM archive').fetchone()[0] == 2
+    connection.close()
+
+
+def test_archive_find_max_age(tmp_path, metadata):
+    pdf_archive = PdfArchive(str(tmp_path))
+    pdf_archive.submit(b'%PDF-1', metadata)
+    pdf_archive.flush()
+    assert pdf_archive.find('CH113928077734', metadata['topics'], 'de', 'v1', max_age=-1) is None
+    assert pdf_archive.find('CH113928077734', metadata['topics'], 'de', 'v1', max_age=60) == b'%PDF-1'
+
+
+def test_archive_find_missing_file(tmp_path, metadata):
+    pdf_archive = PdfArchive(str(tmp_path))
+    pdf_archive.submit(b'%PDF-1', metadata)
+    pdf_archive.flush()
+    for directory, _, names in os.walk(os.path.join(str(tmp_path), 'objects')):
+        for name in names:
+            os.remove(os.path.join(directory, name))
+    assert pdf_archive.find('CH113928077734', metadata['topics'], 'de', 'v1') is None
+
+
+def test_get_pdf_archive(tmp_path, reset_archive):
+    assert get_pdf_archive({}) is None
+    print_config = {'archive': {'path': str(tmp_path), 'queue_size': 5}}
+    pdf_archive = get_pdf_archive(print_config)
+    assert pdf_archive is get_pdf_archive(print_config)
+    assert pdf_archive.queue_size == 5
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import threading
+
+import pytest
+
+from pyramid_oereb.contrib.print_proxy.mapfish_print import backpressure
+from pyramid_oereb.contrib.print_proxy.mapfish_print.backpressure import PrintSlots, get_print_slots, \
+    get_print_session, get_print_timeout
+
+
+@pytest.fixture
+def reset_backpressure():
+    backpressure.reset()
+    yield
+    backpressure.reset()
+
+
+def test_print_slots_invalid():
+    with pytest.raises(ValueError):
+        PrintSlots(0)
+
+
+def test_print_slots_acquire_release():
+    slots = PrintSlots(2)
+    assert slots.acquire()
+    assert slots.acquire()
+    assert slots.active == 2
+    slots.release()
+    assert slots.active == 1
+    assert slots.acquire()
+
+
+def test_print_slots_queue_full():
+    slots = PrintSlots(1, max_queued=0)
+    assert slots.acquire()
+    assert not slots.acquire()
+    assert slots.waiting == 0
+
+
+def test_print_slots_queue_timeout():
+    slots = PrintSlots(1, max_queued=1, queue_timeout=0.05)
+    assert slots.acquire()
+    assert not slots.acquire()
+    assert slots.waiting == 0
+
+
+def test_print_slots_queued_job_gets_slot():
+    slots = PrintSlots(1, max_queued=1, queue_timeout=5)
+    assert slots.acquire()
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(slots.acquire()))
+    waiter.start()
+    while slots.waiting == 0 and waiter.is_alive():
+        pass
+    slots.release()
+    waiter.join()
+    assert results == [True]
+    assert slots.active == 1
+
+
+@pytest.mark.parametrize('print_config,expected', [
+    ({}, None),
+    ({'max_concurrent_prints': 0}, None),
+])
+def test_get_print_slots_disabled(reset_backpressure, print_config, expected):
+    assert get_print_slots(print_config) is expected
+
+
+def test_get_print_slots_shared(reset_backpressure):
+    print_config = {'max_concurrent_prints': 3, 'max_queued_prints': 5, 'print_queue_timeout': 1}
+    slots = get_print_slots(print_config)
+    assert slots is get_print_slots(print_config)
+    assert slots.max_concurrent == 3
+    assert slots.max_queued == 5
+    assert slots.queue_timeout == 1
+
+
+def test_get_print_session_shared(reset_backpressure):
+    session = get_print_session({'max_concurrent_prints': 3})
+    assert session is get_print_session({})
+    assert session.get_adapter('http://oereb-print:8080')._pool_maxsize == 3
+
+
+@pytest.mark.parametrize('print_config,expected', [
+    ({}, (10, None)),
+    ({'connect_timeout': 2, 'read_timeout': 60}, (2, 60)),
+])
+def test_get_print_timeout(print_config, expected):
+    assert get_print_timeout(print_config) == expected
@@ -1,10 +1,13 @@
 # -*- coding: utf-8 -*-
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import os
 import io
 import re
 import json
 import codecs
+import threading
+import time
 import pytest
 import responses
 from pypdf import PdfWriter
@@ -13,6 +16,7 @@ from pyramid_oereb.core.records.municipality import MunicipalityRecord
 from tests.mockrequest import MockRequest
 from unittest.mock import patch
 import pyramid_oereb
+from pyramid_oereb.core import coalescing
 from pyramid_oereb.core.config import Config
 from pyramid_oereb.core.records.real_estate_type import RealEstateTypeRecord
 from pyramid_oereb.core.records.logo import LogoRecord
@@ -723,6 +727,30 @@ def test_group_legal_provisions(DummyRenderInfo):
     assert expected_results == renderer.group_legal_provisions(test_legal_provisions)
 
 
+@pytest.mark.parametrize('language,expected', [
+    ('fr', 'Exemple'),
+    ('it', 'Beispiel'),
+])
+def test_multilingual_text(DummyRenderInfo, language, expected):
+    renderer = Renderer(DummyRenderInfo())
+    renderer._language = language
+    renderer._fallback_language = 'de'
+    parent = {'Text': [
+        {'Language': 'de', 'Text': 'Beispiel'},
+        {'Language': 'fr', 'Text': 'Exemple'}
+    ]}
+    renderer._multilingual_text(parent, 'Text')
+    assert parent['Text'] == expected
+
+
+def test_multilingual_text_missing(DummyRenderInfo):
+    renderer = Renderer(DummyRenderInfo())
+    renderer._language = 'it'
+    renderer._fallback_language = 'de'
+    with pytest.raises(KeyError):
+        renderer._multilingual_text({'Text': [{'Language': 'fr', 'Text': 'Exemple'}]}, 'Text')
+
+
 def test_set_global_datetime(DummyRenderInfo):
     renderer = Renderer(DummyRenderInfo())
     date_time = '2023-08-21T13:48:07'
@@ -758,6 +786,49 @@ def test_archive_pdf_identdn(DummyRenderInfo):
     assert os.path.isfile(path_and_filename)
 
 
+def test_coalesced_print_shares_data_version(DummyRenderInfo):
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def print_(renderer, print_config, pdf_url, pdf_headers, spec, extract_as_dict):
+        calls.append(spec['attributes']['ExtractIdentifier'])
+        started.set()
+        release.wait(5)
+        return 'pdf of {}'.format(spec['attributes']['ExtractIdentifier'])
+
+    def coalesced_print(identifier):
+        spec = {'layout': 'A4 portrait', 'attributes': {
+            'RealEstate_EGRID': 'CH113928077734',
+            'CreationDate': '2023-08-21T13:48:07',
+            'ExtractIdentifier': identifier
+        }}
+        return Renderer(DummyRenderInfo())._coalesced_print({}, None, None, spec, spec['attributes'])
+
+    coalescing.reset()
+    try:
+        with (
+            patch.object(Config, 'get', side_effect=lambda key, default=None: {'operations': ['print']}
+                         if key == 'coalescing' else default),
+            patch.object(Renderer, '_print', print_),
+            ThreadPoolExecutor(max_workers=2) as executor
+        ):
+            leader = executor.submit(coalesced_print, 'a')
+            started.wait(5)
+            follower = executor.submit(coalesced_print, 'b')
+            single_flight = coalescing.get_single_flight('print', {'operations': ['print']})
+            deadline = time.time() + 5
+            while time.time() < deadline and not any(
+                    flight.waiting for flight in list(single_flight._flights.values())):
+                threading.Event().wait(0.001)
+            release.set()
+            assert leader.result() == ('pdf of a', False)
+            assert follower.result() == ('pdf of a', True)
+        assert calls == ['a']
+    finally:
+        coalescing.reset()
+
+
 @pytest.fixture
 def mock_responses(dummy_pdf):
     """
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+import datetime
+import json
+import logging
+from unittest.mock import patch
+
+from pyramid.response import Response
+
+from pyramid_oereb.contrib.stats.decorators import log_response
+from pyramid_oereb.core.config import Config
+from pyramid_oereb.core.views.webservice import Parameter, PlrWebservice
+from tests.mockrequest import MockRequest
+
+
+def test_log_response_extract(caplog):
+    params = Parameter('json', egrid='TEST', language='de', topics=['ALL'])
+
+    @log_response
+    def get_extract_by_id(context, request):
+        return PlrWebservice(request).get_extract_by_id()
+
+    request = MockRequest()
+    request.matchdict.update({'format': 'JSON'})
+    request.params.update({'EGRID': 'TEST'})
+    with (
+        patch.object(Config, 'get', return_value=None),
+        patch.object(PlrWebservice, '__validate_extract_params__', return_value=params),
+        patch.object(PlrWebservice, '__render_extract__', return_value=(Response('{}'), None)),
+        caplog.at_level(logging.INFO, logger='JSON')
+    ):
+        response = get_extract_by_id(None, request)
+    assert response.status_int == 200
+    logged = json.loads(caplog.records[-1].getMessage())
+    extras = logged['response']['extras']
+    assert extras['service'] == 'GetExtractById'
+    assert extras['params']['__egrid__'] == 'TEST'
+    assert extras['params']['__reference_date__'] == datetime.date.today().isoformat()
+    assert params.reference_date == datetime.date.today()
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+import json
+import threading
+
+import pytest
+from sqlalchemy import text
+
+from pyramid_oereb.contrib.stats import pipeline as stats_pipeline
+from pyramid_oereb.contrib.stats.decorators import _serialize_request, _serialize_response
+from pyramid_oereb.contrib.stats.pipeline import StatsPipeline, SQLAlchemySink, LoggerSink, \
+    StructuredSink, get_stats_pipeline
+from tests.mockrequest import MockRequest
+
+
+class CollectingSink(object):
+
+    def __init__(self, block=None):
+        self.batches = []
+        self.block = block
+
+    def __call__(self, entries):
+        if self.block is not None:
+            self.block.wait()
+        self.batches.append(list(entries))
+
+
+@pytest.fixture
+def reset_pipeline():
+    stats_pipeline.reset()
+    yield
+    stats_pipeline.reset()
+
+
+def test_pipeline_batches():
+    sink = CollectingSink()
+    pipeline = StatsPipeline(sink, batch_size=3, flush_interval=0.2)
+    for i in range(7):
+        assert pipeline.submit({'i': i})
+    pipeline.flush()
+    assert [len(batch) for batch in sink.batches] == [3, 3, 1]
+    assert pipeline.counters['written'] == 7
+
+
+def test_pipeline_drops_when_full():
+    block = threading.Event()
+    sink = CollectingSink(block)
+    pipeline = StatsPipeline(sink, queue_size=2, batch_size=1, flush_interval=0)
+    pipeline.submit({'i': 0})
+    while pipeline._queue.qsize() > 0:
+        pass
+    # the worker is now blocked in the sink, the queue takes two more entries
+    assert pipeline.submit({'i': 1})
+    assert pipeline.submit({'i': 2})
+    assert not pipeline.submit({'i': 3})
+    block.set()
+    pipeline.flush()
+    assert pipeline.counters['dropped'] == 1
+    assert pipeline.counters['written'] == 3
+
+
+def test_pipeline_sink_failure():
+    def failing_sink(entries):
+        raise RuntimeError('db down')
+    pipeline = StatsPipeline(failing_sink, batch_size=10, flush_interval=0)
+    pipeline.submit({'i': 0})
+    pipeline.flush()
+    assert pipeline.counters['failed'] == 1
+
+
+@pytest.mark.parametrize('sample_rate,expected', [
+    (1.0, True),
+    (0.0, False),
+])
+def test_pipeline_sample(sample_rate, expected):
+    pipeline = StatsPipeline(CollectingSink(), sample_rate=sample_rate)
+    assert pipeline.sample() is expected
+    assert pipeline.counters['sampled_out'] == (0 if expected else 1)
+
+
+def test_sqlalchemy_sink():
+    sink = SQLAlchemySink('sqlite://')
+    sink([{'response': {'status_code': 200}}, {'response': {'status_code': 500}}])
+    with sink.engine.connect() as connection:
+        rows = connection.execute(text('SELECT logger, level, msg FROM logs ORDER BY id')).fetchall()
+    assert [(row[0], row[1]) for row in rows] == [('JSON', 'INFO'), ('JSON', 'INFO')]
+    assert json.loads(rows[1][2]) == {'response': {'status_code': 500}}
+
+
+def _extract_entry(status_code, output_format, duration, timestamp=1692618487.0):
+    return {
+        'response': {
+            'status_code': status_code,
+            'headers': {},
+            'extras': {
+                'service': 'GetExtractById',
+                'output_format': output_format,
+                'params': {
+                    '__egrid__': 'CH113928077734',
+                    '__topics__': ['ch.Nutzungsplanung', 'ch.Waldgrenzen']
+                }
+            }
+        },
+        'request': {'path': '/oereb/extract/{}/'.format(output_format)},
+        'time': timestamp,
+        'duration': duration
+    }
+
+
+def test_structured_sink():
+    sink = StructuredSink('sqlite://')
+    sink([_extract_entry(200, 'pdf', 2.0), _extract_entry(200, 'pdf', 3.0), _extract_entry(200, 'json', 0.5)])
+    sink([_extract_entry(200, 'pdf', 1.0)])
+    with sink.engine.connect() as connection:
+        rows = connection.execute(
+            text('SELECT service, status, format, egrid, topics, duration FROM stats_requests ORDER BY id')
+        ).fetchall()
+        daily = connection.execute(
+            text('SELECT format, nb_requests, total_duration, max_duration FROM stats_daily ORDER BY format')
+        ).fetchall()
+    assert len(rows) == 4
+    assert tuple(rows[0]) == ('GetExtractById', 200, 'pdf', 'CH113928077734',
+                              'ch.Nutzungsplanung,ch.Waldgrenzen', 2.0)
+    assert [tuple(row) for row in daily] == [('json', 1, 0.5, 0.5), ('pdf', 3, 6.0, 3.0)]
+
+
+def test_structured_sink_to_row_without_extras():
+    row = StructuredSink.to_row({'response': {'status_code': 404, 'extras': None}, 'request': {'path': '/x'}})
+    assert row['status'] == 404
+    assert row['service'] is None
+    assert row['path'] == '/x'
+
+
+def test_logger_sink(caplog):
+    with caplog.at_level('INFO', logger='JSON'):
+        LoggerSink()([{'a': 1}])
+    assert caplog.records[0].getMessage() == '{"a": 1}'
+
+
+def test_get_stats_pipeline(reset_pipeline):
+    assert get_stats_pipeline(None) is None
+    stats_config = {'queue_size': 10, 'sample_rate': 0.5}
+    pipeline = get_stats_pipeline(stats_config)
+    assert pipeline is get_stats_pipeline(stats_config)
+    assert pipeline.queue_size == 10
+    assert pipeline.sample_rate == 0.5
+    assert isinstance(pipeline.sink, LoggerSink)
+
+
+def test_serialize_header_whitelist():
+    request = MockRequest()
+    request.headers.update({'User-Agent': 'test', 'Cookie': 'secret'})
+    serialized = _serialize_request(request, ['user-agent'])
+    assert serialized['request']['headers'] == {'User-Agent': 'test'}
+
+    class Response(object):
+        status_code = 200
+        headers = {'Content-Type': 'image/png', 'Set-Cookie': 'secret'}
+    serialized = _serialize_response(Response(), ['Content-Type'])
+    assert serialized['response'] == {
+        'status_code': 200,
+        'headers': {'Content-Type': 'image/png'},
+        'extras': None
+    }
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+import sys
+from unittest.mock import MagicMock
+
+import pytest
+from geoalchemy2 import Geometry
+from sqlalchemy import Column, String
+from sqlalchemy.orm import declarative_base
+
+from pyramid_oereb.contrib.data_sources.cluster_tables import cluster_statements, cluster_tables, \
+    cluster_tables_, geometry_column, geometry_columns
+
+
+@pytest.fixture
+def geometry_table():
+    base = declarative_base()
+
+    class Test(base):
+        __table_args__ = {'schema': 'test'}
+        __tablename__ = 'geometry'
+        id = Column(String, primary_key=True)
+        law_status = Column(String)
+        geom = Column(Geometry('POLYGON', srid=2056))
+
+    yield Test.__table__
+
+
+@pytest.fixture
+def multi_geometry_table():
+    base = declarative_base()
+
+    class Test(base):
+        __table_args__ = {'schema': 'test'}
+        __tablename__ = 'geometrie'
+        t_id = Column(String, primary_key=True)
+        punkt = Column(Geometry('POINT', srid=2056))
+        flaeche = Column(Geometry('POLYGON', srid=2056))
+
+    yield Test.__table__
+
+
+def test_geometry_columns(geometry_table, multi_geometry_table):
+    assert [column.name for column in geometry_columns(geometry_table)] == ['geom']
+    assert [column.name for column in geometry_columns(multi_geometry_table)] == ['punkt', 'flaeche']
+
+
+def test_cluster_statements_geohash(geometry_table):
+    assert cluster_statements(geometry_table) == [
+        'CREATE INDEX idx_geometry_cluster ON test.geometry '
+        '(ST_GeoHash(ST_Transform(ST_Centroid(geom), 4326)));',
+        'CLUSTER test.geometry USING idx_geometry_cluster;',
+        'DROP INDEX test.idx_geometry_cluster;',
+        'ANALYZE test.geometry;'
+    ]
+
+
+def test_geometry_column(geometry_table, multi_geometry_table):
+    connection = MagicMock()
+    assert geometry_column(connection, geometry_table).name == 'geom'
+    connection.execute.assert_not_called()
+    connection.execute.return_value.one.return_value = (12, 3400)
+    assert geometry_column(connection, multi_geometry_table).name == 'flaeche'
+
+
+def test_cluster_statements_geohash_without_schema():
+    base = declarative_base()
+
+    class Test(base):
+        __tablename__ = 'geometry'
+        id = Column(String, primary_key=True)
+        geom = Column(Geometry('POLYGON', srid=2056))
+
+    assert cluster_statements(Test.__table__)[2] == 'DROP INDEX idx_geometry_cluster;'
+
+
+def test_cluster_statements_geohash_multi(multi_geometry_table):
+    assert cluster_statements(multi_geometry_table)[0] == \
+        'CREATE INDEX idx_geometrie_cluster ON test.geometrie ' \
+        '(ST_GeoHash(ST_Transform(ST_Centroid(COALESCE(punkt, flaeche)), 4326)));'
+
+
+def test_cluster_statements_gist(geometry_table):
+    assert cluster_statements(geometry_table, 'gist', 'geometry_geom_idx') == [
+        'CLUSTER test.geometry USING geometry_geom_idx;',
+        'ANALYZE test.geometry;'
+    ]
+
+
+def test_cluster_statements_gist_missing(geometry_table):
+    assert cluster_statements(geometry_table, 'gist') == [
+        'CREATE INDEX IF NOT EXISTS idx_geometry_geom ON test.geometry USING gist (geom);',
+        'CLUSTER test.geometry USING idx_geometry_geom;',
+        'ANALYZE test.geometry;'
+    ]
+
+
+def test_cluster_statements_gist_column(multi_geometry_table):
+    column = multi_geometry_table.columns['flaeche']
+    assert cluster_statements(multi_geometry_table, 'gist', column=column)[:2] == [
+        'CREATE INDEX IF NOT EXISTS idx_geometrie_flaeche ON test.geometrie USING gist (flaeche);',
+        'CLUSTER test.geometrie USING idx_geometrie_flaeche;'
+    ]
+
+
+def test_cluster_statements_unknown(geometry_table):
+    with pytest.raises(ValueError):
+        cluster_statements(geometry_table, 'hilbert')
+
+
+def test_cluster_tables_unknown():
+    with pytest.raises(ValueError):
+        cluster_tables_(method='hilbert')
+
+
+def test_call_help():
+    sys.argv = ['', '-h']
+    with pytest.raises(SystemExit) as code:
+        cluster_tables()
+    assert code.value.code == 0
+
+
+def test_call_config_missing():
+    sys.argv = ['']
+    with pytest.raises(SystemExit) as code:
+        cluster_tables()
+    assert code.value.code == 2
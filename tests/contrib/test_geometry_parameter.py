@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+from shapely.geometry import Polygon
+from sqlalchemy.dialects import postgresql
+
+from pyramid_oereb.contrib import geometry_parameter
+
+
+def test_geometry_parameter():
+    geometry = Polygon([(0, 0), (1, 1), (1, 0)])
+    expression = geometry_parameter(geometry, 2056)
+    assert geometry_parameter(geometry, 2056) is expression
+    assert geometry_parameter(geometry, 21781) is not expression
+    assert geometry_parameter(Polygon([(0, 0), (1, 1), (1, 0)]), 2056) is not expression
+    compiled = expression.compile(dialect=postgresql.dialect())
+    assert str(compiled) == 'ST_GeomFromWKB(%(geometry_1)s, 2056)'
+    assert compiled.params['geometry_1'] == geometry.wkb
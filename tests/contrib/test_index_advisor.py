@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+import sys
+
+import pytest
+from sqlalchemy import Column, ForeignKey, String
+from sqlalchemy.orm import declarative_base
+
+from pyramid_oereb.contrib.data_sources.index_advisor import advise_indexes, missing_indexes, \
+    sequential_scans
+
+
+@pytest.fixture
+def indexed_tables():
+    base = declarative_base()
+
+    class Parent(base):
+        __table_args__ = {'schema': 'test'}
+        __tablename__ = 'parent'
+        id = Column(String, primary_key=True)
+        law_status = Column(String)
+
+    class Child(base):
+        __table_args__ = {'schema': 'test'}
+        __tablename__ = 'child'
+        id = Column(String, primary_key=True)
+        parent_id = Column(String, ForeignKey(Parent.id))
+
+    yield base.metadata.sorted_tables
+
+
+def test_missing_indexes(indexed_tables):
+    missing = missing_indexes(indexed_tables, {'test.parent': [('id',)], 'test.child': [('id',)]})
+    assert [index['name'] for index in missing] == ['idx_parent_law_status', 'idx_child_parent_id']
+
+
+def test_missing_indexes_existing(indexed_tables):
+    missing = missing_indexes(indexed_tables, {
+        'test.parent': [('id',), ('law_status',)],
+        'test.child': [('id',)]
+    })
+    assert [index['name'] for index in missing] == ['idx_child_parent_id']
+
+
+def test_missing_indexes_missing_table(indexed_tables):
+    assert missing_indexes(indexed_tables, {'test.parent': [('id',), ('law_status',)]}) == []
+
+
+def test_missing_indexes_covering_without_include():
+    base = declarative_base()
+
+    class Parent(base):
+        __table_args__ = {'schema': 'test'}
+        __tablename__ = 'parent'
+        id = Column(String, primary_key=True)
+
+    class Child(base):
+        __table_args__ = {'schema': 'test'}
+        __tablename__ = 'child'
+        id = Column(String, primary_key=True)
+        parent_id = Column(String, ForeignKey(Parent.id))
+        law_status = Column(String)
+
+    tables_to_check = base.metadata.sorted_tables
+    existing = {
+        'test.parent': [('id',)],
+        'test.child': [('id',), ('law_status',), ('parent_id',)]
+    }
+    assert missing_indexes(tables_to_check, existing) == []
+    missing = missing_indexes(tables_to_check, existing, covering=True)
+    assert [(index['name'], index['include']) for index in missing] == [
+        ('idx_child_parent_id', ['law_status'])
+    ]
+    existing['test.child'].append(('parent_id', 'law_status'))
+    assert missing_indexes(tables_to_check, existing, covering=True) == []
+
+
+def test_sequential_scans():
+    plan = {
+        'Node Type': 'Nested Loop',
+        'Plans': [
+            {
+                'Node Type': 'Seq Scan',
+                'Schema': 'test',
+                'Relation Name': 'child',
+                'Actual Rows': 10,
+                'Rows Removed by Filter': 5000
+            },
+            {
+                'Node Type': 'Seq Scan',
+                'Schema': 'test',
+                'Relation Name': 'parent',
+                'Actual Rows': 10
+            },
+            {
+                'Node Type': 'Index Scan',
+                'Schema': 'test',
+                'Relation Name': 'geometry',
+                'Actual Rows': 100000
+            }
+        ]
+    }
+    assert sequential_scans(plan) == [{'relation': 'test.child', 'rows': 5010}]
+    assert len(sequential_scans(plan, min_rows=10)) == 2
+
+
+def test_sequential_scans_estimated():
+    plan = {'Node Type': 'Seq Scan', 'Schema': 'test', 'Relation Name': 'child', 'Plan Rows': 2000}
+    assert sequential_scans(plan) == [{'relation': 'test.child', 'rows': 2000}]
+
+
+def test_call_help():
+    sys.argv = ['', '-h']
+    with pytest.raises(SystemExit) as code:
+        advise_indexes()
+    assert code.value.code == 0
+
+
+def test_call_config_missing():
+    sys.argv = ['']
+    with pytest.raises(SystemExit) as code:
+        advise_indexes()
+    assert code.value.code == 2
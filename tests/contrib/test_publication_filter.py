@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+
+from sqlalchemy import Column, Date, Integer, String
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import declarative_base
+
+from pyramid_oereb.contrib import document_filter, get_reference_date, published_filter
+from pyramid_oereb.core.views.webservice import Parameter
+
+Base = declarative_base()
+
+
+class Document(Base):
+    __tablename__ = 'document'
+    id = Column(String, primary_key=True)
+    published_from = Column(Date, nullable=False)
+    published_until = Column(Date, nullable=True)
+    only_in_municipality = Column(Integer, nullable=True)
+
+
+def test_get_reference_date():
+    params = Parameter('json')
+    assert get_reference_date(params) == params.reference_date == date.today()
+    assert get_reference_date(None) == date.today()
+
+
+def test_published_filter():
+    compiled = published_filter(Document, date(2024, 1, 1)).compile(dialect=postgresql.dialect())
+    assert str(compiled) == (
+        'document.published_from <= %(published_from_1)s::DATE AND '
+        '(document.published_until IS NULL OR document.published_until >= %(published_until_1)s::DATE)'
+    )
+    assert compiled.params == {'published_from_1': date(2024, 1, 1), 'published_until_1': date(2024, 1, 1)}
+
+
+def test_document_filter():
+    compiled = document_filter(Document, date(2024, 1, 1), 1234).compile(dialect=postgresql.dialect())
+    assert str(compiled).endswith(
+        'AND (document.only_in_municipality IS NULL OR '
+        'document.only_in_municipality = %(only_in_municipality_1)s::INTEGER)'
+    )
+    assert compiled.params['only_in_municipality_1'] == 1234
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+import pytest
+import shapely
+from geoalchemy2.elements import WKBElement, WKTElement
+from shapely.geometry import LineString, Point, Polygon
+
+from pyramid_oereb.contrib import to_shapes
+
+
+def test_to_shapes():
+    polygon = Polygon([(0, 0), (1, 1), (1, 0)])
+    point = Point(1, 2)
+    line = LineString([(0, 0), (2, 2)])
+    ewkb = shapely.to_wkb(shapely.set_srid(polygon, 2056), include_srid=True)
+    shapes = to_shapes([
+        WKBElement(memoryview(ewkb), srid=2056, extended=True),
+        None,
+        WKBElement(shapely.to_wkb(point, hex=True)),
+        WKTElement(line.wkt, srid=2056)
+    ])
+    assert len(shapes) == 4
+    assert shapes[0].equals(polygon)
+    assert shapely.get_srid(shapes[0]) == 2056
+    assert shapes[1] is None
+    assert shapes[2].equals(point)
+    assert shapes[3].equals(line)
+
+
+def test_to_shapes_empty():
+    assert to_shapes(iter([])) == []
+    assert to_shapes([None]) == [None]
+
+
+def test_to_shapes_unsupported():
+    with pytest.raises(TypeError):
+        to_shapes(['POINT (1 2)'])
@@ -72,3 +72,27 @@ def test_read(main_schema, land_use_plans, contaminated_sites, plr_sources, plr_
     assert isinstance(plrs[0], PlrRecord)
     assert plrs[3].theme.code == 'ch.BelasteteStandorte'
     assert plrs[3].law_status.code == 'inForce'
+
+
+def test_prefetch_by_source_class():
+    from pyramid_oereb.core.readers.extract import ExtractReader
+    from pyramid_oereb.core.sources.plr import PlrBaseSource
+
+    calls = []
+
+    class Source(PlrBaseSource):
+        @classmethod
+        def prefetch(cls, sources, params, real_estate, bbox):
+            calls.append((cls, [source.info['code'] for source in sources]))
+
+    class OtherSource(Source):
+        pass
+
+    class SourceWithoutPrefetch(object):
+        pass
+
+    ExtractReader._prefetch(
+        [Source(code='a'), OtherSource(code='b'), Source(code='c'), SourceWithoutPrefetch()],
+        MockParameter(), None, None
+    )
+    assert calls == [(Source, ['a', 'c']), (OtherSource, ['b'])]
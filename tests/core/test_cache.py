@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+import datetime
+import os
+import uuid
+
+import pytest
+from pyramid.response import Response
+
+from pyramid_oereb.core import cache
+from pyramid_oereb.core.cache import CacheEntry, DiskBackend, ExtractCache, MemoryBackend, ResponseCache, \
+    get_extract_cache, get_response_cache
+from pyramid_oereb.core.data_version import DataVersion, get_data_version
+from pyramid_oereb.core.config import Config
+from pyramid_oereb.core.records.data_integration import DataIntegrationRecord
+from pyramid_oereb.core.views.webservice import Parameter
+
+
+class _Reader(object):
+
+    def __init__(self, records):
+        self.records = records
+
+    def read(self):
+        return self.records
+
+
+class _Extract(object):
+
+    def __init__(self):
+        self.creation_date = datetime.datetime(2024, 3, 1, 10, 30, 0)
+        self.extract_identifier = str(uuid.uuid4())
+
+
+@pytest.fixture
+def plr_config(monkeypatch):
+    monkeypatch.setattr(Config, '_config', {'plrs': [{'code': 'ch.A'}, {'code': 'ch.B'}]})
+
+
+def _record(theme_code, checksum):
+    return DataIntegrationRecord(datetime.datetime(2024, 1, 1), checksum=checksum,
+                                 theme_identifier=theme_code, office_identifier=1)
+
+
+def _entry(body=b'body', themes=None, created=None):
+    return CacheEntry(body, 'application/json', themes, '2024-03-01T10:30:00', 'id', created)
+
+
+def test_memory_backend_lru():
+    backend = MemoryBackend(max_entries=2)
+    backend.set('a', _entry())
+    backend.set('b', _entry())
+    assert backend.get('a') is not None
+    backend.set('c', _entry())
+    assert backend.get('b') is None
+    assert backend.get('a') is not None
+    assert len(backend) == 2
+
+
+def test_memory_backend_max_bytes():
+    backend = MemoryBackend(max_entries=None, max_bytes=10)
+    backend.set('a', _entry(b'12345'))
+    backend.set('b', _entry(b'12345'))
+    backend.set('c', _entry(b'123'))
+    assert backend.get('a') is None
+    assert backend.get('c') is not None
+    backend.set('d', _entry(b'12345678901'))
+    assert backend.get('d') is None
+
+
+def test_memory_backend_ttl():
+    backend = MemoryBackend(ttl=60)
+    backend.set('old', _entry(created=0))
+    backend.set('new', _entry())
+    assert backend.get('old') is None
+    assert backend.get('new') is not None
+
+
+def test_memory_backend_invalidate():
+    backend = MemoryBackend()
+    backend.set('all', _entry())
+    backend.set('a', _entry(themes=['ch.A']))
+    backend.set('b', _entry(themes=['ch.B']))
+    backend.invalidate('ch.A')
+    assert [backend.get(key) is not None for key in ['all', 'a', 'b']] == [False, False, True]
+    backend.invalidate()
+    assert len(backend) == 0
+
+
+def test_disk_backend(tmpdir):
+    backend = DiskBackend(str(tmpdir), ttl=60)
+    backend.set('a', _entry(b'{"a": 1}\n', themes=['ch.A']))
+    entry = DiskBackend(str(tmpdir)).get('a')
+    assert entry.body == b'{"a": 1}\n'
+    assert entry.themes == ['ch.A']
+    assert entry.content_type == 'application/json'
+    backend.set('old', _entry(created=0))
+    assert backend.get('old') is None
+    assert backend.get('missing') is None
+    backend.invalidate('ch.A')
+    assert backend.get('a') is None
+    assert len(backend) == 0
+
+
+def test_disk_backend_prune(tmpdir):
+    backend = DiskBackend(str(tmpdir), max_entries=2)
+    for key in ['a', 'b', 'c']:
+        backend.set(key, _entry())
+        os.utime(os.path.join(str(tmpdir), '{}.cache'.format(key)), (ord(key), ord(key)))
+    backend.set('d', _entry())
+    assert backend.get('a') is None
+    assert backend.get('b') is None
+    assert len(backend) == 2
+
+
+def test_response_cache_key(plr_config):
+    response_cache = ResponseCache(MemoryBackend(), DataVersion())
+    params = Parameter('json', egrid='CH1', language='de')
+    key, themes = response_cache.key(params, 'http://example.com')
+    assert themes is None
+    assert key == response_cache.key(Parameter('json', egrid='CH1', language='de'), 'http://example.com')[0]
+    assert key != response_cache.key(Parameter('xml', egrid='CH1', language='de'), 'http://example.com')[0]
+    assert key != response_cache.key(Parameter('json', egrid='CH1', language='fr'), 'http://example.com')[0]
+    assert key != response_cache.key(Parameter('json', egrid='CH1', language='de'), 'http://other.com')[0]
+    assert key != response_cache.key(
+        Parameter('json', with_geometry=True, egrid='CH1', language='de'), 'http://example.com'
+    )[0]
+    tomorrow = Parameter('json', egrid='CH1', language='de')
+    tomorrow.__reference_date__ = (datetime.date.today() + datetime.timedelta(days=1)).isoformat()
+    assert key != response_cache.key(tomorrow, 'http://example.com')[0]
+    _, themes = response_cache.key(Parameter('json', egrid='CH1', topics=['ch.B']), 'http://example.com')
+    assert themes == ['ch.B']
+    assert response_cache.accepts(params)
+    assert not response_cache.accepts(Parameter('pdf', egrid='CH1'))
+
+
+def test_response_cache_per_theme(plr_config):
+    reader = _Reader([_record('ch.A', '1'), _record('ch.B', '1')])
+    response_cache = ResponseCache(MemoryBackend(), DataVersion(reader, refresh=0))
+    params_a = Parameter('json', egrid='CH1', topics=['ch.A'])
+    params_b = Parameter('json', egrid='CH1', topics=['ch.B'])
+    for params in [params_a, params_b]:
+        key, themes = response_cache.key(params, 'http://example.com')
+        response_cache.set(key, themes, Response(body=b'{}'), _Extract())
+    reader.records = [_record('ch.A', '1'), _record('ch.B', '2')]
+    assert response_cache.get(response_cache.key(params_a, 'http://example.com')[0]) is not None
+    assert response_cache.get(response_cache.key(params_b, 'http://example.com')[0]) is None
+    assert len(response_cache.backend) == 1
+
+
+def test_response_cache_fresh_identifier(plr_config):
+    extract = _Extract()
+    body = '{{"CreationDate": "2024-03-01T10:30:00", "ExtractIdentifier": "{}"}}'.format(
+        extract.extract_identifier
+    ).encode('utf-8')
+    response = Response(body=body)
+    response.headers['Content-Type'] = 'application/json; charset=UTF-8'
+    for fresh_identifier in [True, False]:
+        response_cache = ResponseCache(MemoryBackend(), DataVersion(), fresh_identifier=fresh_identifier)
+        response_cache.set('key', None, response, extract)
+        entry = response_cache.get('key')
+        assert entry.content_type == 'application/json; charset=UTF-8'
+        assert (entry.body == body) is not fresh_identifier
+        assert (extract.extract_identifier.encode('utf-8') in entry.body) is not fresh_identifier
+        assert (b'"2024-03-01T10:30:00"' in entry.body) is not fresh_identifier
+        assert entry.extract_identifier.encode('utf-8') in entry.body
+
+
+def test_response_cache_fresh_identifier_xml(plr_config):
+    extract = _Extract()
+    body = '<data:CreationDate>2024-03-01T10:30:00</data:CreationDate>' \
+        '<data:ExtractIdentifier>{}</data:ExtractIdentifier>'.format(
+            extract.extract_identifier
+        ).encode('utf-8')
+    response_cache = ResponseCache(MemoryBackend(), DataVersion())
+    response_cache.set('key', None, Response(body=body, content_type='application/xml'), extract)
+    entry = response_cache.get('key')
+    assert '<data:CreationDate>{}</data:CreationDate>'.format(
+        entry.creation_date
+    ).encode('utf-8') in entry.body
+    assert '<data:ExtractIdentifier>{}</data:ExtractIdentifier>'.format(
+        entry.extract_identifier
+    ).encode('utf-8') in entry.body
+
+
+def test_get_response_cache(plr_config, tmpdir):
+    cache.reset()
+    assert get_response_cache(None) is None
+    response_cache = get_response_cache({'backend': 'disk', 'path': str(tmpdir), 'ttl': 60})
+    assert isinstance(response_cache.backend, DiskBackend)
+    assert response_cache.backend.ttl == 60
+    assert get_response_cache({'backend': 'memory'}) is response_cache
+    cache.reset()
+    response_cache = get_response_cache({'max_entries': 10, 'fresh_identifier': False})
+    assert isinstance(response_cache.backend, MemoryBackend)
+    assert response_cache.backend.max_entries == 10
+    assert not response_cache.fresh_identifier
+    cache.reset()
+
+
+class _RealEstate(object):
+    egrid = 'CH1'
+    number = '1'
+    identdn = 'BL0200002829'
+
+
+def test_extract_cache(plr_config):
+    extract_cache = ExtractCache(MemoryBackend(), DataVersion())
+    params = Parameter('json', egrid='CH1', language='de', extract_url='http://example.com/extract/json')
+    key, themes = extract_cache.key(_RealEstate(), params)
+    assert themes is None
+    assert extract_cache.get(key, params) is None
+    extract = _Extract()
+    extract.real_estate = ['plr']
+    extract_cache.set(key, themes, extract)
+    extract.real_estate.append('changed')
+    pdf_params = Parameter('pdf', egrid='CH1', language='fr', extract_url='http://example.com/extract/pdf')
+    assert extract_cache.key(_RealEstate(), pdf_params)[0] == key
+    cached = extract_cache.get(key, pdf_params)
+    assert cached.real_estate == ['plr']
+    assert cached.extract_identifier != extract.extract_identifier
+    assert cached.creation_date > extract.creation_date
+    assert cached.qr_code_ref == pdf_params.qr_code_ref
+    assert cached.qr_code.content == pdf_params.qr_code
+    cached.real_estate.append('changed')
+    assert extract_cache.get(key, params).real_estate == ['plr']
+
+
+def test_extract_cache_key(plr_config, monkeypatch):
+    extract_cache = ExtractCache(MemoryBackend(), DataVersion())
+    key_de = extract_cache.key(_RealEstate(), Parameter('json', egrid='CH1', language='de'))[0]
+    key_fr = extract_cache.key(_RealEstate(), Parameter('json', egrid='CH1', language='fr'))[0]
+    assert key_de == key_fr
+    key, themes = extract_cache.key(_RealEstate(), Parameter('json', egrid='CH1', topics=['ch.A']))
+    assert key != key_de
+    assert themes == ['ch.A']
+    params = Parameter('json', egrid='CH1', language='de')
+    params.__reference_date__ = (datetime.date.today() + datetime.timedelta(days=1)).isoformat()
+    assert extract_cache.key(_RealEstate(), params)[0] != key_de
+    monkeypatch.setitem(Config._config, 'oereblex', {'host': 'http://oereblex.example.com'})
+    key_de = extract_cache.key(_RealEstate(), Parameter('json', egrid='CH1', language='de'))[0]
+    key_fr = extract_cache.key(_RealEstate(), Parameter('json', egrid='CH1', language='fr'))[0]
+    assert key_de != key_fr
+
+
+def test_get_extract_cache(plr_config):
+    cache.reset()
+    assert get_extract_cache(None) is None
+    extract_cache = get_extract_cache({'max_entries': 10, 'ttl': 600})
+    assert extract_cache.backend.max_entries == 10
+    assert extract_cache.backend.ttl == 600
+    assert extract_cache.data_version is get_data_version()
+    assert get_extract_cache({'max_entries': 20}) is extract_cache
+    assert get_response_cache({'backend': 'memory'}).data_version is extract_cache.data_version
+    cache.reset()
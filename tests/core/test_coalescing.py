@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from pyramid_oereb.core import coalescing
+from pyramid_oereb.core.coalescing import SingleFlight, get_single_flight, render_metrics
+
+
+def _wait_for_followers(single_flight, key, count):
+    while True:
+        with single_flight._lock:
+            flight = single_flight._flights.get(key)
+            if flight is not None and flight.waiting == count:
+                return
+        threading.Event().wait(0.001)
+
+
+def _coalesce(single_flight, function, followers=3, share=None):
+    started = threading.Event()
+    release = threading.Event()
+
+    def leader():
+        started.set()
+        release.wait(5)
+        return function()
+
+    with ThreadPoolExecutor(max_workers=followers + 1) as executor:
+        first = executor.submit(single_flight.do, 'key', leader, share)
+        started.wait(5)
+        others = [executor.submit(single_flight.do, 'key', function, share) for _ in range(followers)]
+        _wait_for_followers(single_flight, 'key', followers)
+        release.set()
+        return first, others
+
+
+def test_single_flight_shares_result():
+    single_flight = SingleFlight('process')
+    calls = []
+
+    def function():
+        calls.append(1)
+        return ['result']
+
+    first, others = _coalesce(single_flight, function)
+    result, shared = first.result()
+    assert result == ['result']
+    assert not shared
+    assert all(other.result() == (['result'], True) for other in others)
+    assert len(calls) == 1
+    assert single_flight.counts == {'leader': 1, 'coalesced': 3}
+
+
+def test_single_flight_share_copies():
+    single_flight = SingleFlight('process')
+    first, others = _coalesce(single_flight, lambda: ['result'], followers=2,
+                              share=lambda result: result + ['copy'])
+    result, _ = first.result()
+    results = [other.result()[0] for other in others]
+    assert results == [['result', 'copy'], ['result', 'copy']]
+    assert result == ['result']
+    assert all(copy is not result for copy in results)
+
+
+def test_single_flight_error():
+    single_flight = SingleFlight('print')
+
+    def function():
+        raise ValueError('failed')
+
+    first, others = _coalesce(single_flight, function, followers=2)
+    for future in [first] + others:
+        with pytest.raises(ValueError):
+            future.result()
+    assert single_flight._flights == {}
+
+
+def test_single_flight_timeout():
+    single_flight = SingleFlight('print', timeout=0.01)
+    release = threading.Event()
+
+    def slow():
+        release.wait(5)
+        return 'slow'
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        first = executor.submit(single_flight.do, 'key', slow)
+        _wait_for_followers(single_flight, 'key', 0)
+        assert single_flight.do('key', lambda: 'own') == ('own', False)
+        release.set()
+        assert first.result() == ('slow', False)
+    assert single_flight.counts == {'leader': 1, 'timeout': 1}
+
+
+def test_single_flight_sequential_calls():
+    single_flight = SingleFlight('process')
+    assert single_flight.do('key', lambda: 1) == (1, False)
+    assert single_flight.do('key', lambda: 2) == (2, False)
+    assert single_flight.counts == {'leader': 2}
+
+
+def test_get_single_flight():
+    coalescing.reset()
+    assert get_single_flight('process', None) is None
+    single_flight = get_single_flight('process', {'timeout': 5})
+    assert single_flight.timeout == 5
+    assert get_single_flight('process', {'timeout': 10}) is single_flight
+    assert get_single_flight('print', {'operations': ['process']}) is None
+    single_flight.do('key', lambda: None)
+    assert 'pyramid_oereb_coalesced_requests_total{operation="process",role="leader"} 1' in render_metrics()
+    coalescing.reset()
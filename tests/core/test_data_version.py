@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+import datetime
+import threading
+
+import pytest
+
+from pyramid_oereb.core import data_version
+from pyramid_oereb.core.config import Config
+from pyramid_oereb.core.data_version import DataVersion, get_data_version
+from pyramid_oereb.core.records.data_integration import DataIntegrationRecord
+
+
+class _Reader(object):
+
+    def __init__(self, records):
+        self.records = records
+        self.reads = 0
+        self.read_event = threading.Event()
+
+    def read(self):
+        self.reads += 1
+        self.read_event.set()
+        if isinstance(self.records, Exception):
+            raise self.records
+        return self.records
+
+
+@pytest.fixture
+def plr_config(monkeypatch):
+    monkeypatch.setattr(Config, '_config', {'plrs': [{'code': 'ch.A'}, {'code': 'ch.B'}]})
+
+
+def _record(theme_code, checksum):
+    return DataIntegrationRecord(datetime.datetime(2024, 1, 1), checksum=checksum,
+                                 theme_identifier=theme_code, office_identifier=1)
+
+
+def test_data_version(plr_config):
+    reader = _Reader([_record('ch.A', '1'), _record('ch.B', '1')])
+    version = DataVersion(reader, refresh=0)
+    changed = []
+    version.subscribe(changed.append)
+    digest_a = version.digest(['ch.A'])
+    digest_b = version.digest(['ch.B'])
+    token = version.token()
+    assert version.theme_version('ch.A') == '2024-01-01T00:00:00/1'
+    assert version.theme_version('ch.C') is None
+    reader.records = [_record('ch.A', '2'), _record('ch.B', '1')]
+    assert version.digest(['ch.A']) != digest_a
+    assert version.digest(['ch.B']) == digest_b
+    assert version.token() != token
+    assert changed == ['ch.A']
+
+
+def test_data_version_without_reader(plr_config):
+    version = DataVersion()
+    assert version.themes() == {}
+    assert version.digest(['ch.A']) == DataVersion().digest(['ch.A'])
+    assert version.token() == DataVersion().token()
+
+
+def test_data_version_refresh(plr_config):
+    reader = _Reader([_record('ch.A', '1')])
+    version = DataVersion(reader, refresh=3600)
+    version.themes()
+    version.themes()
+    assert reader.reads == 1
+
+
+def test_data_version_read_error(plr_config):
+    reader = _Reader([_record('ch.A', '1')])
+    version = DataVersion(reader, refresh=0)
+    failing = []
+
+    def fail(theme_code):
+        failing.append(theme_code)
+        raise RuntimeError('failed')
+
+    changed = []
+    version.subscribe(fail)
+    version.subscribe(changed.append)
+    version.themes()
+    reader.records = RuntimeError('unavailable')
+    assert version.theme_version('ch.A') == '2024-01-01T00:00:00/1'
+    reader.records = [_record('ch.A', '2')]
+    version.themes()
+    assert failing == ['ch.A']
+    assert changed == ['ch.A']
+
+
+def test_data_version_poll(plr_config):
+    reader = _Reader([_record('ch.A', '1')])
+    version = DataVersion(reader, refresh=0.01, poll=True)
+    changed = threading.Event()
+    version.subscribe(lambda theme_code: changed.set())
+    version.start()
+    try:
+        assert version.theme_version('ch.A') == '2024-01-01T00:00:00/1'
+        reader.records = [_record('ch.A', '2')]
+        assert changed.wait(5)
+        assert version.theme_version('ch.A') == '2024-01-01T00:00:00/2'
+    finally:
+        version.stop()
+    assert version._thread is None
+
+
+def test_get_data_version(plr_config, monkeypatch):
+    data_version.reset()
+    version = get_data_version()
+    assert version.refresh == 60
+    assert not version.poll
+    assert get_data_version() is version
+    data_version.reset()
+    monkeypatch.setitem(Config._config, 'data_version', {'refresh': 5, 'poll': True})
+    assert get_data_version().refresh == 5
+    data_version.reset()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import os
+import pstats
+import time
+
+from pyramid.testing import DummyRequest
+
+from pyramid_oereb.core import profiling
+from pyramid_oereb.core.profiling import ExtractProfiler, PROFILE_HEADER, get_extract_profiler
+
+
+def _busy(seconds):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        pass
+
+
+def test_should_profile_every(tmpdir):
+    profiler = ExtractProfiler(str(tmpdir), every=3)
+    assert [profiler.should_profile(DummyRequest()) for _ in range(6)] == [
+        False, False, True, False, False, True
+    ]
+
+
+def test_should_profile_disabled(tmpdir):
+    profiler = ExtractProfiler(str(tmpdir))
+    assert not profiler.should_profile(DummyRequest())
+
+
+def test_should_profile_secret(tmpdir):
+    profiler = ExtractProfiler(str(tmpdir), secret='s3cret')
+    request = DummyRequest(headers={PROFILE_HEADER: 's3cret'})
+    assert profiler.should_profile(request)
+    assert PROFILE_HEADER not in request.headers
+    assert not profiler.should_profile(DummyRequest(headers={PROFILE_HEADER: 'wrong'}))
+
+
+def test_should_profile_without_secret(tmpdir):
+    profiler = ExtractProfiler(str(tmpdir))
+    assert not profiler.should_profile(DummyRequest(headers={PROFILE_HEADER: ''}))
+
+
+def test_profile(tmpdir):
+    profiler = ExtractProfiler(str(tmpdir), interval=0.001)
+    with profiler.profile() as profile_id:
+        _busy(0.05)
+    stats = pstats.Stats(os.path.join(str(tmpdir), '{}.pstats'.format(profile_id)))
+    assert any(function[2] == '_busy' for function in stats.stats)
+    with open(os.path.join(str(tmpdir), '{}.collapsed'.format(profile_id))) as f:
+        lines = f.read().splitlines()
+    assert lines
+    assert any('test_profiling.py:_busy' in line for line in lines)
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+
+
+def test_get_extract_profiler(tmpdir):
+    profiling.reset()
+    assert get_extract_profiler(None) is None
+    assert get_extract_profiler({'every': 10}) is None
+    config = {'directory': str(tmpdir.join('profiles')), 'every': 10}
+    profiler = get_extract_profiler(config)
+    assert profiler.every == 10
+    assert os.path.isdir(config['directory'])
+    assert get_extract_profiler(config) is profiler
+    profiling.reset()
+
+
+def test_profile_one_at_a_time(tmpdir):
+    profiler = ExtractProfiler(str(tmpdir))
+    with profiler.profile() as profile_id:
+        with profiler.profile() as nested_id:
+            assert nested_id is None
+    assert profile_id is not None
+    assert sorted(os.listdir(str(tmpdir))) == [
+        '{}.collapsed'.format(profile_id),
+        '{}.pstats'.format(profile_id)
+    ]
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+import pytest
+from sqlalchemy import create_engine, text
+
+from pyramid_oereb.core.timing import StageTimer, Histograms, request_timing, stage, get_stage_timer, \
+    stage_histograms, instrument_engine, query_budget
+
+
+def test_stage_outside_request():
+    with stage('real_estate'):
+        pass
+    assert get_stage_timer() is None
+
+
+def test_request_timing():
+    stage_histograms.reset()
+    with request_timing() as stage_timer:
+        assert get_stage_timer() is stage_timer
+        with stage('real_estate'):
+            pass
+        with stage('plr', 'ch.Nutzungsplanung'):
+            pass
+        with stage('plr', 'ch.Waldgrenzen'):
+            pass
+    assert get_stage_timer() is None
+    assert [(name, detail) for name, detail, _ in stage_timer.stages] == [
+        ('real_estate', None),
+        ('plr', 'ch.Nutzungsplanung'),
+        ('plr', 'ch.Waldgrenzen')
+    ]
+    timings = stage_timer.as_dict()
+    assert set(timings) == {'real_estate', 'plr'}
+    assert set(timings['plr']) == {'ch.Nutzungsplanung', 'ch.Waldgrenzen'}
+    assert 'pyramid_oereb_stage_duration_seconds_count{stage="plr",theme="ch.Waldgrenzen"} 1' in \
+        stage_histograms.render()
+
+
+def test_server_timing():
+    stage_timer = StageTimer()
+    stage_timer.add('real_estate', 0.0123)
+    stage_timer.add('plr', 0.5, 'ch.Nutzungsplanung')
+    assert stage_timer.server_timing() == 'real_estate;dur=12.3, plr;desc="ch.Nutzungsplanung";dur=500.0'
+
+
+def test_stage_timer_sums_repeated_stages():
+    stage_timer = StageTimer()
+    stage_timer.add('print', 1.0)
+    stage_timer.add('print', 0.5)
+    assert stage_timer.as_dict() == {'print': 1500.0}
+
+
+def test_histograms_render():
+    histograms = Histograms('test_seconds', 'Test durations.', buckets=[0.1, 1.0])
+    histograms.observe('render', 0.05)
+    histograms.observe('render', 0.5)
+    histograms.observe('render', 5.0)
+    assert histograms.render().splitlines() == [
+        '# HELP test_seconds Test durations.',
+        '# TYPE test_seconds histogram',
+        'test_seconds_bucket{stage="render",le="0.1"} 1',
+        'test_seconds_bucket{stage="render",le="1.0"} 2',
+        'test_seconds_bucket{stage="render",le="+Inf"} 3',
+        'test_seconds_sum{stage="render"} 5.55',
+        'test_seconds_count{stage="render"} 3'
+    ]
+
+
+def _engine():
+    engine = create_engine('sqlite://')
+    instrument_engine(engine)
+    instrument_engine(engine)
+    with engine.begin() as connection:
+        connection.execute(text('CREATE TABLE plr (id INTEGER, theme VARCHAR)'))
+        connection.execute(text("INSERT INTO plr VALUES (1, 'a'), (2, 'a'), (3, 'b')"))
+    return engine
+
+
+def _select(engine, theme):
+    with engine.connect() as connection:
+        return connection.execute(text('SELECT id FROM plr WHERE theme = :theme'), {'theme': theme}).all()
+
+
+def test_instrument_engine():
+    engine = _engine()
+    with request_timing() as stage_timer:
+        with stage('real_estate'):
+            _select(engine, 'a')
+        with stage('plr', 'ch.Nutzungsplanung'):
+            _select(engine, 'a')
+            _select(engine, 'b')
+    assert stage_timer.query_count() == 3
+    assert stage_timer.query_count('plr') == 2
+    assert stage_timer.query_count('plr', 'ch.Nutzungsplanung') == 2
+    queries = stage_timer.queries_as_dict()
+    assert queries['real_estate']['count'] == 1
+    assert queries['plr']['ch.Nutzungsplanung']['count'] == 2
+    assert 'db;desc="3 queries"' in stage_timer.server_timing()
+
+
+def test_instrument_engine_outside_request():
+    engine = _engine()
+    _select(engine, 'a')
+    assert get_stage_timer() is None
+
+
+def test_query_budget():
+    engine = _engine()
+    with query_budget({'ch.Nutzungsplanung': 2}) as stage_timer:
+        with stage('plr', 'ch.Nutzungsplanung'):
+            _select(engine, 'a')
+            _select(engine, 'b')
+        with stage('plr', 'ch.Waldgrenzen'):
+            _select(engine, 'a')
+    assert stage_timer.query_count() == 3
+
+
+def test_query_budget_exceeded():
+    engine = _engine()
+    with pytest.raises(AssertionError, match='ch.Nutzungsplanung \\(3 statements, budget 2\\)'):
+        with query_budget(2):
+            with stage('plr', 'ch.Nutzungsplanung'):
+                for theme in ['a', 'b', 'a']:
+                    _select(engine, theme)
+            with stage('plr', 'ch.Waldgrenzen'):
+                _select(engine, 'a')